@@ -58,6 +58,17 @@ class ConfigurationManager(object):
         The host where the database lives
     port : int
         The port used to connect to the postgres database in the previous host
+    pool_min_size : int
+        The number of idle postgres connections kept open by each pool
+    pool_max_size : int
+        The max number of postgres connections opened by each pool. 0 means no
+        limit
+    pool_idle_timeout : int
+        The number of seconds that a postgres connection can be idle before
+        being closed (if it is in the pool) or checked (if it is in use)
+    pool_health_check : bool
+        Whether or not the postgres connections are checked with a query
+        before being handed out by the pool
     smtp_host : str
         The SMTP host from which mail will be sent
     smtp_port : int
@@ -82,6 +93,21 @@ class ConfigurationManager(object):
     ebi_organization_prefix : str
         This string (with an underscore) will be prefixed to your EBI
         submission and study aliases
+    ebi_demux_workers : int
+        The number of processes used to write the per-sample files of an EBI
+        submission. Defaults to 1
+    ebi_gzip_level : int
+        The compression level, from 1 to 9, of the per-sample files of an EBI
+        submission. Defaults to 9
+    ebi_ascp_workers : int
+        The number of files of an EBI submission that are sent concurrently
+        with ascp. Defaults to 4
+    ebi_ascp_retries : int
+        The number of times that sending a file with ascp is attempted before
+        failing the EBI submission. Defaults to 3
+    ebi_ascp_backoff : float
+        The number of seconds to wait before retrying to send a file with
+        ascp. It is doubled after each failed attempt. Defaults to 30
     redis_host : str
         The host/ip for redis
     redis_port : int
@@ -108,10 +134,33 @@ class ConfigurationManager(object):
         The script used to start the qiita environment
     private_launcher : str
         The script used to start private jobs
+    use_private_workers : bool
+        Whether the private jobs are executed by the workers of the
+        qiita-private-worker daemon instead of being launched individually
     plugin_launcher : str
         The script used to start the plugins
+    job_backend : {'launcher', 'local'}
+        How the jobs are executed: through the plugin_launcher or as local
+        subprocesses of the process that submits them
+    max_running_jobs : int
+        The max number of jobs running at the same time per process. 0 means
+        no limit
+    max_running_jobs_per_user : int
+        The max number of jobs of a single user running at the same time per
+        process. 0 means no limit
+    max_running_jobs_per_command : int
+        The max number of jobs of a single command running at the same time
+        per process. 0 means no limit
+    max_running_validator_jobs : int
+        The max number of validator jobs running at the same time per process.
+        0 means no limit
     plugin_dir : str
         The path to the directory containing the plugin configuration files
+    analysis_workers : int
+        The number of processes used to build the files of an analysis
+    object_cache_ttl : int
+        The number of seconds that a validated qiita object is kept in the
+        per-process object cache. 0 disables the per-process cache
 
     Raises
     ------
@@ -188,8 +237,41 @@ class ConfigurationManager(object):
             self.qiita_env = ""
 
         self.private_launcher = config.get('main', 'PRIVATE_LAUNCHER')
+        try:
+            self.use_private_workers = config.getboolean(
+                'main', 'USE_PRIVATE_WORKERS')
+        except NoOptionError:
+            self.use_private_workers = False
 
         self.plugin_launcher = config.get('main', 'PLUGIN_LAUNCHER')
+
+        # The job scheduling options are not required, by default the jobs
+        # are launched as soon as they are submitted
+        job_defaults = [
+            ('job_backend', 'JOB_BACKEND', config.get, 'launcher'),
+            ('max_running_jobs', 'MAX_RUNNING_JOBS', config.getint, 0),
+            ('max_running_jobs_per_user', 'MAX_RUNNING_JOBS_PER_USER',
+             config.getint, 0),
+            ('max_running_jobs_per_command', 'MAX_RUNNING_JOBS_PER_COMMAND',
+             config.getint, 0),
+            ('max_running_validator_jobs', 'MAX_RUNNING_VALIDATOR_JOBS',
+             config.getint, 10)]
+        for attr, option, getter, default in job_defaults:
+            try:
+                value = getter('main', option)
+            except NoOptionError:
+                value = default
+            setattr(self, attr, value)
+
+        if self.job_backend not in ('launcher', 'local'):
+            raise ValueError("The JOB_BACKEND (%s) option should be "
+                             "'launcher' or 'local'" % self.job_backend)
+        if self.max_running_jobs < 0 or self.max_running_jobs_per_user < 0 \
+                or self.max_running_jobs_per_command < 0 \
+                or self.max_running_validator_jobs < 0:
+            raise ValueError("The MAX_RUNNING_JOBS options should be "
+                             "non-negative integers")
+
         self.plugin_dir = config.get('main', 'PLUGIN_DIR')
         if not self.plugin_dir:
             self.plugin_dir = join(expanduser('~'), '.qiita_plugins')
@@ -221,6 +303,22 @@ class ConfigurationManager(object):
             self.key_file = join(install_dir, 'qiita_core', 'support_files',
                                  'server.key')
 
+        try:
+            self.analysis_workers = config.getint('main', 'ANALYSIS_WORKERS')
+        except NoOptionError:
+            self.analysis_workers = 1
+        if self.analysis_workers < 1:
+            raise ValueError("The ANALYSIS_WORKERS (%d) option should be a "
+                             "positive integer" % self.analysis_workers)
+
+        try:
+            self.object_cache_ttl = config.getint('main', 'OBJECT_CACHE_TTL')
+        except NoOptionError:
+            self.object_cache_ttl = 0
+        if self.object_cache_ttl < 0:
+            raise ValueError("The OBJECT_CACHE_TTL (%d) option should be a "
+                             "non-negative integer" % self.object_cache_ttl)
+
     def _get_postgres(self, config):
         """Get the configuration of the postgres section"""
         self.user = config.get('postgres', 'USER')
@@ -238,6 +336,30 @@ class ConfigurationManager(object):
         self.host = config.get('postgres', 'HOST')
         self.port = config.getint('postgres', 'PORT')
 
+        # The connection pool options are not required, as most installations
+        # can work with the defaults
+        pool_defaults = [('pool_min_size', 'POOL_MIN_SIZE', config.getint, 1),
+                         ('pool_max_size', 'POOL_MAX_SIZE', config.getint, 20),
+                         ('pool_idle_timeout', 'POOL_IDLE_TIMEOUT',
+                          config.getint, 300),
+                         ('pool_health_check', 'POOL_HEALTH_CHECK',
+                          config.getboolean, True)]
+        for attr, option, getter, default in pool_defaults:
+            try:
+                value = getter('postgres', option)
+            except NoOptionError:
+                value = default
+            setattr(self, attr, value)
+
+        if self.pool_min_size < 0 or self.pool_max_size < 0 or \
+                self.pool_idle_timeout < 0:
+            raise ValueError("The postgres pool options should be "
+                             "non-negative integers")
+        if self.pool_max_size and self.pool_min_size > self.pool_max_size:
+            raise ValueError("POOL_MIN_SIZE (%d) can't be larger than "
+                             "POOL_MAX_SIZE (%d)"
+                             % (self.pool_min_size, self.pool_max_size))
+
     def _get_redis(self, config):
         """Get the configuration of the redis section"""
         sec_get = partial(config.get, 'redis')
@@ -270,6 +392,46 @@ class ConfigurationManager(object):
         self.ebi_center_name = sec_get('EBI_CENTER_NAME')
         self.ebi_organization_prefix = sec_get('EBI_ORGANIZATION_PREFIX')
 
+        try:
+            self.ebi_demux_workers = config.getint('ebi', 'EBI_DEMUX_WORKERS')
+        except NoOptionError:
+            self.ebi_demux_workers = 1
+        if self.ebi_demux_workers < 1:
+            raise ValueError("The EBI_DEMUX_WORKERS (%d) option should be a "
+                             "positive integer" % self.ebi_demux_workers)
+
+        try:
+            self.ebi_gzip_level = config.getint('ebi', 'EBI_GZIP_LEVEL')
+        except NoOptionError:
+            self.ebi_gzip_level = 9
+        if not 1 <= self.ebi_gzip_level <= 9:
+            raise ValueError("The EBI_GZIP_LEVEL (%d) option should be "
+                             "between 1 and 9" % self.ebi_gzip_level)
+
+        try:
+            self.ebi_ascp_workers = config.getint('ebi', 'EBI_ASCP_WORKERS')
+        except NoOptionError:
+            self.ebi_ascp_workers = 4
+        if self.ebi_ascp_workers < 1:
+            raise ValueError("The EBI_ASCP_WORKERS (%d) option should be a "
+                             "positive integer" % self.ebi_ascp_workers)
+
+        try:
+            self.ebi_ascp_retries = config.getint('ebi', 'EBI_ASCP_RETRIES')
+        except NoOptionError:
+            self.ebi_ascp_retries = 3
+        if self.ebi_ascp_retries < 1:
+            raise ValueError("The EBI_ASCP_RETRIES (%d) option should be a "
+                             "positive integer" % self.ebi_ascp_retries)
+
+        try:
+            self.ebi_ascp_backoff = config.getfloat('ebi', 'EBI_ASCP_BACKOFF')
+        except NoOptionError:
+            self.ebi_ascp_backoff = 30
+        if self.ebi_ascp_backoff < 0:
+            raise ValueError("The EBI_ASCP_BACKOFF (%s) option should not be "
+                             "negative" % self.ebi_ascp_backoff)
+
     def _get_vamps(self, config):
         self.vamps_user = config.get('vamps', 'USER')
         self.vamps_pass = config.get('vamps', 'PASSWORD')
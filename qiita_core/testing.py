@@ -11,7 +11,10 @@ from time import sleep
 
 from qiita_core.qiita_settings import r_client
 
-from qiita_db.processing_job import ProcessingJob
+import qiita_db as qdb
+from qiita_db.processing_job import ProcessingJob, LauncherBackend
+from qiita_db.software import Software, Parameters
+from qiita_db.user import User
 
 
 def wait_for_prep_information_job(prep_id, raise_if_none=True):
@@ -53,3 +56,56 @@ def wait_for_processing_job(job_id):
     while job.status not in ('success', 'error'):
         sleep(0.8)
     sleep(0.8)
+
+
+def create_private_job(command='delete_artifact', values=None):
+    """Creates a job of a Qiita private command for the test user
+
+    Parameters
+    ----------
+    command : str, optional
+        The name of the private command. Default: 'delete_artifact'
+    values : dict, optional
+        The parameter values of the job. Default: {'artifact': 1}
+
+    Returns
+    -------
+    qiita_db.processing_job.ProcessingJob
+        The new job, in 'in_construction' status
+    """
+    values = {'artifact': 1} if values is None else values
+    qiita_plugin = Software.from_name_and_version('Qiita', 'alpha')
+    params = Parameters.load(qiita_plugin.get_command(command),
+                             values_dict=values)
+    return ProcessingJob.create(User('test@foo.bar'), params, True)
+
+
+class RecordingBackend(LauncherBackend):
+    """Job scheduler backend that records the jobs instead of executing them
+    """
+    def __init__(self):
+        self.executed = []
+
+    def generate_cmd(self, job):
+        return 'echo %s' % job.id
+
+    def execute(self, job_id, cmd):
+        self.executed.append(job_id)
+
+
+def replace_job_scheduler(scheduler):
+    """Replaces the job scheduler of the system
+
+    Parameters
+    ----------
+    scheduler : qiita_db.processing_job.JobScheduler or None
+        The new job scheduler
+
+    Returns
+    -------
+    qiita_db.processing_job.JobScheduler or None
+        The job scheduler replaced, so it can be restored
+    """
+    previous = qdb.processing_job._SCHEDULER
+    qdb.processing_job._SCHEDULER = scheduler
+    return previous
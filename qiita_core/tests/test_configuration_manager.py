@@ -52,7 +52,13 @@ class ConfigurationManagerTests(TestCase):
         self.assertTrue(obs.require_approval)
         self.assertEqual(obs.qiita_env, "source activate qiita")
         self.assertEqual(obs.private_launcher, 'qiita-private-launcher')
+        self.assertTrue(obs.use_private_workers)
         self.assertEqual(obs.plugin_launcher, "qiita-plugin-launcher")
+        self.assertEqual(obs.job_backend, 'local')
+        self.assertEqual(obs.max_running_jobs, 8)
+        self.assertEqual(obs.max_running_jobs_per_user, 4)
+        self.assertEqual(obs.max_running_jobs_per_command, 2)
+        self.assertEqual(obs.max_running_validator_jobs, 3)
         self.assertEqual(obs.plugin_dir, "/tmp/")
         self.assertEqual(
             obs.valid_upload_extension,
@@ -60,6 +66,8 @@ class ConfigurationManagerTests(TestCase):
         self.assertEqual(obs.certificate_file, "/tmp/server.cert")
         self.assertEqual(obs.cookie_secret, "SECRET")
         self.assertEqual(obs.key_file, "/tmp/server.key")
+        self.assertEqual(obs.analysis_workers, 4)
+        self.assertEqual(obs.object_cache_ttl, 30)
 
         # Postgres section
         self.assertEqual(obs.user, "postgres")
@@ -69,6 +77,10 @@ class ConfigurationManagerTests(TestCase):
         self.assertEqual(obs.database, "qiita_test")
         self.assertEqual(obs.host, "localhost")
         self.assertEqual(obs.port, 5432)
+        self.assertEqual(obs.pool_min_size, 2)
+        self.assertEqual(obs.pool_max_size, 10)
+        self.assertEqual(obs.pool_idle_timeout, 60)
+        self.assertFalse(obs.pool_health_check)
 
         # Redis section
         self.assertEqual(obs.redis_host, "localhost")
@@ -93,6 +105,11 @@ class ConfigurationManagerTests(TestCase):
             "https://www-test.ebi.ac.uk/ena/submit/drop-box/submit/")
         self.assertEqual(obs.ebi_center_name, "qiita-test")
         self.assertEqual(obs.ebi_organization_prefix, "example_organization")
+        self.assertEqual(obs.ebi_demux_workers, 4)
+        self.assertEqual(obs.ebi_gzip_level, 6)
+        self.assertEqual(obs.ebi_ascp_workers, 2)
+        self.assertEqual(obs.ebi_ascp_retries, 5)
+        self.assertEqual(obs.ebi_ascp_backoff, 10)
 
         # VAMPS section
         self.assertEqual(obs.vamps_user, "user")
@@ -171,6 +188,113 @@ class ConfigurationManagerTests(TestCase):
 
         self.assertEqual(obs.qiita_env, "")
 
+    def test_get_main_object_cache_ttl(self):
+        obs = ConfigurationManager()
+
+        # The option is not required and disables the cache by default
+        self.conf.remove_option('main', 'OBJECT_CACHE_TTL')
+        obs._get_main(self.conf)
+        self.assertEqual(obs.object_cache_ttl, 0)
+
+        self.conf.set('main', 'OBJECT_CACHE_TTL', '-1')
+        with self.assertRaises(ValueError):
+            obs._get_main(self.conf)
+
+    def test_get_main_analysis_workers(self):
+        obs = ConfigurationManager()
+
+        # The option is not required and it builds serially by default
+        self.conf.remove_option('main', 'ANALYSIS_WORKERS')
+        obs._get_main(self.conf)
+        self.assertEqual(obs.analysis_workers, 1)
+
+        self.conf.set('main', 'ANALYSIS_WORKERS', '0')
+        with self.assertRaises(ValueError):
+            obs._get_main(self.conf)
+
+    def test_get_ebi_demux_workers(self):
+        obs = ConfigurationManager()
+
+        # The option is not required and it writes serially by default
+        self.conf.remove_option('ebi', 'EBI_DEMUX_WORKERS')
+        obs._get_ebi(self.conf)
+        self.assertEqual(obs.ebi_demux_workers, 1)
+
+        self.conf.set('ebi', 'EBI_DEMUX_WORKERS', '0')
+        with self.assertRaises(ValueError):
+            obs._get_ebi(self.conf)
+
+    def test_get_ebi_gzip_level(self):
+        obs = ConfigurationManager()
+
+        # The option is not required and it uses the gzip default
+        self.conf.remove_option('ebi', 'EBI_GZIP_LEVEL')
+        obs._get_ebi(self.conf)
+        self.assertEqual(obs.ebi_gzip_level, 9)
+
+        self.conf.set('ebi', 'EBI_GZIP_LEVEL', '10')
+        with self.assertRaises(ValueError):
+            obs._get_ebi(self.conf)
+
+    def test_get_ebi_ascp(self):
+        obs = ConfigurationManager()
+
+        # The options are not required
+        self.conf.remove_option('ebi', 'EBI_ASCP_WORKERS')
+        self.conf.remove_option('ebi', 'EBI_ASCP_RETRIES')
+        self.conf.remove_option('ebi', 'EBI_ASCP_BACKOFF')
+        obs._get_ebi(self.conf)
+        self.assertEqual(obs.ebi_ascp_workers, 4)
+        self.assertEqual(obs.ebi_ascp_retries, 3)
+        self.assertEqual(obs.ebi_ascp_backoff, 30)
+
+        self.conf.set('ebi', 'EBI_ASCP_WORKERS', '0')
+        with self.assertRaises(ValueError):
+            obs._get_ebi(self.conf)
+        self.conf.remove_option('ebi', 'EBI_ASCP_WORKERS')
+
+        self.conf.set('ebi', 'EBI_ASCP_RETRIES', '0')
+        with self.assertRaises(ValueError):
+            obs._get_ebi(self.conf)
+        self.conf.remove_option('ebi', 'EBI_ASCP_RETRIES')
+
+        self.conf.set('ebi', 'EBI_ASCP_BACKOFF', '-1')
+        with self.assertRaises(ValueError):
+            obs._get_ebi(self.conf)
+
+    def test_get_main_use_private_workers(self):
+        obs = ConfigurationManager()
+
+        # The option is not required and it is disabled by default
+        self.conf.remove_option('main', 'USE_PRIVATE_WORKERS')
+        obs._get_main(self.conf)
+        self.assertFalse(obs.use_private_workers)
+
+    def test_get_main_job_scheduling(self):
+        obs = ConfigurationManager()
+
+        # The options are not required
+        for option in ('JOB_BACKEND', 'MAX_RUNNING_JOBS',
+                       'MAX_RUNNING_JOBS_PER_USER',
+                       'MAX_RUNNING_JOBS_PER_COMMAND',
+                       'MAX_RUNNING_VALIDATOR_JOBS'):
+            self.conf.remove_option('main', option)
+        obs._get_main(self.conf)
+        self.assertEqual(obs.job_backend, 'launcher')
+        self.assertEqual(obs.max_running_jobs, 0)
+        self.assertEqual(obs.max_running_jobs_per_user, 0)
+        self.assertEqual(obs.max_running_jobs_per_command, 0)
+        self.assertEqual(obs.max_running_validator_jobs, 10)
+
+        self.conf.set('main', 'JOB_BACKEND', 'cluster')
+        with self.assertRaises(ValueError):
+            obs._get_main(self.conf)
+
+        self.conf.set('main', 'JOB_BACKEND', 'local')
+        self.conf.set('main', 'MAX_RUNNING_JOBS', '-1')
+        with self.assertRaises(ValueError):
+            obs._get_main(self.conf)
+
     def test_get_postgres(self):
         obs = ConfigurationManager()
 
@@ -181,6 +305,24 @@ class ConfigurationManagerTests(TestCase):
         self.assertIsNone(obs.password)
         self.assertIsNone(obs.admin_password)
 
+        # The pool options are not required
+        for option in ('POOL_MIN_SIZE', 'POOL_MAX_SIZE', 'POOL_IDLE_TIMEOUT',
+                       'POOL_HEALTH_CHECK'):
+            self.conf.remove_option('postgres', option)
+        obs._get_postgres(self.conf)
+        self.assertEqual(obs.pool_min_size, 1)
+        self.assertEqual(obs.pool_max_size, 20)
+        self.assertEqual(obs.pool_idle_timeout, 300)
+        self.assertTrue(obs.pool_health_check)
+
+        conf_setter('POOL_MIN_SIZE', '-1')
+        with self.assertRaises(ValueError):
+            obs._get_postgres(self.conf)
+
+        conf_setter('POOL_MIN_SIZE', '30')
+        with self.assertRaises(ValueError):
+            obs._get_postgres(self.conf)
+
     def test_get_portal(self):
         obs = ConfigurationManager()
         conf_setter = partial(self.conf.set, 'portal')
@@ -235,9 +377,22 @@ QIITA_ENV = source activate qiita
 # Script used for launching private Qiita tasks
 PRIVATE_LAUNCHER = qiita-private-launcher
 
+# Whether the private Qiita tasks are executed by the qiita-private-worker
+# daemon
+USE_PRIVATE_WORKERS = True
+
 # Script used for launching plugins
 PLUGIN_LAUNCHER = qiita-plugin-launcher
 
+# How the jobs are executed
+JOB_BACKEND = local
+
+# Max number of jobs running at the same time on each process
+MAX_RUNNING_JOBS = 8
+MAX_RUNNING_JOBS_PER_USER = 4
+MAX_RUNNING_JOBS_PER_COMMAND = 2
+MAX_RUNNING_VALIDATOR_JOBS = 3
+
 # Plugins configuration directory
 PLUGIN_DIR = /tmp/
 
@@ -253,6 +408,13 @@ KEY_FILE = /tmp/server.key
 #   print b64encode(uuid4().bytes + uuid4().bytes)"
 COOKIE_SECRET = SECRET
 
+# Number of processes used to build the BIOM tables of an analysis
+ANALYSIS_WORKERS = 4
+
+# Number of seconds that a qiita object already validated against the database
+# is cached in each process. 0 disables the per-process cache
+OBJECT_CACHE_TTL = 30
+
 # ----------------------------- SMTP settings -----------------------------
 [smtp]
 # The hostname to connect to
@@ -308,6 +470,19 @@ PASSWORD = andanotherpwd
 # The postgres password for the admin_user
 ADMIN_PASSWORD = thishastobesecure
 
+# Number of idle connections kept open by each connection pool
+POOL_MIN_SIZE = 2
+
+# Max number of connections opened by each connection pool, 0 for no limit
+POOL_MAX_SIZE = 10
+
+# Seconds that a connection can be idle before being closed (if it is in the
+# pool) or checked (if it is in use)
+POOL_IDLE_TIMEOUT = 60
+
+# Whether or not the connections are checked before being handed out
+POOL_HEALTH_CHECK = False
+
 # ----------------------------- EBI settings -----------------------------
 [ebi]
 # The user to use when submitting to EBI
@@ -329,6 +504,22 @@ EBI_CENTER_NAME = qiita-test
 # study aliases
 EBI_ORGANIZATION_PREFIX = example_organization
 
+# The number of processes used to write the per-sample files of a submission
+EBI_DEMUX_WORKERS = 4
+
+# The gzip compression level (1-9) of the per-sample files of a submission
+EBI_GZIP_LEVEL = 6
+
+# The number of files of a submission that are sent concurrently with ascp
+EBI_ASCP_WORKERS = 2
+
+# The number of attempts to send a file with ascp before failing
+EBI_ASCP_RETRIES = 5
+
+# The seconds to wait before retrying to send a file with ascp. It is doubled
+# after each failed attempt
+EBI_ASCP_BACKOFF = 10
+
 # ----------------------------- VAMPS settings -----------------------------
 [vamps]
 # general info to submit to vamps
@@ -17,20 +17,242 @@ Classes
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 from __future__ import division
-from itertools import product
-from os.path import join
+from itertools import chain, product
+from multiprocessing import Pool
+from os import remove
+from os.path import join, exists
 
 from future.utils import viewitems
-from biom import load_table
-from biom.util import biom_open
+from biom import load_table, Table
+from biom.util import biom_open, is_hdf5_file
 from re import sub
-import pandas as pd
+from scipy.sparse import coo_matrix
+import numpy as np
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from qiita_core.qiita_settings import qiita_config
 import qiita_db as qdb
 
 
+def _load_biom_samples(biom_fp, samples):
+    """Loads the columns of the given samples from a BIOM table
+
+    Parameters
+    ----------
+    biom_fp : str
+        The path to the BIOM table
+    samples : set of str
+        The ids of the samples to load
+
+    Returns
+    -------
+    biom.Table or None
+        The table with the samples present in the file, in the order of the
+        file, or None if none of them is present
+
+    Notes
+    -----
+    Only the columns of the selected samples are read from HDF5 tables. The
+    tables in other formats are fully loaded and then filtered.
+    """
+    if is_hdf5_file(biom_fp):
+        with biom_open(biom_fp) as f:
+            ids = [i for i in f['sample/ids'][:] if i in samples]
+            if not ids:
+                return None
+            return Table.from_hdf5(f, ids=ids, axis='sample')
+
+    table = load_table(biom_fp)
+    ids = [i for i in table.ids() if i in samples]
+    if not ids:
+        return None
+    return table.filter(ids, axis='sample', inplace=False)
+
+
+def _merge_biom_tables(tables):
+    """Merges the BIOM tables in a single pass
+
+    Parameters
+    ----------
+    tables : iterable of biom.Table
+        The tables to merge. It can be a generator, so only one of the tables
+        is in memory at a time
+
+    Returns
+    -------
+    biom.Table or None
+        The merged table, or None if there are no tables
+
+    Notes
+    -----
+    The result is the same as merging the tables pairwise with
+    `biom.Table.merge`: the ids of both axes are the union of the ids of the
+    tables, in order of appearance, and the values of the same observation and
+    sample are summed. However, the union indices are built once and the
+    sparse matrix is assembled at the end, instead of copying the merged
+    table for every new table. The metadata of an id is taken from the first
+    table where it appears, and it is dropped from the axis if any of the
+    tables lacks it.
+    """
+    axes = {'observation': ({}, [], []), 'sample': ({}, [], [])}
+    missing_md = set()
+    rows, cols, data = [], [], []
+    for table in tables:
+        maps = {}
+        for axis, (index, ids, md) in viewitems(axes):
+            table_md = table.metadata(axis=axis)
+            if table_md is None:
+                missing_md.add(axis)
+            id_map = np.empty(len(table.ids(axis=axis)), dtype=np.int64)
+            for i, id_ in enumerate(table.ids(axis=axis)):
+                idx = index.get(id_)
+                if idx is None:
+                    idx = index[id_] = len(ids)
+                    ids.append(id_)
+                    md.append(table_md[i] if table_md is not None else None)
+                id_map[i] = idx
+            maps[axis] = id_map
+
+        matrix = table.matrix_data.tocoo()
+        rows.append(maps['observation'][matrix.row])
+        cols.append(maps['sample'][matrix.col])
+        data.append(matrix.data)
+
+    obs_ids, obs_md = axes['observation'][1:]
+    sample_ids, sample_md = axes['sample'][1:]
+    if not sample_ids:
+        return None
+
+    # the duplicated (observation, sample) entries are summed
+    matrix = coo_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(obs_ids), len(sample_ids))).tocsr()
+    return Table(
+        matrix, obs_ids, sample_ids,
+        observation_metadata=(
+            None if 'observation' in missing_md else obs_md),
+        sample_metadata=None if 'sample' in missing_md else sample_md)
+
+
+def _load_biom_tables(tables, rename_dup_samples=False):
+    """Loads the selected samples of each BIOM table
+
+    Parameters
+    ----------
+    tables : list of (int, str, list of str)
+        The artifact id, the filepath of its BIOM table and the ids of the
+        selected samples. If the samples are None, the full table is loaded
+    rename_dup_samples : bool, optional
+        Whether the artifact id is prepended to the sample ids
+
+    Returns
+    -------
+    generator of biom.Table
+        The tables with any of the selected samples
+    """
+    for aid, biom_fp, samples in tables:
+        if samples is None:
+            biom_table = load_table(biom_fp)
+        else:
+            biom_table = _load_biom_samples(biom_fp, set(samples))
+            if biom_table is None:
+                continue
+
+        if rename_dup_samples:
+            ids_map = {_id: "%d.%s" % (aid, _id)
+                       for _id in biom_table.ids()}
+            biom_table.update_ids(ids_map, 'sample', True, True)
+
+        yield biom_table
+
+
+def _build_biom_table(biom_fp, tables, rename_dup_samples, comment):
+    """Merges the selected samples of the BIOM tables and writes the result
+
+    Parameters
+    ----------
+    biom_fp : str
+        The filepath where the merged table is written
+    tables : list of (int, str, list of str)
+        The artifact id, the filepath of its BIOM table and the ids of the
+        selected samples
+    rename_dup_samples : bool
+        Whether the artifact id is prepended to the sample ids
+    comment : str
+        The comment of the merged table
+
+    Returns
+    -------
+    bool
+        Whether the merged table has any sample. If not, it is not written
+    """
+    table = _merge_biom_tables(_load_biom_tables(tables, rename_dup_samples))
+    if table is None:
+        return False
+    with biom_open(biom_fp, 'w') as f:
+        table.to_hdf5(f, comment)
+    return True
+
+
+def _build_biom_tables_in_pool(pool, workers, builds, rename_dup_samples):
+    """Builds the BIOM tables using the workers of a process pool
+
+    Parameters
+    ----------
+    pool : multiprocessing.Pool
+        The pool of workers
+    workers : int
+        The number of workers of the pool
+    builds : list of (str, str, list, str)
+        The data type, the filepath of the merged table, the tables to merge
+        (see `_build_biom_table`) and the comment of each merged table
+    rename_dup_samples : bool
+        Whether the artifact id is prepended to the sample ids
+
+    Returns
+    -------
+    list of bool
+        Whether each of the merged tables has any sample
+    """
+    # If there are more workers than tables to build, the artifacts of each
+    # table are split in contiguous chunks, which are merged in partial
+    # tables and then merged again in order, keeping the order of the ids
+    num_chunks = max(1, workers // len(builds))
+    partials = []
+    for _, biom_fp, tables, comment in builds:
+        size = -(-len(tables) // num_chunks)
+        chunks = [tables[i:i + size] for i in range(0, len(tables), size)]
+        if len(chunks) == 1:
+            partials.append([(biom_fp, pool.apply_async(
+                _build_biom_table,
+                (biom_fp, tables, rename_dup_samples, comment)))])
+        else:
+            partials.append([
+                ('%s.%d' % (biom_fp, i), pool.apply_async(
+                    _build_biom_table,
+                    ('%s.%d' % (biom_fp, i), chunk, rename_dup_samples,
+                     comment)))
+                for i, chunk in enumerate(chunks)])
+
+    merges = []
+    for (_, biom_fp, _, comment), parts in zip(builds, partials):
+        if len(parts) == 1:
+            merges.append(parts[0][1])
+            continue
+        part_fps = [fp for fp, res in parts if res.get()]
+        merges.append(pool.apply_async(
+            _build_biom_table,
+            (biom_fp, [(None, fp, None) for fp in part_fps], False, comment)))
+
+    built = [res.get() for res in merges]
+    for parts in partials:
+        if len(parts) > 1:
+            for fp, _ in parts:
+                if exists(fp):
+                    remove(fp)
+    return built
+
+
 class Analysis(qdb.base.QiitaObject):
     """
     Analysis object to access to the Qiita Analysis information
@@ -243,6 +465,8 @@ class Analysis(qdb.base.QiitaObject):
 
             qdb.sql_connection.TRN.execute()
 
+            cls._remove_from_cache([_id])
+
     @classmethod
     def exists(cls, analysis_id):
         r"""Checks if the given analysis _id exists
@@ -874,129 +1098,177 @@ class Analysis(qdb.base.QiitaObject):
             return biom_files
 
     def _build_biom_tables(self, grouped_samples, rename_dup_samples=False):
-        """Build tables and add them to the analysis"""
+        """Build tables and add them to the analysis
+
+        Notes
+        -----
+        Each label of `grouped_samples` becomes an independent BIOM table. If
+        the ANALYSIS_WORKERS option allows it, the tables are built in a
+        process pool, splitting the artifacts of a label in chunks when there
+        are more workers than labels. The workers write the tables to disk, so
+        no table is sent back to this process.
+        """
         with qdb.sql_connection.TRN:
             base_fp = qdb.util.get_work_base_dir()
 
-            biom_files = []
+            # The database is only accessed here, so the workers don't need a
+            # connection
+            builds = []
             for label, tables in viewitems(grouped_samples):
                 data_type, algorithm = [
                     l.strip() for l in label.split('||')]
 
-                new_table = None
-                artifact_ids = []
-                for aid, samples in tables:
-                    artifact = qdb.artifact.Artifact(aid)
-                    artifact_ids.append(str(aid))
-
-                    # the next loop is assuming that an artifact can have only
-                    # one biom, which is a safe assumption until we generate
-                    # artifacts from multiple bioms and even then we might
-                    # only have one biom
-                    biom_table_fp = None
-                    for _, fp, fp_type in artifact.filepaths:
-                        if fp_type == 'biom':
-                            biom_table_fp = fp
-                            break
-                    if not biom_table_fp:
-                        raise RuntimeError(
-                            "Artifact %s does not have a biom table associated"
-                            % aid)
-
-                    # loading the found biom table
-                    biom_table = load_table(biom_table_fp)
-                    # filtering samples to keep those selected by the user
-                    biom_table_samples = set(biom_table.ids())
-                    selected_samples = biom_table_samples.intersection(samples)
-                    biom_table.filter(selected_samples, axis='sample',
-                                      inplace=True)
-                    if len(biom_table.ids()) == 0:
-                        continue
-
-                    if rename_dup_samples:
-                        ids_map = {_id: "%d.%s" % (aid, _id)
-                                   for _id in biom_table.ids()}
-                        biom_table.update_ids(ids_map, 'sample', True, True)
-
-                    if new_table is None:
-                        new_table = biom_table
-                    else:
-                        new_table = new_table.merge(biom_table)
-
-                if not new_table or len(new_table.ids()) == 0:
-                    # if we get to this point the only reason for failure is
-                    # rarefaction
-                    raise RuntimeError("All samples filtered out from "
-                                       "analysis due to rarefaction level")
-
                 # write out the file
                 data_type = sub('[^0-9a-zA-Z]+', '', data_type)
                 algorithm = sub('[^0-9a-zA-Z]+', '', algorithm)
                 info = "%s_%s" % (data_type, algorithm)
                 fn = "%d_analysis_%s.biom" % (self._id, info)
                 biom_fp = join(base_fp, fn)
-                with biom_open(biom_fp, 'w') as f:
-                    new_table.to_hdf5(
-                        f, "Generated by Qiita, analysis id: %d, info: %s" % (
-                            self._id, label))
-                biom_files.append((data_type, biom_fp))
-        return biom_files
+                comment = "Generated by Qiita, analysis id: %d, info: %s" % (
+                    self._id, label)
+                tables = [(aid, self._get_biom_fp(aid), samples)
+                          for aid, samples in tables]
+                builds.append((data_type, biom_fp, tables, comment))
+
+        workers = min(qiita_config.analysis_workers,
+                      sum(len(b[2]) for b in builds))
+        if workers > 1:
+            pool = Pool(workers)
+            try:
+                built = _build_biom_tables_in_pool(
+                    pool, workers, builds, rename_dup_samples)
+            finally:
+                pool.terminate()
+        else:
+            built = [_build_biom_table(biom_fp, tables, rename_dup_samples,
+                                       comment)
+                     for _, biom_fp, tables, comment in builds]
+
+        if not all(built):
+            # The tables of the other labels have already been written, but
+            # the analysis is not going to use them
+            for _, biom_fp, _, _ in builds:
+                if exists(biom_fp):
+                    remove(biom_fp)
+            # if we get to this point the only reason for failure is
+            # rarefaction
+            raise RuntimeError("All samples filtered out from "
+                               "analysis due to rarefaction level")
+
+        return [(data_type, biom_fp) for data_type, biom_fp, _, _ in builds]
+
+    def _get_biom_fp(self, aid):
+        """Returns the filepath of the BIOM table of an artifact
+
+        Parameters
+        ----------
+        aid : int
+            The artifact id
+
+        Returns
+        -------
+        str
+            The filepath of the BIOM table
+
+        Raises
+        ------
+        RuntimeError
+            If the artifact does not have a BIOM table
+        """
+        # the next loop is assuming that an artifact can have only
+        # one biom, which is a safe assumption until we generate
+        # artifacts from multiple bioms and even then we might
+        # only have one biom
+        for _, fp, fp_type in qdb.artifact.Artifact(aid).filepaths:
+            if fp_type == 'biom':
+                return fp
+        raise RuntimeError(
+            "Artifact %s does not have a biom table associated" % aid)
 
     def _build_mapping_file(self, samples, rename_dup_samples=False):
         """Builds the combined mapping file for all samples
-           Code modified slightly from qiime.util.MetadataMap.__add__"""
+           Code modified slightly from qiime.util.MetadataMap.__add__
+
+        Notes
+        -----
+        The metadata is retrieved from the database, fetching the sample
+        template of each study only once, and the per-artifact mappings are
+        streamed to the output file instead of being concatenated in memory
+        """
         with qdb.sql_connection.TRN:
-            all_ids = set()
-            to_concat = []
+            # Group the artifacts by study, so the study-level information
+            # and the sample template is only retrieved once per study
+            studies = {}
             for aid, samps in viewitems(samples):
-                qiime_map_fp = qdb.artifact.Artifact(
-                    aid).prep_templates[0].qiime_map_fp
-
-                # Parse the mapping file
-                qm = qdb.metadata_template.util.load_template_to_dataframe(
-                    qiime_map_fp, index='#SampleID')
-
-                # if we are not going to merge the duplicated samples
-                # append the aid to the sample name
-                if rename_dup_samples:
-                    qm['original_SampleID'] = qm.index
-                    qm['#SampleID'] = "%d." % aid + qm.index
-                    qm['qiita_aid'] = aid
-                    samps = set(['%d.%s' % (aid, _id) for _id in samps])
-                    qm.set_index('#SampleID', inplace=True, drop=True)
-                else:
-                    samps = set(samps) - all_ids
-                    all_ids.update(samps)
-
-                # appending study metadata to the analysis
-                study = qdb.artifact.Artifact(aid).study
-                study_owner = study.owner
+                artifact = qdb.artifact.Artifact(aid)
+                studies.setdefault(artifact.study.id, []).append(
+                    (artifact, samps))
+
+            PrepTemplate = qdb.metadata_template.prep_template.PrepTemplate
+            all_ids = set()
+            to_write = []
+            for study_id, artifacts in sorted(viewitems(studies)):
+                study = qdb.study.Study(study_id)
+                study_samples = set(chain.from_iterable(
+                    samps for _, samps in artifacts))
+                st = qdb.metadata_template.sample_template.SampleTemplate(
+                    study_id).to_dataframe(samples=study_samples)
+
                 study_info = study.info
-                pi = study_info['principal_investigator']
-                qm['qiita_study_title'] = study.title
-                qm['qiita_study_alias'] = study.info['study_alias']
-                qm['qiita_owner'] = study_owner.info['name']
-                qm['qiita_principal_investigator'] = pi.name
+                annotations = [
+                    ('qiita_study_title', study.title),
+                    ('qiita_study_alias', study_info['study_alias']),
+                    ('qiita_owner', study.owner.info['name']),
+                    ('qiita_principal_investigator',
+                     study_info['principal_investigator'].name)]
+
+                # sorting to keep the output stable across runs
+                for artifact, samps in sorted(artifacts,
+                                              key=lambda x: x[0].id):
+                    aid = artifact.id
+                    # if we are not going to merge the duplicated samples
+                    # append the aid to the sample name
+                    if not rename_dup_samples:
+                        samps = set(samps) - all_ids
+                        all_ids.update(samps)
+
+                    pt = artifact.prep_templates[0].to_dataframe(
+                        samples=samps)
+                    qm, _ = PrepTemplate.qiime_mapping(pt, st)
+
+                    if rename_dup_samples:
+                        qm['original_SampleID'] = qm.index
+                        qm['#SampleID'] = "%d." % aid + qm.index
+                        qm['qiita_aid'] = aid
+                        qm.set_index('#SampleID', inplace=True, drop=True)
+
+                    # appending study metadata to the analysis
+                    for column, value in annotations:
+                        qm[column] = value
 
-                qm = qm.loc[samps]
-                to_concat.append(qm)
+                    to_write.append(qm)
 
-            merged_map = pd.concat(to_concat)
+            # The union of the columns is computed as pandas.concat would do
+            columns = to_write[0].columns
+            for qm in to_write[1:]:
+                columns = columns.union(qm.columns)
 
             # forcing QIIME column order
-            cols = merged_map.columns.values.tolist()
+            cols = columns.values.tolist()
             cols.remove('BarcodeSequence')
             cols.remove('LinkerPrimerSequence')
             cols.remove('Description')
             cols = (['BarcodeSequence', 'LinkerPrimerSequence'] + cols +
                     ['Description'])
-            merged_map = merged_map[cols]
 
-            # Save the mapping file
+            # Save the mapping file, one artifact at a time
             _, base_fp = qdb.util.get_mountpoint(self._table)[0]
             mapping_fp = join(base_fp, "%d_analysis_mapping.txt" % self._id)
-            merged_map.to_csv(mapping_fp, index_label='#SampleID',
-                              na_rep='unknown', sep='\t', encoding='utf-8')
+            with open(mapping_fp, 'w') as f:
+                for i, qm in enumerate(to_write):
+                    qm.reindex(columns=cols).to_csv(
+                        f, header=(i == 0), index_label='#SampleID',
+                        na_rep='unknown', sep='\t', encoding='utf-8')
 
             self._add_file("%d_analysis_mapping.txt" % self._id, "plain_text")
 
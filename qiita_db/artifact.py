@@ -56,6 +56,18 @@ class Artifact(qdb.base.QiitaObject):
     qiita_db.QiitaObject
     """
     _table = "artifact"
+    _hydrate_sql = """SELECT name, generated_timestamp, command_id,
+                             command_parameters, visibility, artifact_type,
+                             data_type, can_be_submitted_to_ebi,
+                             can_be_submitted_to_vamps, submitted_to_vamps,
+                             study_id, analysis_id
+                      FROM qiita.artifact
+                        JOIN qiita.visibility USING (visibility_id)
+                        JOIN qiita.artifact_type USING (artifact_type_id)
+                        JOIN qiita.data_type USING (data_type_id)
+                        LEFT JOIN qiita.study_artifact USING (artifact_id)
+                        LEFT JOIN qiita.analysis_artifact USING (artifact_id)
+                      WHERE artifact_id = %s"""
 
     @classmethod
     def iter_by_visibility(cls, visibility):
@@ -615,6 +627,8 @@ class Artifact(qdb.base.QiitaObject):
             sql = "DELETE FROM qiita.artifact WHERE artifact_id = %s"
             qdb.sql_connection.TRN.add(sql, [artifact_id])
 
+            cls._remove_from_cache([instance.id])
+
     @property
     def name(self):
         """The name of the artifact
@@ -624,6 +638,9 @@ class Artifact(qdb.base.QiitaObject):
         str
             The artifact name
         """
+        if self._hydrated:
+            return self._hydrated_row['name']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT name
                      FROM qiita.artifact
@@ -651,6 +668,7 @@ class Artifact(qdb.base.QiitaObject):
                      WHERE artifact_id = %s"""
             qdb.sql_connection.TRN.add(sql, [value, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def timestamp(self):
@@ -661,6 +679,9 @@ class Artifact(qdb.base.QiitaObject):
         datetime
             The timestamp when the artifact was generated
         """
+        if self._hydrated:
+            return self._hydrated_row['generated_timestamp']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT generated_timestamp
                      FROM qiita.artifact
@@ -679,12 +700,16 @@ class Artifact(qdb.base.QiitaObject):
             None otherwise.
         """
         with qdb.sql_connection.TRN:
-            sql = """SELECT command_id, command_parameters
-                     FROM qiita.artifact
-                     WHERE artifact_id = %s"""
-            qdb.sql_connection.TRN.add(sql, [self.id])
-            # Only one row will be returned
-            res = qdb.sql_connection.TRN.execute_fetchindex()[0]
+            if self._hydrated:
+                res = (self._hydrated_row['command_id'],
+                       self._hydrated_row['command_parameters'])
+            else:
+                sql = """SELECT command_id, command_parameters
+                         FROM qiita.artifact
+                         WHERE artifact_id = %s"""
+                qdb.sql_connection.TRN.add(sql, [self.id])
+                # Only one row will be returned
+                res = qdb.sql_connection.TRN.execute_fetchindex()[0]
             if res[0] is None:
                 return None
             return qdb.software.Parameters.load(
@@ -699,6 +724,9 @@ class Artifact(qdb.base.QiitaObject):
         str
             The visibility of the artifact
         """
+        if self._hydrated:
+            return self._hydrated_row['visibility']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT visibility
                      FROM qiita.artifact
@@ -737,6 +765,7 @@ class Artifact(qdb.base.QiitaObject):
             vis_id = qdb.util.convert_to_id(value, "visibility")
             qdb.sql_connection.TRN.add(sql, [vis_id, tuple(ids)])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def artifact_type(self):
@@ -747,6 +776,9 @@ class Artifact(qdb.base.QiitaObject):
         str
             The artifact type
         """
+        if self._hydrated:
+            return self._hydrated_row['artifact_type']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT artifact_type
                      FROM qiita.artifact
@@ -764,6 +796,9 @@ class Artifact(qdb.base.QiitaObject):
         str
             The artifact data type
         """
+        if self._hydrated:
+            return self._hydrated_row['data_type']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT data_type
                      FROM qiita.artifact
@@ -781,6 +816,9 @@ class Artifact(qdb.base.QiitaObject):
         bool
             True if the artifact can be submitted to EBI. False otherwise.
         """
+        if self._hydrated:
+            return self._hydrated_row['can_be_submitted_to_ebi']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT can_be_submitted_to_ebi
                      FROM qiita.artifact_type
@@ -884,6 +922,9 @@ class Artifact(qdb.base.QiitaObject):
         bool
             True if the artifact can be submitted to VAMPS. False otherwise.
         """
+        if self._hydrated:
+            return self._hydrated_row['can_be_submitted_to_vamps']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT can_be_submitted_to_vamps
                      FROM qiita.artifact_type
@@ -910,6 +951,8 @@ class Artifact(qdb.base.QiitaObject):
             if not self.can_be_submitted_to_vamps:
                 raise qdb.exceptions.QiitaDBOperationNotPermittedError(
                     "Artifact %s cannot be submitted to VAMPS" % self.id)
+            if self._hydrated:
+                return self._hydrated_row['submitted_to_vamps']
             sql = """SELECT submitted_to_vamps
                      FROM qiita.artifact
                      WHERE artifact_id = %s"""
@@ -939,6 +982,7 @@ class Artifact(qdb.base.QiitaObject):
                      WHERE artifact_id = %s"""
             qdb.sql_connection.TRN.add(sql, [value, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def filepaths(self):
@@ -1041,8 +1085,8 @@ class Artifact(qdb.base.QiitaObject):
                      FROM qiita.parent_artifact
                      WHERE artifact_id = %s"""
             qdb.sql_connection.TRN.add(sql, [self.id])
-            return [Artifact(p_id)
-                    for p_id in qdb.sql_connection.TRN.execute_fetchflatten()]
+            return Artifact.load_many(
+                qdb.sql_connection.TRN.execute_fetchflatten())
 
     def _create_lineage_graph_from_edge_list(self, edge_list):
         """Generates an artifact graph from the given `edge_list`
@@ -1061,8 +1105,8 @@ class Artifact(qdb.base.QiitaObject):
         # In case the edge list is empty, only 'self' is present in the graph
         if edge_list:
             # By creating all the artifacts here we are saving DB calls
-            nodes = {a_id: Artifact(a_id)
-                     for a_id in set(chain.from_iterable(edge_list))}
+            nodes = {a.id: a for a in Artifact.load_many(
+                set(chain.from_iterable(edge_list)))}
 
             for parent, child in edge_list:
                 lineage.add_edge(nodes[parent], nodes[child])
@@ -1287,6 +1331,10 @@ class Artifact(qdb.base.QiitaObject):
         qiita_db.study.Study or None
             The study that owns the artifact, if any
         """
+        if self._hydrated:
+            study_id = self._hydrated_row['study_id']
+            return qdb.study.Study(study_id) if study_id is not None else None
+
         with qdb.sql_connection.TRN:
             sql = """SELECT study_id
                      FROM qiita.study_artifact
@@ -1304,6 +1352,11 @@ class Artifact(qdb.base.QiitaObject):
         qiita_db.analysis.Analysis or None
             The analysis that owns the artifact, if any
         """
+        if self._hydrated:
+            analysis_id = self._hydrated_row['analysis_id']
+            return (qdb.analysis.Analysis(analysis_id)
+                    if analysis_id is not None else None)
+
         with qdb.sql_connection.TRN:
             sql = """SELECT analysis_id
                      FROM qiita.analysis_artifact
@@ -25,12 +25,39 @@ Classes
 # -----------------------------------------------------------------------------
 
 from __future__ import division
+from time import time
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from qiita_core.qiita_settings import qiita_config
 import qiita_db as qdb
 
 
+# Per-process identity map of the objects already validated against the
+# database. Keys are (class, id, portal) and values are the time (in seconds
+# since the epoch) in which the entry expires. It is only populated if
+# qiita_config.object_cache_ttl is greater than 0
+_OBJECT_CACHE = {}
+
+
+def clear_object_cache():
+    """Removes all the entries from the per-process object cache"""
+    _OBJECT_CACHE.clear()
+
+
+def _promote_to_object_cache(keys):
+    """Adds the objects validated in a committed transaction to the
+    per-process object cache
+
+    Parameters
+    ----------
+    keys : set of (type, object, str)
+        The (class, id, portal) keys of the validated objects
+    """
+    expiration = time() + qiita_config.object_cache_ttl
+    for key in keys:
+        _OBJECT_CACHE[key] = expiration
+
+
 class QiitaObject(object):
     r"""Base class for any qiita_db object
 
@@ -48,8 +75,13 @@ class QiitaObject(object):
     create
     delete
     exists
+    load_many
+    hydrate
     _check_subclass
     _check_id
+    _is_cached
+    _add_to_cache
+    _remove_from_cache
     __eq__
     __neq__
 
@@ -61,6 +93,12 @@ class QiitaObject(object):
 
     _table = None
     _portal_table = None
+    # SQL query that retrieves, in a single row, all the columns of the object
+    # (plus the ones of its most common joins) when the object is hydrated.
+    # It receives the object id as its only argument. See `hydrate`
+    _hydrate_sql = None
+    _hydrated = False
+    _row = None
 
     @classmethod
     def create(cls):
@@ -158,18 +196,102 @@ class QiitaObject(object):
             qdb.sql_connection.TRN.add(sql, [id_, qiita_config.portal])
             return qdb.sql_connection.TRN.execute_fetchlast()
 
-    def __init__(self, id_):
-        r"""Initializes the object
+    @classmethod
+    def _is_cached(cls, id_):
+        r"""Checks if the object `id_` has been already validated
+
+        Parameters
+        ----------
+        id_ : object
+            The object identifier
+
+        Returns
+        -------
+        bool
+            Whether the object has been already validated in the current
+            transaction or, if enabled, in the current process
+        """
+        key = (cls, id_, qiita_config.portal)
+        if key in qdb.sql_connection.TRN.object_cache:
+            return True
+
+        expiration = _OBJECT_CACHE.get(key)
+        if expiration is None:
+            return False
+        if expiration < time():
+            _OBJECT_CACHE.pop(key, None)
+            return False
+        return True
+
+    @classmethod
+    def _add_to_cache(cls, id_):
+        r"""Adds the object `id_` to the identity map of the transaction
+
+        Parameters
+        ----------
+        id_ : object
+            The object identifier
+
+        Notes
+        -----
+        If the per-process cache is enabled, the objects validated in the
+        transaction are moved to it once the transaction is committed. This
+        function should be called inside a transaction context.
+        """
+        trn_cache = qdb.sql_connection.TRN.object_cache
+        if not trn_cache and qiita_config.object_cache_ttl > 0:
+            # First object of the transaction, register the function that
+            # promotes the transaction identity map to the process cache.
+            # The set is passed by reference, so any object removed from it
+            # before the commit will not be promoted
+            qdb.sql_connection.TRN.add_post_commit_func(
+                _promote_to_object_cache, trn_cache)
+        trn_cache.add((cls, id_, qiita_config.portal))
+
+    @classmethod
+    def _remove_from_cache(cls, ids):
+        r"""Removes the given objects from the transaction and process caches
+
+        Parameters
+        ----------
+        ids : iterable of object
+            The object identifiers
+
+        Notes
+        -----
+        The objects are removed for all portals. This function should be
+        called by any method that removes the objects from the database or
+        from a portal.
+        """
+        ids = set(ids)
+        trn_cache = qdb.sql_connection.TRN.object_cache
+        for key in [k for k in trn_cache if k[0] is cls and k[1] in ids]:
+            trn_cache.discard(key)
+        # The process cache is shared by the transactions of all the threads,
+        # so iterate over a snapshot of its keys and don't fail if any of them
+        # has been removed in the meantime
+        for key in list(_OBJECT_CACHE):
+            if key[0] is cls and key[1] in ids:
+                _OBJECT_CACHE.pop(key, None)
+
+    @classmethod
+    def _normalize_id(cls, id_):
+        r"""Checks the type of `id_` and casts numerical ids to int
 
         Parameters
         ----------
         id_: int, long, str, or unicode
             the object identifier
 
+        Returns
+        -------
+        int, str or unicode
+            The normalized object identifier
+
         Raises
         ------
-        QiitaDBUnknownIDError
-            If `id_` does not correspond to any object
+        TypeError
+            If `id_` is not a numerical or text type
         """
         # Most IDs in the database are numerical, but some (e.g., IDs used for
         # the User object) are strings. Moreover, some integer IDs are passed
@@ -178,8 +300,7 @@ class QiitaObject(object):
         if not isinstance(id_, (int, long, str, unicode)):
             raise TypeError("id_ must be a numerical or text type (not %s) "
                             "when instantiating "
-                            "%s" % (id_.__class__.__name__,
-                                    self.__class__.__name__))
+                            "%s" % (id_.__class__.__name__, cls.__name__))
 
         if isinstance(id_, (str, unicode)):
             if id_.isdigit():
@@ -187,18 +308,160 @@ class QiitaObject(object):
         elif isinstance(id_, long):
             id_ = int(id_)
 
+        return id_
+
+    @classmethod
+    def load_many(cls, ids):
+        r"""Instantiates multiple objects validating all of them at once
+
+        Parameters
+        ----------
+        ids : iterable of int, long, str, or unicode
+            The object identifiers
+
+        Returns
+        -------
+        list of QiitaObject
+            The objects, in the same order as `ids`
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If any of the `ids` does not correspond to any object
+        QiitaDBError
+            If any of the objects is inaccessible in the current portal
+
+        Notes
+        -----
+        The existence and portal checks of the objects not present in the
+        identity map are done with a single query. Subclasses that overwrite
+        `_check_id` (i.e. the ones not following the table layout
+        conventions) are validated one by one.
+        """
+        ids = [cls._normalize_id(id_) for id_ in ids]
+
+        with qdb.sql_connection.TRN:
+            cls._check_subclass()
+            to_check = set(id_ for id_ in ids if not cls._is_cached(id_))
+
+            if to_check and (cls._check_id.__func__ is
+                             QiitaObject._check_id.__func__):
+                if cls._portal_table is None:
+                    portal_sql = "TRUE"
+                    sql_args = [tuple(to_check)]
+                else:
+                    portal_sql = """{0}_id IN (
+                        SELECT {0}_id
+                        FROM qiita.{1}
+                            JOIN qiita.portal_type USING (portal_type_id)
+                        WHERE portal = %s)""".format(cls._table,
+                                                     cls._portal_table)
+                    sql_args = [qiita_config.portal, tuple(to_check)]
+                sql = """SELECT {0}_id, {1}
+                         FROM qiita.{0}
+                         WHERE {0}_id IN %s""".format(cls._table, portal_sql)
+                qdb.sql_connection.TRN.add(sql, sql_args)
+                in_portal = dict(qdb.sql_connection.TRN.execute_fetchindex())
+
+                for id_ in (i for i in ids if i in to_check):
+                    if id_ not in in_portal:
+                        raise qdb.exceptions.QiitaDBUnknownIDError(
+                            id_, cls._table)
+                    if not in_portal[id_]:
+                        raise qdb.exceptions.QiitaDBError(
+                            "%s with id %s inaccessible in current portal: %s"
+                            % (cls.__name__, id_, qiita_config.portal))
+
+                for id_ in to_check:
+                    cls._add_to_cache(id_)
+
+            # All the objects validated above are in the identity map of the
+            # transaction, so the constructor does not query the database
+            return [cls(id_) for id_ in ids]
+
+    def __init__(self, id_):
+        r"""Initializes the object
+
+        Parameters
+        ----------
+        id_: int, long, str, or unicode
+            the object identifier
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If `id_` does not correspond to any object
+        """
+        id_ = self._normalize_id(id_)
+
         with qdb.sql_connection.TRN:
             self._check_subclass()
-            if not self._check_id(id_):
-                raise qdb.exceptions.QiitaDBUnknownIDError(id_, self._table)
+            if not self._is_cached(id_):
+                if not self._check_id(id_):
+                    raise qdb.exceptions.QiitaDBUnknownIDError(
+                        id_, self._table)
+
+                if not self._check_portal(id_):
+                    raise qdb.exceptions.QiitaDBError(
+                        "%s with id %d inaccessible in current portal: %s"
+                        % (self.__class__.__name__, id_, qiita_config.portal))
 
-            if not self._check_portal(id_):
-                raise qdb.exceptions.QiitaDBError(
-                    "%s with id %d inaccessible in current portal: %s"
-                    % (self.__class__.__name__, id_, qiita_config.portal))
+                self._add_to_cache(id_)
 
         self._id = id_
 
+    def hydrate(self):
+        r"""Enables the hydrated mode of the object
+
+        In hydrated mode, the first time that a property supporting it is
+        read, the whole row of the object is retrieved with a single query.
+        Later reads are served from memory until a setter of the object
+        invalidates them.
+
+        Returns
+        -------
+        QiitaObject
+            The object itself, so calls can be chained
+
+        Raises
+        ------
+        IncompetentQiitaDeveloperError
+            If the subclass does not support the hydrated mode
+
+        Notes
+        -----
+        Only the modifications done through this object invalidate the
+        retrieved row, so the hydrated mode should only be used with
+        short-lived objects (e.g. when rendering a page).
+        """
+        if self._hydrate_sql is None:
+            raise IncompetentQiitaDeveloperError(
+                "%s does not support the hydrated mode"
+                % self.__class__.__name__)
+        self._hydrated = True
+        self._row = None
+        return self
+
+    @property
+    def _hydrated_row(self):
+        r"""The row of the object retrieved with `_hydrate_sql`
+
+        Returns
+        -------
+        dict of {str: object}
+            The values of the row keyed by column name
+        """
+        if self._row is None:
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.add(self._hydrate_sql, [self.id])
+                self._row = dict(
+                    qdb.sql_connection.TRN.execute_fetchindex()[0])
+        return self._row
+
+    def _invalidate_row(self):
+        r"""Discards the row retrieved in hydrated mode, if any"""
+        self._row = None
+
     def __eq__(self, other):
         r"""Self and other are equal based on type and database id"""
         if type(self) != type(other):
@@ -309,6 +309,9 @@ def drop_and_rebuild_tst_database():
     """
     with qdb.sql_connection.TRN:
         r_client.flushdb()
+        # The objects cached in this process do not exist anymore
+        qdb.base.clear_object_cache()
+        qdb.util.clear_table_catalogue()
         # Drop the schema
         qdb.sql_connection.TRN.add("DROP SCHEMA IF EXISTS qiita CASCADE")
         # Set the database to unpatched
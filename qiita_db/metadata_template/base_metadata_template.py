@@ -51,6 +51,11 @@ from qiita_core.exceptions import IncompetentQiitaDeveloperError
 import qiita_db as qdb
 
 
+# Maximum number of samples whose values are updated in a single query by
+# MetadataTemplate.update
+UPDATE_BATCH_SIZE = 1000
+
+
 class BaseSample(qdb.base.QiitaObject):
     r"""Sample object that accesses the db to get the information of a sample
     belonging to a PrepTemplate or a SampleTemplate.
@@ -569,15 +574,12 @@ class MetadataTemplate(qdb.base.QiitaObject):
                         sample_id varchar NOT NULL, {1}
                      )""".format(table_name, ', '.join(column_datatype))
             qdb.sql_connection.TRN.add(sql)
+            qdb.util.bump_table_catalogue_version()
 
-            values = [list(md_template[h]) for h in headers]
-            values.insert(0, sample_ids)
-            values = [list(v) for v in zip(*values)]
-            sql = """INSERT INTO qiita.{0} (sample_id, {1})
-                     VALUES (%s, {2})""".format(
-                table_name, ", ".join(headers),
-                ', '.join(["%s"] * len(headers)))
-            qdb.sql_connection.TRN.add(sql, values, many=True)
+            # Bulk load the values, the first value of each row is the index
+            qdb.sql_connection.TRN.copy_from(
+                "qiita.%s" % table_name, ['sample_id'] + headers,
+                md_template[headers].itertuples())
 
             # Execute all the steps
             qdb.sql_connection.TRN.execute()
@@ -658,7 +660,7 @@ class MetadataTemplate(qdb.base.QiitaObject):
             sql = 'ALTER TABLE qiita.%s%d DROP COLUMN %s' % (
                 self._table_prefix, self._id, column_name)
             qdb.sql_connection.TRN.add(sql)
-            qdb.sql_connection.TRN.execute()
+            qdb.util.bump_table_catalogue_version()
 
             self.generate_files()
 
@@ -747,6 +749,7 @@ class MetadataTemplate(qdb.base.QiitaObject):
                 for category in new_cols:
                     qdb.sql_connection.TRN.add(
                         sql_alter.format(table_name, category, 'varchar'))
+                qdb.util.bump_table_catalogue_version()
 
                 if existing_samples:
                     # The values for the new columns are the only ones that get
@@ -785,15 +788,10 @@ class MetadataTemplate(qdb.base.QiitaObject):
                                                    self._id_column)
                 qdb.sql_connection.TRN.add(sql, values, many=True)
 
-                # Insert values on custom table
-                values = [list(md_filtered[h]) for h in md_filtered]
-                values.insert(0, new_samples)
-                values = [list(v) for v in zip(*values)]
-                sql = """INSERT INTO qiita.{0} (sample_id, {1})
-                         VALUES (%s, {2})""".format(
-                    table_name, ", ".join(headers),
-                    ', '.join(["%s"] * len(headers)))
-                qdb.sql_connection.TRN.add(sql, values, many=True)
+                # Bulk load the values on custom table
+                qdb.sql_connection.TRN.copy_from(
+                    "qiita.%s" % table_name, ['sample_id'] + headers,
+                    md_filtered[headers].itertuples())
 
             # Execute all the steps
             qdb.sql_connection.TRN.execute()
@@ -1032,9 +1030,7 @@ class MetadataTemplate(qdb.base.QiitaObject):
             file
         """
         with qdb.sql_connection.TRN:
-            df = self.to_dataframe()
-            if samples is not None:
-                df = df.loc[samples]
+            df = self.to_dataframe(samples=samples)
 
             # Sorting the dataframe so multiple serializations of the metadata
             # template are consistent.
@@ -1045,30 +1041,56 @@ class MetadataTemplate(qdb.base.QiitaObject):
             df.to_csv(fp, index_label='sample_name', na_rep="", sep='\t',
                       encoding='utf-8')
 
-    def to_dataframe(self):
+    def to_dataframe(self, samples=None, columns=None):
         """Returns the metadata template as a dataframe
 
+        Parameters
+        ----------
+        samples : iterable of str, optional
+            If supplied, only the specified samples are returned
+        columns : iterable of str, optional
+            If supplied, only the specified columns are returned
+
         Returns
         -------
         pandas DataFrame
             The metadata in the template,indexed on sample id
+
+        Raises
+        ------
+        QiitaDBColumnError
+            If any of `columns` is not present in the template
         """
         with qdb.sql_connection.TRN:
-            # Retrieve all the information from the database
-            sql = "SELECT * FROM qiita.{0}".format(self._table_name(self._id))
-            qdb.sql_connection.TRN.add(sql)
-            meta = qdb.sql_connection.TRN.execute_fetchindex()
-
-            # When we create the dataframe, we are providing a matrix (list of
-            # lists) with all the data, so we need to make sure that all the
-            # rows contain the columns in the same order
-            cols = sorted(meta[0].keys())
-            meta_matrix = [[r[c] for c in cols] for r in meta]
-            df = pd.DataFrame(meta_matrix, columns=cols, dtype=str)
-
-            # Make sure that we are changing np.NaN by Nones
-            df.where((pd.notnull(df)), None)
-            df.set_index('sample_id', inplace=True, drop=True)
+            categories = self.categories()
+            if columns is None:
+                columns = categories
+            else:
+                missing = set(columns).difference(categories)
+                if missing:
+                    raise qdb.exceptions.QiitaDBColumnError(
+                        "Column(s) %s do not exist in %s" % (
+                            ', '.join(sorted(missing)),
+                            self._table_name(self._id)))
+            columns = sorted(set(columns))
+
+            sql = "SELECT sample_id{0} FROM qiita.{1}".format(
+                ''.join(', %s' % c for c in columns),
+                self._table_name(self._id))
+            sql_args = None
+            if samples is not None:
+                sql = "%s WHERE sample_id = ANY(%%s)" % sql
+                sql_args = [list(samples)]
+
+            # Stream the values straight into pandas. NULL values are written
+            # as \N, so they can be told apart from the empty strings
+            with qdb.sql_connection.TRN.copy_to(
+                    sql, sql_args, options="CSV HEADER NULL '\\N'") as data:
+                df = pd.read_csv(data, dtype=str, index_col='sample_id',
+                                 keep_default_na=False)
+
+            # Make sure that we are changing the NULL values by Nones
+            df = df.where(df != '\\N', None)
             id_column_name = 'qiita_%sid' % (self._table_prefix)
             if id_column_name == 'qiita_sample_id':
                 id_column_name = 'qiita_study_id'
@@ -1133,13 +1155,23 @@ class MetadataTemplate(qdb.base.QiitaObject):
             self.validate(self.columns_restrictions)
             self.generate_files()
 
-    def _update(self, md_template):
+    def _update(self, md_template, dry_run=False):
         r"""Update values in the template
 
         Parameters
         ----------
         md_template : DataFrame
             The metadata template file contents indexed by samples ids
+        dry_run : bool, optional
+            If True, the differences are computed and validated but the
+            template is not modified. Default: False
+
+        Returns
+        -------
+        DataFrame
+            The cells that differ between the DB and `md_template`, indexed by
+            (sample_name, column), with the current values in the column
+            'from' and the new values in the column 'to'
 
         Raises
         ------
@@ -1152,30 +1184,28 @@ class MetadataTemplate(qdb.base.QiitaObject):
             passed md_template
         """
         with qdb.sql_connection.TRN:
-            # Retrieving current metadata
-            current_map = self.to_dataframe()
-
             # simple validations of sample ids and column names
-            samples_diff = set(md_template.index).difference(current_map.index)
+            samples_diff = set(md_template.index).difference(self.keys())
             if samples_diff:
                 raise qdb.exceptions.QiitaDBError(
                     'The new template differs from what is stored '
                     'in database by these samples names: %s'
                     % ', '.join(samples_diff))
 
-            if not set(current_map.columns).issuperset(md_template.columns):
+            if not set(self.categories()).issuperset(md_template.columns):
                 columns_diff = set(md_template.columns).difference(
-                    current_map.columns)
+                    self.categories())
                 raise qdb.exceptions.QiitaDBError(
                     'Some of the columns in your template are not present in '
                     'the system. Use "extend" if you want to add more columns '
                     'to the template. Missing columns: %s'
                     % ', '.join(columns_diff))
 
-            # In order to speed up some computation, let's compare only the
-            # common columns and rows. current_map.columns and
-            # current_map.index are supersets of md_template.columns and
-            # md_template.index, respectivelly, so this will not fail
+            # Retrieving current metadata. In order to speed up some
+            # computation, let's retrieve only the common columns and rows,
+            # in the same order as md_template
+            current_map = self.to_dataframe(
+                samples=md_template.index, columns=md_template.columns)
             current_map = current_map[
                 md_template.columns].loc[md_template.index]
 
@@ -1192,25 +1222,29 @@ class MetadataTemplate(qdb.base.QiitaObject):
             # by using ne_stacked to index himself, we get only the columns
             # that did change (see boolean indexing in pandas docs)
             changed = ne_stacked[ne_stacked]
-            if changed.empty:
-                warnings.warn(
-                    "There are no differences between the data stored in the "
-                    "DB and the new data provided",
-                    qdb.exceptions.QiitaDBWarning)
-                return
-
             changed.index.names = ['sample_name', 'column']
             # the combination of np.where and boolean indexing produces
             # a numpy array with only the values that actually changed
             # between the current_map and md_template
-            changed_to = md_template.values[np.where(diff_map)]
+            changed_cells = np.where(diff_map)
 
             # to_update is a MultiIndexed DataFrame, in which the index 0 is
             # the samples and the index 1 is the columns, we define these
             # variables here so we don't put magic numbers across the code
             sample_idx = 0
             col_idx = 1
-            to_update = pd.DataFrame({'to': changed_to}, index=changed.index)
+            to_update = pd.DataFrame(
+                {'from': current_map.values[changed_cells],
+                 'to': md_template.values[changed_cells]},
+                index=changed.index, columns=['from', 'to'])
+
+            if changed.empty:
+                if not dry_run:
+                    warnings.warn(
+                        "There are no differences between the data stored in "
+                        "the DB and the new data provided",
+                        qdb.exceptions.QiitaDBWarning)
+                return to_update
 
             # Get the columns that we need to change
             indices = list(set(to_update.index.labels[col_idx]))
@@ -1223,39 +1257,61 @@ class MetadataTemplate(qdb.base.QiitaObject):
                     'deleting the processed data. You are trying to modify: %s'
                     % ', '.join(cols_to_update))
 
+            if dry_run:
+                return to_update
+
             # Get the samples that we need to change
             indices = list(set(to_update.index.labels[sample_idx]))
             samples_to_update = to_update.index.levels[sample_idx][indices]
 
+            # Send the new values of each batch of samples in a single
+            # multi-row VALUES. All the values are cast to varchar (the type
+            # of the template columns) as, unlike in a single row VALUES,
+            # postgres needs the same type in all the rows of a column
             sql_eq_cols = ', '.join(
                 ["{0} = c.{0}".format(col) for col in cols_to_update])
             # We add 1 because we need to add the sample name
             single_value = "(%s)" % ', '.join(
-                ["%s"] * (len(cols_to_update) + 1))
+                ["%s::varchar"] * (len(cols_to_update) + 1))
             sql_cols = ', '.join(cols_to_update)
-
             sql = """UPDATE qiita.{0} AS t SET
                         {1}
-                     FROM (VALUES {2})
-                        AS c(sample_id, {3})
+                     FROM (VALUES {{0}})
+                        AS c(sample_id, {2})
                      WHERE c.sample_id = t.sample_id
                     """.format(self._table_name(self._id), sql_eq_cols,
-                               single_value, sql_cols)
-            for sample in samples_to_update:
-                sample_vals = [md_template[col][sample]
-                               for col in cols_to_update]
-                sample_vals.insert(0, sample)
-                qdb.sql_connection.TRN.add(sql, sample_vals)
+                               sql_cols)
+            # itertuples returns the sample name as the first value
+            values = list(md_template.loc[
+                samples_to_update, cols_to_update].itertuples())
+            for i in range(0, len(values), UPDATE_BATCH_SIZE):
+                batch = values[i:i + UPDATE_BATCH_SIZE]
+                qdb.sql_connection.TRN.add(
+                    sql.format(', '.join([single_value] * len(batch))),
+                    list(chain.from_iterable(batch)))
 
             qdb.sql_connection.TRN.execute()
 
-    def update(self, md_template):
+            return to_update
+
+    def update(self, md_template, dry_run=False):
         r"""Update values in the template
 
         Parameters
         ----------
         md_template : DataFrame
             The metadata template file contents indexed by samples ids
+        dry_run : bool, optional
+            If True, the template is validated and the differences with the
+            stored values are returned, but the template is not modified.
+            Default: False
+
+        Returns
+        -------
+        DataFrame
+            The cells that differ between the DB and `md_template`, indexed by
+            (sample_name, column), with the current values in the column
+            'from' and the new values in the column 'to'
 
         Raises
         ------
@@ -1271,9 +1327,11 @@ class MetadataTemplate(qdb.base.QiitaObject):
             # Clean and validate the metadata template given
             new_map = self._clean_validate_template(
                 md_template, self.study_id, current_columns=self.categories())
-            self._update(new_map)
-            self.validate(self.columns_restrictions)
-            self.generate_files()
+            diff = self._update(new_map, dry_run=dry_run)
+            if not dry_run:
+                self.validate(self.columns_restrictions)
+                self.generate_files()
+            return diff
 
     def extend_and_update(self, md_template):
         """Performs the update and extend operations at once
@@ -1311,21 +1369,40 @@ class MetadataTemplate(qdb.base.QiitaObject):
         QiitaDBUnknownIDError
             If a sample_id is included in values that is not in the template
         QiitaDBColumnError
-            If the column does not exist in the table. This is implicit, and
-            can be thrown by the contained Samples.
+            If the column does not exist in the table
+
+        Notes
+        -----
+        All the values are written with a single UPDATE
         """
         with qdb.sql_connection.TRN:
-            if not set(self.keys()).issuperset(samples_and_values):
-                missing = set(self.keys()) - set(samples_and_values)
-                table_name = self._table_name(self._id)
+            table_name = self._table_name(self._id)
+            missing = set(samples_and_values).difference(self.keys())
+            if missing:
                 raise qdb.exceptions.QiitaDBUnknownIDError(missing, table_name)
 
+            if category not in self.categories():
+                raise qdb.exceptions.QiitaDBColumnError(
+                    "Column %s does not exist in %s" % (category, table_name))
+
+            if not samples_and_values:
+                return
+
+            values = []
             for k, v in viewitems(samples_and_values):
-                sample = self[k]
                 if isinstance(v, np.generic):
                     v = np.asscalar(v)
-                sample.setitem(category, v)
-
+                values.extend([k, v])
+
+            # The values are cast to varchar (the type of the template
+            # columns) as postgres needs the same type in all the rows of a
+            # column in a multi-row VALUES
+            sql = """UPDATE qiita.{0} AS t SET {1} = c.value
+                     FROM (VALUES {2}) AS c(sample_id, value)
+                     WHERE c.sample_id = t.sample_id""".format(
+                table_name, category,
+                ', '.join(["(%s, %s::varchar)"] * len(samples_and_values)))
+            qdb.sql_connection.TRN.add(sql, values)
             qdb.sql_connection.TRN.execute()
 
     def get_category(self, category):
@@ -12,6 +12,8 @@ from itertools import chain
 from os.path import join
 from time import strftime
 from copy import deepcopy
+from hashlib import sha256
+from json import dumps
 import warnings
 from skbio.util import find_duplicates
 
@@ -256,6 +258,7 @@ class PrepTemplate(MetadataTemplate):
             # Drop the prep_X table
             sql = "DROP TABLE qiita.{0}".format(table_name)
             qdb.sql_connection.TRN.add(sql)
+            qdb.util.bump_table_catalogue_version()
 
             # Remove the rows from prep_template_samples
             sql = "DELETE FROM qiita.{0} WHERE {1} = %s".format(
@@ -274,6 +277,8 @@ class PrepTemplate(MetadataTemplate):
 
             qdb.sql_connection.TRN.execute()
 
+            cls._remove_from_cache([id_])
+
     def data_type(self, ret_id=False):
         """Returns the data_type or the data_type id
 
@@ -492,13 +497,107 @@ class PrepTemplate(MetadataTemplate):
             # creating QIIME mapping file
             self.create_qiime_mapping_file()
 
-    def create_qiime_mapping_file(self):
+    @staticmethod
+    def qiime_mapping(prep, sample):
+        """Combines the prep and sample metadata in a QIIME mapping
+
+        Parameters
+        ----------
+        prep : pandas.DataFrame
+            The prep template metadata, indexed by sample id
+        sample : pandas.DataFrame
+            The sample template metadata, indexed by sample id. It can contain
+            more samples than `prep`
+
+        Returns
+        -------
+        pandas.DataFrame, list of str
+            The QIIME-compliant mapping of the samples in `prep` and the
+            QIIME-required columns that were not present, which are populated
+            with the value XXQIITAXX
+
+        Notes
+        -----
+        The columns present in both templates are suffixed with "_prep" in the
+        columns of the prep template
+        """
+        rename_cols = {
+            'barcode': 'BarcodeSequence',
+            'primer': 'LinkerPrimerSequence',
+            'description': 'Description',
+        }
+
+        if 'reverselinkerprimer' in prep.columns:
+            rename_cols['reverselinkerprimer'] = 'ReverseLinkerPrimer'
+            new_cols = ['BarcodeSequence', 'LinkerPrimerSequence',
+                        'ReverseLinkerPrimer']
+        else:
+            new_cols = ['BarcodeSequence', 'LinkerPrimerSequence']
+
+        mapping = prep.join(sample, lsuffix="_prep")
+        mapping.rename(columns=rename_cols, inplace=True)
+
+        # Pre-populate the QIIME-required columns with the value XXQIITAXX
+        index = mapping.index
+        placeholder = ['XXQIITAXX'] * len(index)
+        missing = []
+        for val in viewvalues(rename_cols):
+            if val not in mapping:
+                missing.append(val)
+                mapping[val] = pd.Series(placeholder, index=index)
+
+        # Gets the orginal mapping columns and readjust the order to comply
+        # with QIIME requirements
+        cols = mapping.columns.values.tolist()
+        cols.remove('BarcodeSequence')
+        cols.remove('LinkerPrimerSequence')
+        cols.remove('Description')
+        new_cols.extend(cols)
+        new_cols.append('Description')
+        return mapping[new_cols], missing
+
+    @staticmethod
+    def _qiime_mapping_hash(mapping):
+        """Computes a content hash of a QIIME mapping
+
+        Parameters
+        ----------
+        mapping : pandas.DataFrame
+            The QIIME mapping, as returned by `qiime_mapping`
+
+        Returns
+        -------
+        str
+            The hex digest of the sha256 of the mapping, as it would be
+            written to the QIIME mapping file. It doesn't depend on the order
+            of the rows
+        """
+        h = sha256()
+        h.update(dumps(mapping.columns.tolist()))
+        for sid, row in mapping.fillna('').sort_index().iterrows():
+            h.update(dumps([sid] + row.tolist()))
+        return h.hexdigest()
+
+    def create_qiime_mapping_file(self, sample_template=None, force=True):
         """This creates the QIIME mapping file and links it in the db.
 
+        Parameters
+        ----------
+        sample_template : pandas.DataFrame, optional
+            The metadata of the sample template of the study, as returned by
+            `SampleTemplate.to_dataframe`. If not provided, the latest sample
+            template file of the study is used. Useful to avoid reading the
+            sample template once per prep template of the study
+        force : bool, optional
+            If False, the QIIME mapping file is only created if its contents
+            differ from the ones of the current QIIME mapping file. Default:
+            True
+
         Returns
         -------
         filepath : str
-            The filepath of the created QIIME mapping file
+            The filepath of the created QIIME mapping file, or the filepath of
+            the current one if it is up to date
 
         Raises
         ------
@@ -514,32 +613,28 @@ class PrepTemplate(MetadataTemplate):
         file. Since the user may need a QIIME mapping file, but not these
         QIIME-required columns, we are going to create them and
         populate them with the value XXQIITAXX.
+
+        The hash of the contents of the QIIME mapping file is stored in the
+        database, so the QIIME mapping file can be skipped when the sample
+        and prep metadata contributing to it didn't change.
         """
         with qdb.sql_connection.TRN:
-            rename_cols = {
-                'barcode': 'BarcodeSequence',
-                'primer': 'LinkerPrimerSequence',
-                'description': 'Description',
-            }
-
-            if 'reverselinkerprimer' in self.categories():
-                rename_cols['reverselinkerprimer'] = 'ReverseLinkerPrimer'
-                new_cols = ['BarcodeSequence', 'LinkerPrimerSequence',
-                            'ReverseLinkerPrimer']
+            if sample_template is None:
+                # Retrieve the latest sample template
+                # Since we sorted the filepath retrieval, the first result
+                # contains the filepath that we want. `retrieve_filepaths`
+                # returns a 3-tuple, in which the fp is the second element
+                sample_template_fp = qdb.util.retrieve_filepaths(
+                    "sample_template_filepath", "study_id", self.study_id,
+                    sort='descending')[0][1]
+                source = "file: %s" % sample_template_fp
+
+                # reading files via pandas
+                st = qdb.metadata_template.util.load_template_to_dataframe(
+                    sample_template_fp)
             else:
-                new_cols = ['BarcodeSequence', 'LinkerPrimerSequence']
-
-            # Retrieve the latest sample template
-            # Since we sorted the filepath retrieval, the first result contains
-            # the filepath that we want. `retrieve_filepaths` returns a
-            # 3-tuple, in which the fp is the second element
-            sample_template_fp = qdb.util.retrieve_filepaths(
-                "sample_template_filepath", "study_id", self.study_id,
-                sort='descending')[0][1]
-
-            # reading files via pandas
-            st = qdb.metadata_template.util.load_template_to_dataframe(
-                sample_template_fp)
+                source = "study: %d" % self.study_id
+                st = sample_template
             pt = self.to_dataframe()
 
             st_sample_names = set(st.index)
@@ -548,21 +643,20 @@ class PrepTemplate(MetadataTemplate):
             if not pt_sample_names.issubset(st_sample_names):
                 raise ValueError(
                     "Prep template is not a sub set of the sample template, "
-                    "file: %s - samples: %s"
-                    % (sample_template_fp,
-                       ', '.join(pt_sample_names-st_sample_names)))
-
-            mapping = pt.join(st, lsuffix="_prep")
-            mapping.rename(columns=rename_cols, inplace=True)
-
-            # Pre-populate the QIIME-required columns with the value XXQIITAXX
-            index = mapping.index
-            placeholder = ['XXQIITAXX'] * len(index)
-            missing = []
-            for val in viewvalues(rename_cols):
-                if val not in mapping:
-                    missing.append(val)
-                    mapping[val] = pd.Series(placeholder, index=index)
+                    "%s - samples: %s"
+                    % (source, ', '.join(pt_sample_names-st_sample_names)))
+
+            mapping, missing = self.qiime_mapping(pt, st)
+            mapping_hash = self._qiime_mapping_hash(mapping)
+
+            if not force:
+                sql = """SELECT qiime_map_hash FROM qiita.prep_template
+                         WHERE prep_template_id = %s"""
+                qdb.sql_connection.TRN.add(sql, [self.id])
+                current_fp = self.qiime_map_fp
+                if (current_fp is not None and mapping_hash ==
+                        qdb.sql_connection.TRN.execute_fetchlast()):
+                    return current_fp
 
             if missing:
                 warnings.warn(
@@ -573,16 +667,6 @@ class PrepTemplate(MetadataTemplate):
                     % ', '.join(sorted(missing)),
                     qdb.exceptions.QiitaDBWarning)
 
-            # Gets the orginal mapping columns and readjust the order to comply
-            # with QIIME requirements
-            cols = mapping.columns.values.tolist()
-            cols.remove('BarcodeSequence')
-            cols.remove('LinkerPrimerSequence')
-            cols.remove('Description')
-            new_cols.extend(cols)
-            new_cols.append('Description')
-            mapping = mapping[new_cols]
-
             # figuring out the filepath for the QIIME map file
             _id, fp = qdb.util.get_mountpoint('templates')[0]
             filepath = join(fp, '%d_prep_%d_qiime_%s.txt' % (self.study_id,
@@ -597,6 +681,11 @@ class PrepTemplate(MetadataTemplate):
                 filepath,
                 fp_id=qdb.util.convert_to_id("qiime_map", "filepath_type"))
 
+            sql = """UPDATE qiita.prep_template SET qiime_map_hash = %s
+                     WHERE prep_template_id = %s"""
+            qdb.sql_connection.TRN.add(sql, [mapping_hash, self.id])
+            qdb.sql_connection.TRN.execute()
+
             return filepath
 
     @property
@@ -134,6 +134,7 @@ class SampleTemplate(MetadataTemplate):
 
             sql = "DROP TABLE qiita.{0}".format(table_name)
             qdb.sql_connection.TRN.add(sql)
+            qdb.util.bump_table_catalogue_version()
 
             sql = "DELETE FROM qiita.{0} WHERE {1} = %s".format(
                 cls._table, cls._id_column)
@@ -141,6 +142,8 @@ class SampleTemplate(MetadataTemplate):
 
             qdb.sql_connection.TRN.execute()
 
+            cls._remove_from_cache([id_])
+
     @property
     def study_id(self):
         """Gets the study id with which this sample template is associated
@@ -251,9 +254,11 @@ class SampleTemplate(MetadataTemplate):
             fp_id = qdb.util.convert_to_id("sample_template", "filepath_type")
             self.add_filepath(fp, fp_id=fp_id)
 
-            # generating all new QIIME mapping files
+            # generating the QIIME mapping files that changed, the prep
+            # template files are not affected by the sample template
+            st = self.to_dataframe()
             for pt in qdb.study.Study(self._id).prep_templates():
-                pt.generate_files()
+                pt.create_qiime_mapping_file(sample_template=st, force=False)
 
     @property
     def ebi_sample_accessions(self):
@@ -915,6 +915,43 @@ class TestPrepTemplate(TestCase):
         # the contents of the files have been tested elsewhere.
         self.assertEqual(obs, fp_count + 2)
 
+    def test_qiime_mapping(self):
+        prep = pd.DataFrame.from_dict(
+            {'S1': {'barcode': 'AAAA', 'primer': 'GTCA', 'center': 'ANL'},
+             'S2': {'barcode': 'CCCC', 'primer': 'GTCA', 'center': 'ANL'}},
+            orient='index')
+        sample = pd.DataFrame.from_dict(
+            {'S1': {'description': 'Sample 1', 'center': 'UCSD'},
+             'S2': {'description': 'Sample 2', 'center': 'UCSD'},
+             'S3': {'description': 'Sample 3', 'center': 'UCSD'}},
+            orient='index')
+        obs, obs_missing = \
+            qdb.metadata_template.prep_template.PrepTemplate.qiime_mapping(
+                prep, sample)
+        exp = pd.DataFrame.from_dict(
+            {'S1': {'BarcodeSequence': 'AAAA', 'LinkerPrimerSequence': 'GTCA',
+                    'center_prep': 'ANL', 'center': 'UCSD',
+                    'Description': 'Sample 1'},
+             'S2': {'BarcodeSequence': 'CCCC', 'LinkerPrimerSequence': 'GTCA',
+                    'center_prep': 'ANL', 'center': 'UCSD',
+                    'Description': 'Sample 2'}},
+            orient='index')
+        exp_cols = ['BarcodeSequence', 'LinkerPrimerSequence']
+        exp_cols.extend(c for c in obs.columns if c not in (
+            'BarcodeSequence', 'LinkerPrimerSequence', 'Description'))
+        exp_cols.append('Description')
+        self.assertEqual(obs.columns.tolist(), exp_cols)
+        assert_frame_equal(obs, exp[exp_cols])
+        self.assertEqual(obs_missing, [])
+
+        # Missing the required columns
+        obs, obs_missing = \
+            qdb.metadata_template.prep_template.PrepTemplate.qiime_mapping(
+                prep.drop('primer', axis=1), sample)
+        self.assertEqual(obs_missing, ['LinkerPrimerSequence'])
+        self.assertEqual(obs['LinkerPrimerSequence'].tolist(),
+                         ['XXQIITAXX', 'XXQIITAXX'])
+
     def test_create_qiime_mapping_file(self):
         pt = qdb.metadata_template.prep_template.PrepTemplate(1)
 
@@ -934,6 +971,27 @@ class TestPrepTemplate(TestCase):
 
         assert_frame_equal(obs, exp)
 
+    def test_create_qiime_mapping_file_unchanged(self):
+        pt = qdb.metadata_template.prep_template.PrepTemplate(1)
+        st = qdb.metadata_template.sample_template.SampleTemplate(
+            1).to_dataframe()
+
+        obs_fp = pt.create_qiime_mapping_file(sample_template=st)
+        self._clean_up_files.append(obs_fp)
+        fp_count = qdb.util.get_count("qiita.filepath")
+
+        # The metadata didn't change, so the current file is reused
+        obs = pt.create_qiime_mapping_file(sample_template=st, force=False)
+        self.assertEqual(obs, obs_fp)
+        self.assertEqual(qdb.util.get_count("qiita.filepath"), fp_count)
+
+        # Changing the sample metadata generates a new file
+        st.loc['1.SKB8.640193', 'season_environment'] = 'summer'
+        obs = pt.create_qiime_mapping_file(sample_template=st, force=False)
+        self._clean_up_files.append(obs)
+        self.assertEqual(qdb.util.get_count("qiita.filepath"), fp_count + 1)
+        self.assertEqual(pt.qiime_map_fp, obs)
+
     def test_create_data_type_id(self):
         """Creates a new PrepTemplate passing the data_type_id"""
         fp_count = qdb.util.get_count('qiita.filepath')
@@ -14,6 +14,7 @@ from collections import Iterable
 from warnings import catch_warnings
 from time import time
 
+import numpy as np
 import numpy.testing as npt
 import pandas as pd
 from pandas.util.testing import assert_frame_equal
@@ -1199,6 +1200,12 @@ class TestSampleTemplate(TestCase):
         self.assertEqual(self.tester['1.SKD6.640190']['country'], "3")
         self.assertEqual(self.tester['1.SKM7.640188']['country'], negtest)
 
+        # numpy values and empty mappings
+        self.tester.update_category('country', {'1.SKB1.640202': np.int64(4)})
+        self.assertEqual(self.tester['1.SKB1.640202']['country'], "4")
+        self.tester.update_category('country', {})
+        self.assertEqual(self.tester['1.SKB1.640202']['country'], "4")
+
     def test_update_equal(self):
         """It doesn't fail with the exact same template"""
         # Create a new sample tempalte
@@ -1253,6 +1260,49 @@ class TestSampleTemplate(TestCase):
         obs = {s_id: st[s_id]._to_dict() for s_id in st}
         self.assertEqual(obs, exp)
 
+    def test_update_dry_run(self):
+        st = qdb.metadata_template.sample_template.SampleTemplate.create(
+            self.metadata, self.new_study)
+        exp = {s_id: st[s_id]._to_dict() for s_id in st}
+        new_metadata = pd.DataFrame.from_dict(
+            {'Sample1': {'physical_specimen_location': 'CHANGE'}},
+            orient='index', dtype=str)
+        s_id = '%d.Sample1' % self.new_study.id
+        obs = st.update(new_metadata, dry_run=True)
+        self.assertEqual(obs.index.tolist(),
+                         [(s_id, 'physical_specimen_location')])
+        self.assertEqual(obs['from'].tolist(), ['location1'])
+        self.assertEqual(obs['to'].tolist(), ['CHANGE'])
+        # Nothing has been changed
+        obs = {s_id: st[s_id]._to_dict() for s_id in st}
+        self.assertEqual(obs, exp)
+
+        # The same values return an empty diff without warnings
+        obs = st.update(self.metadata, dry_run=True)
+        self.assertTrue(obs.empty)
+
+    def test_update_batches(self):
+        st = qdb.metadata_template.sample_template.SampleTemplate.create(
+            self.metadata, self.new_study)
+        new_metadata = pd.DataFrame.from_dict(
+            {'Sample1': {'physical_specimen_location': 'CHANGE1'},
+             'Sample2': {'physical_specimen_location': 'CHANGE2'},
+             'Sample3': {'physical_specimen_location': 'CHANGE3'}},
+            orient='index', dtype=str)
+        batch_size = qdb.metadata_template.base_metadata_template.\
+            UPDATE_BATCH_SIZE
+        qdb.metadata_template.base_metadata_template.UPDATE_BATCH_SIZE = 2
+        try:
+            obs = st.update(new_metadata)
+        finally:
+            qdb.metadata_template.base_metadata_template.UPDATE_BATCH_SIZE = \
+                batch_size
+        self.assertEqual(len(obs), 3)
+        for i in range(1, 4):
+            self.assertEqual(
+                st['%d.Sample%d' % (self.new_study.id, i)][
+                    'physical_specimen_location'], 'CHANGE%d' % i)
+
     def test_update_numpy(self):
         """Update values in existing mapping file with numpy values"""
         ST = qdb.metadata_template.sample_template.SampleTemplate
@@ -1285,9 +1335,15 @@ class TestSampleTemplate(TestCase):
         fp_count = qdb.util.get_count("qiita.filepath")
         self.tester.generate_files()
         obs = qdb.util.get_count("qiita.filepath")
-        # We just make sure that the count has been increased by 6, since
+        # We just make sure that the count has been increased by 3 (the sample
+        # template and the QIIME mapping files of its 2 prep templates), since
         # the contents of the files have been tested elsewhere.
-        self.assertEqual(obs, fp_count + 5)
+        self.assertEqual(obs, fp_count + 3)
+
+        # The QIIME mapping files are up to date, so only the sample template
+        # file is generated
+        self.tester.generate_files()
+        self.assertEqual(qdb.util.get_count("qiita.filepath"), obs + 1)
 
     def test_to_file(self):
         """to file writes a tab delimited file with all the metadata"""
@@ -1884,6 +1940,26 @@ class TestSampleTemplate(TestCase):
             'anonymized_name', 'tot_org_carb', 'description_duplicate',
             'env_feature', 'scientific_name', 'qiita_study_id'})
 
+    def test_to_dataframe_samples_columns(self):
+        obs = self.tester.to_dataframe(
+            samples=['1.SKB1.640202', '1.SKD6.640190'],
+            columns=['country', 'depth'])
+        exp = pd.DataFrame.from_dict(
+            {'1.SKB1.640202': {'country': 'GAZ:United States of America',
+                               'depth': '0.15', 'qiita_study_id': '1'},
+             '1.SKD6.640190': {'country': 'GAZ:United States of America',
+                               'depth': '0.15', 'qiita_study_id': '1'}},
+            orient='index', dtype=str)
+        exp.index.name = 'sample_id'
+        obs.sort_index(axis=0, inplace=True)
+        assert_frame_equal(obs, exp)
+
+        obs = self.tester.to_dataframe(samples=[])
+        self.assertTrue(obs.empty)
+
+        with self.assertRaises(qdb.exceptions.QiitaDBColumnError):
+            self.tester.to_dataframe(columns=['country', 'not a column'])
+
     def test_check_restrictions(self):
         obs = self.tester.check_restrictions(
             [qdb.metadata_template.constants.SAMPLE_TEMPLATE_COLUMNS['EBI']])
@@ -173,6 +173,16 @@ class TestUtil(TestCase):
             qdb.metadata_template.util.load_template_to_dataframe(
                 StringIO(bad))
 
+    def test_load_template_to_dataframe_non_utf8_error_location(self):
+        bad = EXP_SAMPLE_TEMPLATE.replace('Test Sample 2', 'Test Sample\x962')
+        bad = bad.replace('NotIdentified', 'Not\x96Identified', 1)
+        with self.assertRaises(ValueError) as error:
+            qdb.metadata_template.util.load_template_to_dataframe(
+                StringIO(bad))
+        obs = str(error.exception)
+        self.assertIn('"Test Sample&#128062;2" = (2, 2)', obs)
+        self.assertIn('"Not&#128062;Identified" = (1, 5)', obs)
+
     def test_load_template_to_dataframe_non_utf8(self):
         replace = EXP_SAMPLE_TEMPLATE.replace(
             'Test Sample 2', u'Test Sample\x962')
@@ -8,11 +8,11 @@
 
 from __future__ import division
 from future.utils import PY3, viewitems
-from six import StringIO
 from collections import defaultdict
+from itertools import chain
+from tempfile import TemporaryFile
 
 import pandas as pd
-import numpy as np
 import warnings
 from skbio.util import find_duplicates
 
@@ -55,6 +55,108 @@ def prefix_sample_names_with_id(md_template, study_id):
     md_template.index.name = None
 
 
+def _check_utf8_lines(lines, errors):
+    """Yields the lines of a template, recording the non UTF-8 fields
+
+    Parameters
+    ----------
+    lines : iterable of str
+        The lines of the template
+    errors : defaultdict of {str: list of str}
+        The offending fields, with the invalid characters replaced by
+        &#128062;, and their (row, column) locations. It is updated in place
+
+    Yields
+    ------
+    str
+        The lines of the template
+    """
+    for row, line in enumerate(lines):
+        try:
+            line.encode('utf-8')
+        except UnicodeDecodeError:
+            # only the offending lines are checked cell by cell
+            for col, block in enumerate(line.split('\t')):
+                try:
+                    block.encode('utf-8')
+                except UnicodeDecodeError:
+                    tblock = unicode(block, errors='replace')
+                    tblock = tblock.replace(u'\ufffd', '&#128062;')
+                    errors[tblock].append('(%d, %d)' % (row, col))
+        yield line
+
+
+def _raise_utf8_errors(errors):
+    """Raises the errors recorded by `_check_utf8_lines`, if any
+
+    Parameters
+    ----------
+    errors : dict of {str: list of str}
+        The offending fields and their (row, column) locations
+
+    Raises
+    ------
+    ValueError
+        If there are non UTF-8 characters
+    """
+    if errors:
+        raise ValueError(
+            "There are invalid (non UTF-8) characters in your information "
+            "file. The offending fields and their location (row, column) "
+            "are listed below, invalid characters are represented using "
+            "&#128062;: %s" % '; '.join(
+                ['"%s" = %s' % (k, ', '.join(v))
+                 for k, v in viewitems(errors)]))
+
+
+def _write_clean_lines(lines, out, clean_header):
+    """Writes the lines of a template with the values of their cells stripped
+
+    Parameters
+    ----------
+    lines : iterable of str
+        The lines of the template
+    out : file-like object
+        The file in which the lines are written, UTF-8 encoded
+    clean_header : bool
+        Whether the names of the controlled columns in the header (first line)
+        should be lowercased
+
+    Returns
+    -------
+    list of str or None
+        The duplicated column names in the header, or None if `lines` is
+        empty
+    """
+    duplicates = None
+    ccols = {'sample_name'}
+    ccols.update(qdb.metadata_template.constants.CONTROLLED_COLS)
+    for pos, line in enumerate(lines):
+        cols = line.split('\t')
+        if pos == 0 and clean_header:
+            # get and clean the controlled columns
+            newcols = [
+                c.lower().strip() if c.lower().strip() in ccols
+                else c.strip()
+                for c in cols]
+            duplicates = (find_duplicates(newcols)
+                          if len(set(newcols)) != len(newcols) else [])
+        else:
+            if pos == 0:
+                duplicates = []
+            # .strip will remove odd chars, newlines, tabs and multiple
+            # spaces but we need to read a new line at the end of the
+            # line(+'\n')
+            newcols = [d.strip(" \r\n") for d in cols]
+
+        newline = '\t'.join(newcols) + '\n'
+        if not isinstance(newline, bytes):
+            newline = newline.encode('utf-8')
+        out.write(newline)
+
+    return duplicates
+
+
 def load_template_to_dataframe(fn, index='sample_name'):
     """Load a sample/prep template or a QIIME mapping file into a data frame
 
@@ -95,84 +197,60 @@ def load_template_to_dataframe(fn, index='sample_name'):
 
     Everything in the DataFrame will be read and managed as string
     """
-    # Load in file lines
-    holdfile = None
-    with qdb.util.open_file(fn, mode='U') as f:
-        errors = defaultdict(list)
-        holdfile = f.readlines()
-        # here we are checking for non UTF-8 chars
-        for row, line in enumerate(holdfile):
-            for col, block in enumerate(line.split('\t')):
-                try:
-                    tblock = block.encode('utf-8')
-                except UnicodeDecodeError:
-                    tblock = unicode(block, errors='replace')
-                    tblock = tblock.replace(u'\ufffd', '&#128062;')
-                    errors[tblock].append('(%d, %d)' % (row, col))
-        if bool(errors):
-            raise ValueError(
-                "There are invalid (non UTF-8) characters in your information "
-                "file. The offending fields and their location (row, column) "
-                "are listed below, invalid characters are represented using "
-                "&#128062;: %s" % '; '.join(
-                    ['"%s" = %s' % (k, ', '.join(v))
-                     for k, v in viewitems(errors)]))
-
-    if not holdfile:
-        raise ValueError('Empty file passed!')
-
-    if index == "#SampleID":
-        # We're going to parse a QIIME mapping file. We are going to first
-        # parse it with the QIIME function so we can remove the comments
-        # easily and make sure that QIIME will accept this as a mapping file
-        data, headers, comments = _parse_mapping_file(holdfile)
-        holdfile = ["%s\n" % '\t'.join(d) for d in data]
-        holdfile.insert(0, "%s\n" % '\t'.join(headers))
-        # The QIIME parser fixes the index and removes the #
-        index = 'SampleID'
-
-    # Strip all values in the cells in the input file
-    for pos, line in enumerate(holdfile):
-        cols = line.split('\t')
-        if pos == 0 and index != 'SampleID':
-            # get and clean the controlled columns
-            ccols = {'sample_name'}
-            ccols.update(qdb.metadata_template.constants.CONTROLLED_COLS)
-            newcols = [
-                c.lower().strip() if c.lower().strip() in ccols
-                else c.strip()
-                for c in cols]
-
-            # while we are here, let's check for duplicate columns headers
-            if len(set(newcols)) != len(newcols):
-                raise qdb.exceptions.QiitaDBDuplicateHeaderError(
-                    find_duplicates(newcols))
-        else:
-            # .strip will remove odd chars, newlines, tabs and multiple
-            # spaces but we need to read a new line at the end of the
-            # line(+'\n')
-            newcols = [d.strip(" \r\n") for d in cols]
+    # The cleaned up contents of the file are streamed to a temporary file,
+    # so the contents of the template are not held in memory more than once
+    with TemporaryFile() as holdfile:
+        with qdb.util.open_file(fn, mode='U') as f:
+            errors = defaultdict(list)
+            lines = _check_utf8_lines(f, errors)
+            if index == "#SampleID":
+                # QIIME mapping files need to be parsed as a whole to remove
+                # the comments, but they are small
+                lines = list(lines)
+                _raise_utf8_errors(errors)
+                if not lines:
+                    raise ValueError('Empty file passed!')
+                # We're going to parse a QIIME mapping file. We are going to
+                # first parse it with the QIIME function so we can remove the
+                # comments easily and make sure that QIIME will accept this as
+                # a mapping file
+                data, headers, comments = _parse_mapping_file(lines)
+                lines = chain(['\t'.join(headers)],
+                              ('\t'.join(d) for d in data))
+                # The QIIME parser fixes the index and removes the #
+                index = 'SampleID'
+                _write_clean_lines(lines, holdfile, False)
+            else:
+                duplicates = _write_clean_lines(lines, holdfile, True)
+                _raise_utf8_errors(errors)
+                if duplicates is None:
+                    raise ValueError('Empty file passed!')
+                # while we were there, we checked the duplicate column headers
+                if duplicates:
+                    raise qdb.exceptions.QiitaDBDuplicateHeaderError(
+                        duplicates)
+        holdfile.seek(0)
+
+        # index_col:
+        #   is set as False, otherwise it is cast as a float and we want a
+        #   string
+        # keep_default:
+        #   is set as False, to avoid inferring empty/NA values with the
+        #   defaults that Pandas has.
+        # comment:
+        #   using the tab character as "comment" we remove rows that are
+        #   constituted only by delimiters i. e. empty rows.
+        template = pd.read_csv(
+            holdfile,
+            sep='\t',
+            dtype=str,
+            encoding='utf-8',
+            infer_datetime_format=False,
+            keep_default_na=False,
+            index_col=False,
+            comment='\t',
+            converters={index: lambda x: str(x).strip()})
 
-        holdfile[pos] = '\t'.join(newcols) + '\n'
-
-    # index_col:
-    #   is set as False, otherwise it is cast as a float and we want a string
-    # keep_default:
-    #   is set as False, to avoid inferring empty/NA values with the defaults
-    #   that Pandas has.
-    # comment:
-    #   using the tab character as "comment" we remove rows that are
-    #   constituted only by delimiters i. e. empty rows.
-    template = pd.read_csv(
-        StringIO(''.join(holdfile)),
-        sep='\t',
-        dtype=str,
-        encoding='utf-8',
-        infer_datetime_format=False,
-        keep_default_na=False,
-        index_col=False,
-        comment='\t',
-        converters={index: lambda x: str(x).strip()})
     # remove newlines and tabs from fields
     template.replace(to_replace='[\t\n\r\x0b\x0c]+', value='',
                      regex=True, inplace=True)
@@ -193,8 +271,8 @@ def load_template_to_dataframe(fn, index='sample_name'):
 
     # it is not uncommon to find templates that have empty columns so let's
     # find the columns that are all ''
-    columns = np.where(np.all(template.applymap(lambda x: x == ''), axis=0))
-    template.drop(template.columns[columns], axis=1, inplace=True)
+    template.drop(template.columns[(template == '').all(axis=0).values],
+                  axis=1, inplace=True)
 
     initial_columns.remove(index)
     dropped_cols = initial_columns - set(template.columns)
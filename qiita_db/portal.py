@@ -169,6 +169,8 @@ class Portal(qdb.base.QiitaObject):
             qdb.sql_connection.TRN.add(sql, [portal_id] * 2)
             qdb.sql_connection.TRN.execute()
 
+            Portal._remove_from_cache([portal_id])
+
     @staticmethod
     def exists(portal):
         """Returns whether the portal name already exists on the system
@@ -317,6 +319,8 @@ class Portal(qdb.base.QiitaObject):
                 qdb.sql_connection.TRN.add(sql, [tuple(studies), self._id])
             qdb.sql_connection.TRN.execute()
 
+            qdb.study.Study._remove_from_cache(clean_studies)
+
     def get_analyses(self):
         """Returns all analyses belonging to a portal
 
@@ -465,3 +469,5 @@ class Portal(qdb.base.QiitaObject):
                 qdb.sql_connection.TRN.add(
                     sql, [tuple(clean_analyses), self._id])
             qdb.sql_connection.TRN.execute()
+
+            qdb.analysis.Analysis._remove_from_cache(clean_analyses)
@@ -6,23 +6,40 @@
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
 from subprocess import Popen, PIPE
-from multiprocessing import Process
+from threading import Condition, Thread
+from heapq import heappush, heappop
+from os import getpid
 from os.path import join
-from itertools import chain
-from collections import defaultdict, Iterable
+from itertools import chain, count
+from collections import defaultdict
 from json import dumps, loads
-from time import sleep
+from time import time as now
+from sys import exc_info
+import traceback
 
 from future.utils import viewitems, viewvalues
 import networkx as nx
 
-from qiita_core.qiita_settings import qiita_config
+from qiita_core.qiita_settings import qiita_config, r_client
 import qiita_db as qdb
 
 
+# Redis list used as the queue of the private jobs executed by the
+# qiita-private-worker daemon. See qiita_ware.private_worker
+PRIVATE_JOB_QUEUE = 'qiita-private-job-queue'
+
+# Postgres channel on which the status transitions of the jobs are notified.
+# The payload is a JSON object with the keys 'job_id', 'status' and 'previous'
+JOB_STATUS_CHANNEL = 'qiita_job_status'
+
+# Max number of seconds that ProcessingJob.release_validators waits for a
+# status notification of its validators before checking them again
+VALIDATOR_WAIT_TIMEOUT = 10
+
+
 def _system_call(cmd):
     """Execute the command `cmd`
 
@@ -67,11 +84,433 @@ def _job_submitter(job_id, cmd):
     if return_value != 0:
         error = ("Error submitting job:\nStd output:%s\nStd error:%s"
                  % (std_out, std_err))
-        # Forcing the creation of a new connection
-        qdb.sql_connection.create_new_transaction()
+        # The scheduler executes this function in its own thread, which
+        # already has its own transaction state and connection
         ProcessingJob(job_id).complete(False, error=error)
 
 
+# The scheduling priority of the jobs given the type of their software, the
+# jobs with lower values are started first. The private jobs are usually
+# interactive (e.g. deleting an artifact) so they go ahead of the plugin jobs
+JOB_PRIORITIES = {'artifact definition': 0,
+                  'private': 1,
+                  'artifact transformation': 2}
+
+
+class LauncherBackend(object):
+    """Executes the jobs through the configured PLUGIN_LAUNCHER
+
+    The job slot is held for as long as the launcher runs, which may be just
+    the time needed to submit the job to a cluster
+    """
+    def generate_cmd(self, job):
+        """Generates the command that executes `job`
+
+        Parameters
+        ----------
+        job : qiita_db.processing_job.ProcessingJob
+            The job to execute
+
+        Returns
+        -------
+        str
+            The command that executes the job
+        """
+        return job._generate_cmd()
+
+    def execute(self, job_id, cmd):
+        """Executes the command `cmd` of the job `job_id` until it finishes
+
+        Parameters
+        ----------
+        job_id : str
+            The id of the job
+        cmd : str
+            The command that executes the job
+        """
+        _job_submitter(job_id, cmd)
+
+
+class LocalBackend(LauncherBackend):
+    """Executes the jobs as subprocesses of the current process
+
+    The plugins are started directly, without going through the
+    PLUGIN_LAUNCHER, so the job slot is held until the plugin finishes and all
+    the jobs can run in a single system
+    """
+    def generate_cmd(self, job):
+        return job._generate_cmd(use_launcher=False)
+
+
+JOB_BACKENDS = {'launcher': LauncherBackend,
+                'local': LocalBackend}
+
+
+class JobScheduler(object):
+    """Executes the submitted jobs with bounded concurrency
+
+    Parameters
+    ----------
+    backend : LauncherBackend
+        The object executing the jobs
+    max_jobs : int, optional
+        The max number of jobs running at the same time. 0 means no limit.
+        Default: no limit
+    max_jobs_per_user : int, optional
+        The max number of jobs of a single user running at the same time.
+        0 means no limit. Default: no limit
+    max_jobs_per_command : int, optional
+        The max number of jobs of a single command running at the same time.
+        0 means no limit. Default: no limit
+    max_validator_jobs : int, optional
+        The max number of validator jobs running at the same time. 0 means no
+        limit. Default: no limit
+
+    Notes
+    -----
+    Each job is executed in its own thread, which waits until the backend
+    finishes executing the job and then starts the next queued jobs, in
+    priority order, that are within the limits.
+    A job is only set to 'queued' once it is started, the jobs that are over
+    the limits are kept in 'waiting' status, so they can be recovered (see
+    qiita_ware.job_dispatcher.recover_ready_jobs) if the process exits before
+    starting them. If the same job is queued more than once, it is only
+    started the first time, as the other ones find it already 'queued'.
+    The validator jobs are only limited by `max_validator_jobs`, as the jobs
+    that they validate are waiting for them. A validator that is 'waiting' is
+    a validator that has completed, so the validators over the limit are kept
+    in their current status instead. The release_validators jobs are not
+    limited, as they wait for the validators.
+    The threads are not daemonic, so a process doesn't exit until all the
+    jobs that it has submitted are executed.
+    """
+    def __init__(self, backend, max_jobs=0, max_jobs_per_user=0,
+                 max_jobs_per_command=0, max_validator_jobs=0):
+        self.backend = backend
+        self.max_jobs = max_jobs
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_jobs_per_command = max_jobs_per_command
+        self.max_validator_jobs = max_validator_jobs
+        self._cond = Condition()
+        self._reset()
+
+    def _reset(self):
+        """Resets the scheduling state"""
+        self._pid = getpid()
+        self._queue = []
+        # Used to keep the order of submission among jobs with the same
+        # priority
+        self._counter = count()
+        self._running = {}
+        self._num_limited = 0
+        self._num_validators = 0
+        self._user_jobs = defaultdict(int)
+        self._command_jobs = defaultdict(int)
+
+    @property
+    def running(self):
+        """The ids of the jobs currently running"""
+        with self._cond:
+            return set(self._running)
+
+    @property
+    def queued(self):
+        """The ids of the jobs waiting to be started, in priority order"""
+        with self._cond:
+            return [entry[2] for entry in sorted(self._queue)]
+
+    def submit(self, job):
+        """Starts the job if it is within the limits or queues it otherwise
+
+        Parameters
+        ----------
+        job : qiita_db.processing_job.ProcessingJob
+            The job to execute
+
+        Notes
+        -----
+        The transaction in progress is committed, as the job is executed by
+        other processes
+        """
+        software_type = job.command.software.type
+        priority = JOB_PRIORITIES.get(software_type, len(JOB_PRIORITIES))
+        if software_type == 'artifact definition':
+            kind = 'validator'
+            # A validator in 'waiting' status is a completed validator
+            deferred_status = job.status
+        elif job.command.name == 'release_validators':
+            kind = None
+            deferred_status = 'waiting'
+        else:
+            kind = 'limited'
+            deferred_status = 'waiting'
+        entry = (priority, next(self._counter), job.id, job.user.id,
+                 job.command.id, kind, self.backend.generate_cmd(job),
+                 deferred_status)
+        with self._cond:
+            # The threads of the parent process don't exist in a forked
+            # process, so the jobs of the parent are not our concern
+            if self._pid != getpid():
+                self._reset()
+            start = self._can_start(entry)
+            if start:
+                self._reserve(entry)
+
+        try:
+            with qdb.sql_connection.TRN:
+                if start:
+                    job._set_status('queued')
+                elif job.status != deferred_status:
+                    job._set_status(deferred_status)
+                qdb.sql_connection.TRN.commit()
+        except Exception:
+            if start:
+                with self._cond:
+                    self._release(job.id)
+            raise
+
+        if start:
+            Thread(target=self._execute, args=(entry, False)).start()
+        else:
+            with self._cond:
+                heappush(self._queue, entry)
+                # A slot may have been released while we were committing
+                self._start_jobs()
+
+    def _can_start(self, entry):
+        """Checks if the job of the queue `entry` is within the limits"""
+        _, _, _, user, command, kind, _, _ = entry
+        if kind == 'validator':
+            return (not self.max_validator_jobs or
+                    self._num_validators < self.max_validator_jobs)
+        if kind != 'limited':
+            return True
+        if self.max_jobs and self._num_limited >= self.max_jobs:
+            return False
+        if self.max_jobs_per_user and \
+                self._user_jobs[user] >= self.max_jobs_per_user:
+            return False
+        if self.max_jobs_per_command and \
+                self._command_jobs[command] >= self.max_jobs_per_command:
+            return False
+        return True
+
+    def _reserve(self, entry):
+        """Counts the job of the queue `entry` as running
+
+        Notes
+        -----
+        Should be called holding the lock
+        """
+        _, _, job_id, user, command, kind, _, _ = entry
+        self._running[job_id] = (user, command, kind)
+        if kind == 'validator':
+            self._num_validators += 1
+        elif kind == 'limited':
+            self._num_limited += 1
+            self._user_jobs[user] += 1
+            self._command_jobs[command] += 1
+
+    def _release(self, job_id):
+        """Stops counting the job `job_id` as running
+
+        Notes
+        -----
+        Should be called holding the lock
+        """
+        user, command, kind = self._running.pop(job_id)
+        if kind == 'validator':
+            self._num_validators -= 1
+        elif kind == 'limited':
+            self._num_limited -= 1
+            self._user_jobs[user] -= 1
+            self._command_jobs[command] -= 1
+        self._start_jobs()
+        self._cond.notify_all()
+
+    def _start_jobs(self):
+        """Starts the queued jobs that are within the limits
+
+        Notes
+        -----
+        Should be called holding the lock
+        """
+        blocked = []
+        while self._queue:
+            entry = heappop(self._queue)
+            if not self._can_start(entry):
+                blocked.append(entry)
+                continue
+            self._reserve(entry)
+            Thread(target=self._execute, args=(entry, True)).start()
+
+        for entry in blocked:
+            heappush(self._queue, entry)
+
+    def _claim(self, job_id, deferred_status):
+        """Sets the queued job `job_id` from `deferred_status` to 'queued'
+
+        Parameters
+        ----------
+        job_id : str
+            The id of the job
+        deferred_status : str
+            The status in which the job was kept when it was queued
+
+        Returns
+        -------
+        bool
+            Whether the job was still waiting to be started
+        """
+        with qdb.sql_connection.TRN:
+            job = ProcessingJob(job_id)
+            if job._lock_status() != deferred_status:
+                return False
+            job._set_status('queued')
+            return True
+
+    def _execute(self, entry, claim):
+        """Executes the job and starts the next ones once it finishes
+
+        Parameters
+        ----------
+        entry : tuple
+            The queue entry of the job
+        claim : bool
+            Whether the job was queued in its deferred status
+        """
+        job_id, cmd, deferred_status = entry[2], entry[6], entry[7]
+        try:
+            if not claim or self._claim(job_id, deferred_status):
+                self.backend.execute(job_id, cmd)
+        except Exception:
+            qdb.logger.LogEntry.create(
+                'Runtime', "Error executing job %s: %s" % (
+                    job_id, ''.join(traceback.format_exception(*exc_info()))))
+        finally:
+            with self._cond:
+                self._release(job_id)
+
+    def wait(self, timeout=None):
+        """Waits until there are no jobs running or queued
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The max number of seconds to wait. Default: no limit
+
+        Returns
+        -------
+        bool
+            Whether all the jobs finished
+        """
+        deadline = None if timeout is None else now() + timeout
+        with self._cond:
+            while self._running or self._queue:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - now()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            return True
+
+
+def backfill_parameters_hash(batch_size=1000):
+    """Stores the canonical hash of the parameters of the jobs without it
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The number of jobs updated on each transaction. Default: 1000
+
+    Returns
+    -------
+    int
+        The number of jobs updated
+    """
+    sql = """SELECT processing_job_id, command_parameters
+             FROM qiita.processing_job
+             WHERE parameters_hash IS NULL
+             LIMIT %s"""
+    sql_update = """UPDATE qiita.processing_job
+                    SET parameters_hash = h.parameters_hash
+                    FROM (VALUES {0}) AS h (processing_job_id, parameters_hash)
+                    WHERE qiita.processing_job.processing_job_id =
+                        h.processing_job_id"""
+    num_jobs = 0
+    while True:
+        with qdb.sql_connection.TRN:
+            qdb.sql_connection.TRN.add(sql, [batch_size])
+            jobs = qdb.sql_connection.TRN.execute_fetchindex()
+            if not jobs:
+                break
+            sql_args = []
+            for job_id, values in jobs:
+                values = values if values else {}
+                sql_args.extend(
+                    [job_id, qdb.software.Parameters.hash_values(values)])
+            qdb.sql_connection.TRN.add(
+                sql_update.format(', '.join(['(%s::uuid, %s)'] * len(jobs))),
+                sql_args)
+            qdb.sql_connection.TRN.execute()
+        num_jobs += len(jobs)
+    return num_jobs
+
+
+def wait_for_job_events(listener, job_ids, timeout):
+    """Waits for a status notification of any of the given jobs
+
+    Parameters
+    ----------
+    listener : qiita_db.sql_connection.NotificationListener
+        The listener subscribed to JOB_STATUS_CHANNEL
+    job_ids : iterable of str
+        The ids of the jobs to wait for
+    timeout : float
+        The max number of seconds to wait
+
+    Returns
+    -------
+    list of dict
+        The status notifications of the jobs received, empty if the timeout
+        expired
+    """
+    job_ids = set(job_ids)
+    deadline = now() + timeout
+    remaining = timeout
+    while remaining > 0:
+        events = [loads(payload) for _, payload in listener.poll(remaining)]
+        events = [e for e in events if e['job_id'] in job_ids]
+        if events:
+            return events
+        remaining = deadline - now()
+    return []
+
+
+_SCHEDULER = None
+
+
+def get_job_scheduler():
+    """Returns the job scheduler of the system, configured from qiita_config
+
+    Returns
+    -------
+    JobScheduler
+        The job scheduler
+    """
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = JobScheduler(
+            JOB_BACKENDS[qiita_config.job_backend](),
+            max_jobs=qiita_config.max_running_jobs,
+            max_jobs_per_user=qiita_config.max_running_jobs_per_user,
+            max_jobs_per_command=qiita_config.max_running_jobs_per_command,
+            max_validator_jobs=qiita_config.max_running_validator_jobs)
+    return _SCHEDULER
+
+
 class ProcessingJob(qdb.base.QiitaObject):
     r"""Models a job that executes a command in a set of artifacts
 
@@ -91,6 +530,13 @@ class ProcessingJob(qdb.base.QiitaObject):
     create
     """
     _table = 'processing_job'
+    _hydrate_sql = """SELECT email, command_id, command_parameters,
+                             processing_job_status, logging_id, heartbeat,
+                             step, pending, hidden
+                      FROM qiita.processing_job
+                        JOIN qiita.processing_job_status
+                            USING (processing_job_status_id)
+                      WHERE processing_job_id = %s"""
 
     @classmethod
     def exists(cls, job_id):
@@ -141,96 +587,123 @@ class ProcessingJob(qdb.base.QiitaObject):
         If force is True the job is gonna be created even if another job
         exists with the same parameters
         """
+        return cls.create_many(user, [parameters], force)[0]
+
+    @classmethod
+    def create_many(cls, user, parameters, force=False, job_ids=None):
+        """Creates new jobs in the system with a few set-based statements
+
+        Parameters
+        ----------
+        user : qiita_db.user.User
+            The user executing the jobs
+        parameters : list of qiita_db.software.Parameters
+            The parameters of each of the jobs being executed
+        force : bool
+            Force creation on duplicated parameters
+        job_ids : list of str, optional
+            The ids of the new jobs, in the same order as `parameters`. Needed
+            when the parameters of a job reference the outputs of another new
+            job, as in a workflow. Default: generated
+
+        Returns
+        -------
+        list of qiita_db.processing_job.ProcessingJob
+            The newly created jobs, in the same order as `parameters`
+
+        Raises
+        ------
+        ValueError
+            If force is False and any of the jobs has the same parameters as
+            a job that is queued, running or already succeeded
+
+        Notes
+        -----
+        If force is True the jobs are gonna be created even if other jobs
+        exist with the same parameters
+        """
+        if not parameters:
+            return []
+        if job_ids is None:
+            job_ids = [str(uuid4()) for _ in parameters]
+
         TTRN = qdb.sql_connection.TRN
         with TTRN:
-            command = parameters.command
-
-            # check if a job with the same parameters already exists
-            sql = """SELECT processing_job_id, email, processing_job_status,
-                        COUNT(aopj.artifact_id)
-                     FROM qiita.processing_job
-                     LEFT JOIN qiita.processing_job_status
-                        USING (processing_job_status_id)
-                     LEFT JOIN qiita.artifact_output_processing_job aopj
-                        USING (processing_job_id)
-                     WHERE command_id = %s AND processing_job_status IN (
-                        'success', 'waiting', 'running', 'in_construction') {0}
-                     GROUP BY processing_job_id, email,
-                        processing_job_status"""
-
-            # we need to use ILIKE because of booleans as they can be
-            # false or False
-            params = []
-            for k, v in viewitems(parameters.values):
-                # this is necessary in case we have an Iterable as a value
-                # but that is not unicode or string
-                if isinstance(v, Iterable) and not isinstance(v, (str,
-                                                                  unicode)):
-                    for vv in v:
-                        params.extend([k, str(vv)])
-                else:
-                    params.extend([k, str(v)])
-
-            if params:
-                # divided by 2 as we have key-value pairs
-                len_params = len(params)/2
-                sql = sql.format(' AND ' + ' AND '.join(
-                    ["command_parameters->>%s ILIKE %s"] * len_params))
-                params = [command.id] + params
-                TTRN.add(sql, params)
-            else:
-                # the sql variable expects the list of parameters but if there
-                # is no param we need to replace the {0} with an empty string
-                TTRN.add(sql.format(""), [command.id])
-
-            # checking that if the job status is success, it has children
-            # [2] status, [3] children count
-            existing_jobs = [r for r in TTRN.execute_fetchindex()
-                             if r[2] != 'success' or r[3] > 0]
-            if existing_jobs and not force:
-                raise ValueError(
-                    'Cannot create job because the parameters are the same as '
-                    'jobs that are queued, running or already have '
-                    'succeeded:\n%s' % '\n'.join(
-                        ["%s: %s" % (jid, status)
-                         for jid, _, status, _ in existing_jobs]))
+            if not force:
+                # check if a job with the same parameters already exists.
+                # The parameters are compared through their canonical hash,
+                # which is indexed together with the command
+                sql = """SELECT processing_job_id, processing_job_status,
+                            COUNT(aopj.artifact_id)
+                         FROM qiita.processing_job
+                            LEFT JOIN qiita.processing_job_status
+                                USING (processing_job_status_id)
+                            LEFT JOIN qiita.artifact_output_processing_job aopj
+                                USING (processing_job_id)
+                         WHERE (command_id, parameters_hash) IN %s
+                            AND processing_job_status IN (
+                                'success', 'waiting', 'running',
+                                'in_construction')
+                         GROUP BY processing_job_id, processing_job_status"""
+                TTRN.add(sql, [tuple((params.command.id, params.canonical_hash)
+                                     for params in parameters)])
+
+                # checking that if the job status is success, it has children
+                # [1] status, [2] children count
+                existing_jobs = [r for r in TTRN.execute_fetchindex()
+                                 if r[1] != 'success' or r[2] > 0]
+                if existing_jobs:
+                    raise ValueError(
+                        'Cannot create job because the parameters are the '
+                        'same as jobs that are queued, running or already '
+                        'have succeeded:\n%s' % '\n'.join(
+                            ["%s: %s" % (jid, status)
+                             for jid, status, _ in existing_jobs]))
 
-            sql = """INSERT INTO qiita.processing_job
-                        (email, command_id, command_parameters,
-                         processing_job_status_id)
-                     VALUES (%s, %s, %s, %s)
-                     RETURNING processing_job_id"""
             status = qdb.util.convert_to_id(
                 "in_construction", "processing_job_status")
-            sql_args = [user.id, command.id,
-                        parameters.dump(), status]
-            TTRN.add(sql, sql_args)
-            job_id = TTRN.execute_fetchlast()
-
-            # Link the job with the input artifacts
-            sql = """INSERT INTO qiita.artifact_processing_job
-                        (artifact_id, processing_job_id)
-                     VALUES (%s, %s)"""
-            pending = defaultdict(dict)
-            for pname, vals in command.parameters.items():
-                if vals[0] == 'artifact':
-                    artifact_info = parameters.values[pname]
-                    # If the artifact_info is a list, then the artifact
-                    # still doesn't exists because the current job is part
-                    # of a workflow, so we can't link
-                    if not isinstance(artifact_info, list):
-                        TTRN.add(sql, [artifact_info, job_id])
-                    else:
-                        pending[artifact_info[0]][pname] = artifact_info[1]
-            if pending:
-                sql = """UPDATE qiita.processing_job
-                         SET pending = %s
-                         WHERE processing_job_id = %s"""
-                TTRN.add(sql, [dumps(pending), job_id])
+            job_values = []
+            link_values = []
+            for job_id, params in zip(job_ids, parameters):
+                # Link the job with the input artifacts
+                pending = defaultdict(dict)
+                for pname, vals in params.command.parameters.items():
+                    if vals[0] == 'artifact':
+                        artifact_info = params.values[pname]
+                        # If the artifact_info is a list, then the artifact
+                        # still doesn't exists because the current job is
+                        # part of a workflow, so we can't link
+                        if not isinstance(artifact_info, list):
+                            link_values.extend([artifact_info, job_id])
+                        else:
+                            pending[artifact_info[0]][pname] = \
+                                artifact_info[1]
+                # Force to insert a NULL in the DB if pending is empty
+                pending = dumps(pending) if pending else None
+                job_values.extend([job_id, user.id, params.command.id,
+                                   params.dump(), params.canonical_hash,
+                                   status, pending])
 
+            sql = """INSERT INTO qiita.processing_job
+                        (processing_job_id, email, command_id,
+                         command_parameters, parameters_hash,
+                         processing_job_status_id, pending)
+                     VALUES {0}""".format(
+                ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(parameters)))
+            TTRN.add(sql, job_values)
+            if link_values:
+                sql = """INSERT INTO qiita.artifact_processing_job
+                            (artifact_id, processing_job_id)
+                         VALUES {0}""".format(
+                    ', '.join(['(%s, %s)'] * (len(link_values) // 2)))
+                TTRN.add(sql, link_values)
             TTRN.execute()
 
-            return cls(job_id)
+            # The jobs have just been created, so there is no need to check
+            # that they exist when instantiating them
+            for job_id in job_ids:
+                cls._add_to_cache(job_id)
+            return [cls(job_id) for job_id in job_ids]
 
     @property
     def user(self):
@@ -241,6 +714,9 @@ class ProcessingJob(qdb.base.QiitaObject):
         qiita_db.user.User
             The user that launched the job
         """
+        if self._hydrated:
+            return qdb.user.User(self._hydrated_row['email'])
+
         with qdb.sql_connection.TRN:
             sql = """SELECT email
                      FROM qiita.processing_job
@@ -258,6 +734,9 @@ class ProcessingJob(qdb.base.QiitaObject):
         qiita_db.software.Command
             The command that the job executes
         """
+        if self._hydrated:
+            return qdb.software.Command(self._hydrated_row['command_id'])
+
         with qdb.sql_connection.TRN:
             sql = """SELECT command_id
                      FROM qiita.processing_job
@@ -276,11 +755,15 @@ class ProcessingJob(qdb.base.QiitaObject):
             The parameters used in the job's command
         """
         with qdb.sql_connection.TRN:
-            sql = """SELECT command_id, command_parameters
-                     FROM qiita.processing_job
-                     WHERE processing_job_id = %s"""
-            qdb.sql_connection.TRN.add(sql, [self.id])
-            res = qdb.sql_connection.TRN.execute_fetchindex()[0]
+            if self._hydrated:
+                res = (self._hydrated_row['command_id'],
+                       self._hydrated_row['command_parameters'])
+            else:
+                sql = """SELECT command_id, command_parameters
+                         FROM qiita.processing_job
+                         WHERE processing_job_id = %s"""
+                qdb.sql_connection.TRN.add(sql, [self.id])
+                res = qdb.sql_connection.TRN.execute_fetchindex()[0]
             return qdb.software.Parameters.load(
                 qdb.software.Command(res[0]), values_dict=res[1])
 
@@ -313,6 +796,9 @@ class ProcessingJob(qdb.base.QiitaObject):
             'success', 'error', 'in_construction', 'waiting'}
 
         """
+        if self._hydrated:
+            return self._hydrated_row['processing_job_status']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT processing_job_status
                      FROM qiita.processing_job_status
@@ -322,6 +808,31 @@ class ProcessingJob(qdb.base.QiitaObject):
             qdb.sql_connection.TRN.add(sql, [self.id])
             return qdb.sql_connection.TRN.execute_fetchlast()
 
+    def _lock_status(self):
+        """Returns the status of the job, locking it until the end of the
+        transaction
+
+        Returns
+        -------
+        str
+            The current status of the job
+
+        Notes
+        -----
+        Any other transaction locking the job waits until the current one
+        finishes and then reads the status that it has set, so the status
+        transitions that check the current status can't happen twice
+        """
+        with qdb.sql_connection.TRN:
+            sql = """SELECT processing_job_status
+                     FROM qiita.processing_job pj
+                        JOIN qiita.processing_job_status
+                            USING (processing_job_status_id)
+                     WHERE processing_job_id = %s
+                     FOR UPDATE OF pj"""
+            qdb.sql_connection.TRN.add(sql, [self.id])
+            return qdb.sql_connection.TRN.execute_fetchlast()
+
     def _set_status(self, value):
         """Sets the status of the job
 
@@ -353,11 +864,25 @@ class ProcessingJob(qdb.base.QiitaObject):
                      SET processing_job_status_id = %s
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [new_status, self.id])
+            # The listeners receive the notification once the transaction
+            # commits, so they never see a transition that is rolled back
+            qdb.sql_connection.TRN.add(
+                "SELECT pg_notify(%s, %s)",
+                [JOB_STATUS_CHANNEL, dumps({'job_id': self.id,
+                                            'status': value,
+                                            'previous': current_status})])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
-    def _generate_cmd(self):
+    def _generate_cmd(self, use_launcher=True):
         """Generates the command to submit the job
 
+        Parameters
+        ----------
+        use_launcher : bool, optional
+            Whether the command goes through the PLUGIN_LAUNCHER or starts the
+            plugin directly. Default: True
+
         Returns
         -------
         str
@@ -370,6 +895,12 @@ class ProcessingJob(qdb.base.QiitaObject):
         # Appending the portal URL so the job requests the information from the
         # portal server that submitted the job
         url = "%s%s" % (qiita_config.base_url, qiita_config.portal_dir)
+        if not use_launcher:
+            # Same as qiita-plugin-launcher: the shell is not interactive, so
+            # we need to source the environment script ourselves
+            return "bash -c '%s; %s \"%s\" \"%s\" \"%s\"'" % (
+                plugin_env_script, plugin_start_script, url, self.id,
+                job_dir)
         cmd = '%s "%s" "%s" "%s" "%s" "%s"' % (
             qiita_config.plugin_launcher, plugin_env_script,
             plugin_start_script, url, self.id, job_dir)
@@ -382,21 +913,37 @@ class ProcessingJob(qdb.base.QiitaObject):
         ------
         QiitaDBOperationNotPermittedError
             If the job is not in 'waiting' or 'in_construction' status
+
+        Notes
+        -----
+        The job is locked while its status is checked and updated, so if it is
+        submitted concurrently (e.g. by its parent job and by
+        qiita_ware.job_dispatcher.recover_ready_jobs), only one of the calls
+        submits it
         """
         with qdb.sql_connection.TRN:
-            status = self.status
+            status = self._lock_status()
             if status not in {'in_construction', 'waiting'}:
                 raise qdb.exceptions.QiitaDBOperationNotPermittedError(
                     "Can't submit job, not in 'in_construction' or "
                     "'waiting' status. Current status: %s" % status)
+            if not (qiita_config.use_private_workers and
+                    self.command.software.type == 'private'):
+                # The scheduler sets the job to 'queued' once it starts it,
+                # and commits the changes so the other processes see them
+                get_job_scheduler().submit(self)
+                return
+
             self._set_status('queued')
             # At this point we are going to involve other processes. We need
             # to commit the changes to the DB or the other processes will not
             # see these changes
             qdb.sql_connection.TRN.commit()
-        cmd = self._generate_cmd()
-        p = Process(target=_job_submitter, args=(self.id, cmd))
-        p.start()
+
+        # The job is picked up by one of the already running workers, there is
+        # no need to launch a new Qiita environment for it. The workers take
+        # the jobs from the right of the list
+        r_client.lpush(PRIVATE_JOB_QUEUE, self.id)
 
     def release(self):
         """Releases the job from the waiting status and creates the artifact
@@ -456,38 +1003,49 @@ class ProcessingJob(qdb.base.QiitaObject):
             return mapping
 
     def release_validators(self):
-        """Allows all the validator job spawned by this job to complete"""
-        with qdb.sql_connection.TRN:
-            if self.command.software.type not in ('artifact transformation',
-                                                  'private'):
-                raise qdb.exceptions.QiitaDBOperationNotPermittedError(
-                    "Only artifact transformation and private jobs can "
-                    "release validators")
+        """Allows all the validator job spawned by this job to complete
 
-            # Check if all the validators are completed. Validator jobs can be
-            # in two states when completed: 'waiting' in case of success
-            # or 'error' otherwise
-            sql = """SELECT pjv.validator_id
-                     FROM qiita.processing_job_validator pjv
-                        JOIN qiita.processing_job pj ON
-                            pjv.validator_id = pj.processing_job_id
-                        JOIN qiita.processing_job_status USING
-                            (processing_job_status_id)
-                     WHERE pjv.processing_job_id = %s
-                        AND processing_job_status NOT IN %s"""
-            sql_args = [self.id, ('waiting', 'error')]
-            qdb.sql_connection.TRN.add(sql, sql_args)
-            validator_ids = qdb.sql_connection.TRN.execute_fetchindex()
-
-            # Active polling - wait until all validator jobs are completed
-            while validator_ids:
-                jids = ', '.join([j[0] for j in validator_ids])
-                self.step = ("Validating outputs (%d remaining) via "
-                             "job(s) %s" % (len(validator_ids), jids))
-                sleep(10)
-                qdb.sql_connection.TRN.add(sql, sql_args)
-                validator_ids = qdb.sql_connection.TRN.execute_fetchindex()
+        Notes
+        -----
+        It waits until all the validators are completed, so it should not be
+        called inside a transaction: each check of the validators is its own
+        transaction, so no locks are held while waiting
+        """
+        if self.command.software.type not in ('artifact transformation',
+                                              'private'):
+            raise qdb.exceptions.QiitaDBOperationNotPermittedError(
+                "Only artifact transformation and private jobs can "
+                "release validators")
+
+        # Check if all the validators are completed. Validator jobs can be
+        # in two states when completed: 'waiting' in case of success
+        # or 'error' otherwise
+        sql = """SELECT pjv.validator_id
+                 FROM qiita.processing_job_validator pjv
+                    JOIN qiita.processing_job pj ON
+                        pjv.validator_id = pj.processing_job_id
+                    JOIN qiita.processing_job_status USING
+                        (processing_job_status_id)
+                 WHERE pjv.processing_job_id = %s
+                    AND processing_job_status NOT IN %s"""
+        sql_args = [self.id, ('waiting', 'error')]
+
+        # Wait until all validator jobs are completed, checking them again
+        # as soon as any of them changes its status. We start listening
+        # before checking them, so no transition is lost
+        with qdb.sql_connection.NotificationListener(
+                [JOB_STATUS_CHANNEL]) as listener:
+            while True:
+                with qdb.sql_connection.TRN:
+                    qdb.sql_connection.TRN.add(sql, sql_args)
+                    jids = qdb.sql_connection.TRN.execute_fetchflatten()
+                if not jids:
+                    break
+                self.step = ("Validating outputs (%d remaining) via job(s) %s"
+                             % (len(jids), ', '.join(jids)))
+                wait_for_job_events(listener, jids, VALIDATOR_WAIT_TIMEOUT)
 
+        with qdb.sql_connection.TRN:
             # Check if any of the validators errored
             sql = """SELECT validator_id
                      FROM qiita.processing_job_validator pjv
@@ -794,11 +1352,14 @@ class ProcessingJob(qdb.base.QiitaObject):
         with qdb.sql_connection.TRN:
             res = None
             if self.status == 'error':
-                sql = """SELECT logging_id
-                         FROM qiita.processing_job
-                         WHERE processing_job_id = %s"""
-                qdb.sql_connection.TRN.add(sql, [self.id])
-                log_id = qdb.sql_connection.TRN.execute_fetchlast()
+                if self._hydrated:
+                    log_id = self._hydrated_row['logging_id']
+                else:
+                    sql = """SELECT logging_id
+                             FROM qiita.processing_job
+                             WHERE processing_job_id = %s"""
+                    qdb.sql_connection.TRN.add(sql, [self.id])
+                    log_id = qdb.sql_connection.TRN.execute_fetchlast()
                 res = qdb.logger.LogEntry(log_id)
         return res
 
@@ -828,6 +1389,7 @@ class ProcessingJob(qdb.base.QiitaObject):
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [log.id, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
             # All the children should be marked as failure
             for c in self.children:
@@ -842,6 +1404,9 @@ class ProcessingJob(qdb.base.QiitaObject):
         datetime
             The last heartbeat timestamp
         """
+        if self._hydrated:
+            return self._hydrated_row['heartbeat']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT heartbeat
                      FROM qiita.processing_job
@@ -872,6 +1437,7 @@ class ProcessingJob(qdb.base.QiitaObject):
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [datetime.now(), self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def step(self):
@@ -882,6 +1448,9 @@ class ProcessingJob(qdb.base.QiitaObject):
         str
             The current step of the job
         """
+        if self._hydrated:
+            return self._hydrated_row['step']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT step
                      FROM qiita.processing_job
@@ -913,6 +1482,7 @@ class ProcessingJob(qdb.base.QiitaObject):
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [value, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def children(self):
@@ -959,6 +1529,7 @@ class ProcessingJob(qdb.base.QiitaObject):
                      WHERE processing_job_id = %s"""
             sql_update = """UPDATE qiita.processing_job
                             SET command_parameters = %s,
+                                parameters_hash = %s,
                                 pending = %s
                             WHERE processing_job_id = %s"""
             sql_link = """INSERT INTO qiita.artifact_processing_job
@@ -976,8 +1547,11 @@ class ProcessingJob(qdb.base.QiitaObject):
 
                 # Force to insert a NULL in the DB if pending is empty
                 pending = pending if pending else None
-                qdb.sql_connection.TRN.add(sql_update,
-                                           [dumps(params), pending, c.id])
+                qdb.sql_connection.TRN.add(
+                    sql_update,
+                    [dumps(params),
+                     qdb.software.Parameters.hash_values(params), pending,
+                     c.id])
                 qdb.sql_connection.TRN.execute()
 
                 if pending is None:
@@ -1056,6 +1630,10 @@ class ProcessingJob(qdb.base.QiitaObject):
         -------
         dict
             A dict with {job_id: {parameter_name: output_name}}"""
+        if self._hydrated:
+            res = self._hydrated_row['pending']
+            return res if res is not None else {}
+
         with qdb.sql_connection.TRN:
             sql = """SELECT pending
                      FROM qiita.processing_job
@@ -1073,6 +1651,9 @@ class ProcessingJob(qdb.base.QiitaObject):
         bool
             Whether the jobs is hidden or not
         """
+        if self._hydrated:
+            return self._hydrated_row['hidden']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT hidden
                      FROM qiita.processing_job
@@ -1099,6 +1680,7 @@ class ProcessingJob(qdb.base.QiitaObject):
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [True, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
 
 class ProcessingWorkflow(qdb.base.QiitaObject):
@@ -1201,58 +1783,51 @@ class ProcessingWorkflow(qdb.base.QiitaObject):
                         'workflow.' % ', '.join(extra))
                 raise qdb.exceptions.QiitaDBError(''.join(error_msg))
 
-            # Start creating the root jobs
-            node_to_job = {
-                n: ProcessingJob.create(
-                    user,
-                    qdb.software.Parameters.from_default_params(
-                        p, req_params[c]), force)
-                for n, (c, p) in viewitems(roots)}
-            root_jobs = node_to_job.values()
-
-            # SQL used to create the edges between jobs
-            sql = """INSERT INTO qiita.parent_processing_job
-                        (parent_id, child_id)
-                     VALUES (%s, %s)"""
-
-            # Create the rest of the jobs. These are different form the root
-            # jobs because they depend on other jobs to complete in order to be
-            # submitted
+            # The ids of the jobs are assigned beforehand, so the parameters of
+            # the children can reference their parents and all the jobs are
+            # created at once
+            node_to_id = {n: str(uuid4()) for n in all_nodes}
+            nodes = []
+            parameters = []
+            edges = []
             for n in nx.topological_sort(dflt_g):
-                if n in node_to_job:
-                    # We have already visited this node
-                    # (because it is a root node)
-                    continue
-
                 cmd, dflt_params = all_nodes[n]
-                job_req_params = {}
-                parent_ids = []
-
-                # Each incoming edge represents an artifact that is generated
-                # by the source job of the edge
-                for source, dest, data in dflt_g.in_edges(n, data=True):
-                    # Retrieve the id of the parent job - it already exists
-                    # because we are visiting the nodes in topological order
-                    source_id = node_to_job[source].id
-                    parent_ids.append(source_id)
-                    # Get the connections between the job and the source
-                    connections = data['connections'].connections
-                    for out, in_param in connections:
-                        # We take advantage of the fact the parameters are
-                        # stored in JSON to encode the name of the output
-                        # artifact from the previous job
-                        job_req_params[in_param] = [source_id, out]
-
-                # At this point we should have all the requried parameters for
-                # the current job, so create it
-                new_job = ProcessingJob.create(
-                    user, qdb.software.Parameters.from_default_params(
-                        dflt_params, job_req_params), force)
-                node_to_job[n] = new_job
+                if n in roots:
+                    job_params = qdb.software.Parameters.from_default_params(
+                        dflt_params, req_params[cmd])
+                else:
+                    # These are different form the root jobs because they
+                    # depend on other jobs to complete in order to be
+                    # submitted. Each incoming edge represents an artifact
+                    # that is generated by the source job of the edge
+                    job_req_params = {}
+                    for source, dest, data in dflt_g.in_edges(n, data=True):
+                        source_id = node_to_id[source]
+                        edges.extend([source_id, node_to_id[n]])
+                        # Get the connections between the job and the source
+                        connections = data['connections'].connections
+                        for out, in_param in connections:
+                            # We take advantage of the fact the parameters are
+                            # stored in JSON to encode the name of the output
+                            # artifact from the previous job
+                            job_req_params[in_param] = [source_id, out]
+                    job_params = qdb.software.Parameters.from_default_params(
+                        dflt_params, job_req_params)
+                nodes.append(n)
+                parameters.append(job_params)
+
+            jobs = ProcessingJob.create_many(
+                user, parameters, force, [node_to_id[n] for n in nodes])
+            root_jobs = [j for n, j in zip(nodes, jobs) if n in roots]
 
+            if edges:
                 # Create the parent-child links in the DB
-                sql_args = [[pid, new_job.id] for pid in parent_ids]
-                qdb.sql_connection.TRN.add(sql, sql_args, many=True)
+                sql = """INSERT INTO qiita.parent_processing_job
+                            (parent_id, child_id)
+                         VALUES {0}""".format(
+                    ', '.join(['(%s, %s)'] * (len(edges) // 2)))
+                qdb.sql_connection.TRN.add(sql, edges)
+                qdb.sql_connection.TRN.execute()
 
             return cls._common_creation_steps(user, root_jobs, name)
 
@@ -1501,6 +2076,7 @@ class ProcessingWorkflow(qdb.base.QiitaObject):
             sql = """DELETE FROM qiita.processing_job
                      WHERE processing_job_id = %s"""
             qdb.sql_connection.TRN.add(sql, [job.id])
+            ProcessingJob._remove_from_cache([job.id])
 
             qdb.sql_connection.TRN.execute()
 
@@ -8,6 +8,7 @@
 
 from json import dumps, loads
 from copy import deepcopy
+from hashlib import sha256
 from future import standard_library
 from multiprocessing import Process
 import inspect
@@ -1592,6 +1593,57 @@ class Parameters(object):
         """
         return dumps(self._values, sort_keys=True)
 
+    @staticmethod
+    def _canonical_value(value):
+        """Normalizes a parameter value so equivalent values are equal
+
+        Numbers are converted to their text (without the decimal part if they
+        are integers) and text is lowercased, so 1, 1.0 and "1" are equivalent,
+        as well as true, True and "TRUE"
+        """
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, (int, long, float)):
+            return repr(value).rstrip('L')
+        if isinstance(value, (str, unicode)):
+            return value.lower()
+        if isinstance(value, dict):
+            return {k: Parameters._canonical_value(v)
+                    for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [Parameters._canonical_value(v) for v in value]
+        return value
+
+    @classmethod
+    def hash_values(cls, values):
+        """Returns the canonical hash of the given parameter values
+
+        Parameters
+        ----------
+        values : dict of {str: object}
+            The parameter values keyed by parameter name
+
+        Returns
+        -------
+        str
+            The hexadecimal SHA-256 digest of the normalized values
+        """
+        return sha256(dumps(cls._canonical_value(values),
+                            sort_keys=True)).hexdigest()
+
+    @property
+    def canonical_hash(self):
+        """The hash of the values, equal for equivalent parameter sets
+
+        Returns
+        -------
+        str
+            The hexadecimal SHA-256 digest of the normalized values
+        """
+        return self.hash_values(self._values)
+
 
 class DefaultWorkflowNode(qdb.base.QiitaObject):
     r"""Represents a node in a default software workflow
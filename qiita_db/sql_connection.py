@@ -8,8 +8,10 @@ This modules provides wrappers for the psycopg2 module to allow easy use of
 transaction blocks and SQL execution/data retrieval.
 
 This module provides the variable TRN, which is the transaction available
-to use in the system. The singleton pattern is applied and this works as long
-as the system remains single-threaded.
+to use in the system. The singleton pattern is applied, but the state of the
+transaction (the queued queries, the results and the connection) is kept per
+thread, so each thread sees its own independent transaction. The connections
+are drawn from a process-wide `ConnectionPool`.
 
 Classes
 -------
@@ -17,6 +19,7 @@ Classes
 .. autosummary::
    :toctree: generated/
 
+   ConnectionPool
    SQLConnectionHandler
    Transaction
 
@@ -131,7 +134,14 @@ from contextlib import contextmanager
 from itertools import chain
 from functools import partial, wraps
 from datetime import date, time, datetime
-
+from os import getpid
+from select import select
+from tempfile import SpooledTemporaryFile
+import re
+from threading import Condition, Lock, current_thread, local
+from time import time as now
+
+import numpy as np
 from psycopg2 import (connect, ProgrammingError, Error as PostgresError,
                       OperationalError, errorcodes)
 from psycopg2.extras import DictCursor
@@ -142,6 +152,376 @@ from psycopg2.extensions import (
 from qiita_core.qiita_settings import qiita_config
 
 
+# Maximum number of statements sent to the server in a single round trip when
+# executing consecutive copies of the same statement. See Transaction._execute
+EXECUTE_BATCH_PAGE_SIZE = 500
+
+# The statements whose results are always None, so their consecutive
+# executions can be batched
+_BATCHABLE_SQL = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+_RETURNING_SQL = re.compile(r'\bRETURNING\b', re.IGNORECASE)
+
+# Maximum number of bytes of the data for a COPY kept in memory before spooling
+# it to disk. See Transaction.copy_from
+COPY_SPOOL_SIZE = 10 * 1024 * 1024
+
+# Number of seconds that ConnectionPool.getconn waits for a connection to be
+# released when the pool is exhausted
+POOL_CHECKOUT_TIMEOUT = 30
+
+
+def _connect(conn_args):
+    """Opens a new connection to the database
+
+    Parameters
+    ----------
+    conn_args : dict
+        The keyword arguments for psycopg2.connect
+
+    Returns
+    -------
+    psycopg2.extensions.connection
+        The new connection
+
+    Raises
+    ------
+    RuntimeError
+        If the connection cannot be established
+    """
+    try:
+        return connect(**conn_args)
+    except OperationalError as e:
+        # catch three known common exceptions and raise runtime errors
+        try:
+            etype = e.message.split(':')[1].split()[0]
+        except IndexError:
+            # we recieved a really unanticipated error without a colon
+            etype = ''
+        if etype == 'database':
+            etext = ('This is likely because the database `%s` has not '
+                     'been created or has been dropped.' %
+                     qiita_config.database)
+        elif etype == 'role':
+            etext = ('This is likely because the user string `%s` '
+                     'supplied in your configuration file `%s` is '
+                     'incorrect or not an authorized postgres user.' %
+                     (qiita_config.user, qiita_config.conf_fp))
+        elif etype == 'Connection':
+            etext = ('This is likely because postgres isn\'t '
+                     'running. Check that postgres is correctly '
+                     'installed and is running.')
+        else:
+            # we recieved a really unanticipated error with a colon
+            etext = ''
+        ebase = ('An OperationalError with the following message occured'
+                 '\n\n\t%s\n%s For more information, review `INSTALL.md`'
+                 ' in the Qiita installation base directory.')
+        raise RuntimeError(ebase % (e.message, etext))
+
+
+def _copy_text(value):
+    """Formats a value in the text format of COPY
+
+    The values are formatted as postgres would do when casting the value
+    adapted by psycopg2 to text, so loading them through COPY into a varchar
+    column gives the same results as inserting them. psycopg2 adapts the
+    floats through their repr, which postgres reads as a numeric literal, so
+    their text keeps all its digits (e.g. 5.0 is stored as '5.0').
+
+    Parameters
+    ----------
+    value : object
+        The value to format
+
+    Returns
+    -------
+    str
+        The value formatted and escaped
+    """
+    if value is None:
+        return r'\N'
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return 'Infinity' if value > 0 else '-Infinity'
+        return repr(float(value))
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of postgres connections
+
+    Parameters
+    ----------
+    conn_args : dict
+        The keyword arguments for psycopg2.connect
+    min_size : int, optional
+        The number of idle connections that are never closed due to
+        inactivity. Default: 1
+    max_size : int, optional
+        The maximum number of connections open at the same time. 0 means no
+        limit. Default: 20
+    idle_timeout : int, optional
+        The number of seconds after which an idle connection above `min_size`
+        is closed. 0 means never. Default: 300
+    health_check : bool, optional
+        Whether or not to check that an idle connection is still alive before
+        handing it out. Default: True
+
+    Notes
+    -----
+    A connection checked out on behalf of a thread is reclaimed by the pool
+    once that thread dies, even if it was never returned.
+    The pool is fork-aware: once in a child process, the connections
+    inherited from the parent are abandoned and new ones are opened. The
+    inherited connections are not closed, as that would terminate the
+    sessions still in use by the parent process.
+    """
+    def __init__(self, conn_args, min_size=1, max_size=20, idle_timeout=300,
+                 health_check=True):
+        self._conn_args = conn_args
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+
+        self._cond = Condition(Lock())
+        # The idle connections, as (connection, release time) tuples, sorted
+        # from the least to the most recently released
+        self._idle = []
+        # The connections checked out, as {id: (connection, owner thread)}
+        self._in_use = {}
+        # The number of connections being opened. They are opened without
+        # holding the lock, but they count towards `max_size`
+        self._pending = 0
+        # The connections inherited from a parent process. They are kept
+        # referenced so they are never closed by the garbage collector
+        self._inherited = []
+        self._pid = getpid()
+
+    @property
+    def size(self):
+        """The number of connections currently open by the pool"""
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except PostgresError:
+            pass
+
+    def _check_fork(self):
+        """Abandons the connections of the parent process after a fork"""
+        if self._pid != getpid():
+            self._inherited.extend(c for c, _ in self._idle)
+            self._inherited.extend(c for c, _ in self._in_use.values())
+            self._idle = []
+            self._in_use = {}
+            self._pending = 0
+            self._pid = getpid()
+
+    def _reclaim(self):
+        """Closes the connections of dead threads and the expired ones"""
+        for key, (conn, owner) in list(self._in_use.items()):
+            if owner is not None and not owner.is_alive():
+                del self._in_use[key]
+                self._close(conn)
+
+        if self.idle_timeout:
+            limit = now() - self.idle_timeout
+            while len(self._idle) > self.min_size and \
+                    self._idle[0][1] < limit:
+                conn, _ = self._idle.pop(0)
+                self._close(conn)
+
+    def _is_healthy(self, conn):
+        """Checks if an idle connection can be handed out"""
+        if conn.closed != 0:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+        except PostgresError:
+            return False
+        return True
+
+    def getconn(self, owner=None):
+        """Checks out a connection from the pool
+
+        Parameters
+        ----------
+        owner : threading.Thread, optional
+            The thread that owns the connection. If provided, the connection
+            is reclaimed by the pool once the thread dies. Default: the
+            connection is only returned through `putconn`
+
+        Returns
+        -------
+        psycopg2.extensions.connection
+            An open connection
+
+        Raises
+        ------
+        RuntimeError
+            If the pool is exhausted and no connection is released in
+            `POOL_CHECKOUT_TIMEOUT` seconds
+            If a new connection cannot be established
+        """
+        deadline = now() + POOL_CHECKOUT_TIMEOUT
+        while True:
+            # Only the slot is reserved holding the lock, the round trips to
+            # the server happen without it so they don't block other threads
+            conn = self._reserve(owner, deadline)
+            if conn is None:
+                try:
+                    conn = _connect(self._conn_args)
+                except Exception:
+                    with self._cond:
+                        self._pending -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._pending -= 1
+                    self._in_use[id(conn)] = (conn, owner)
+                return conn
+
+            if self._is_healthy(conn):
+                return conn
+            self._close(conn)
+            with self._cond:
+                self._in_use.pop(id(conn), None)
+                self._cond.notify()
+
+    def _reserve(self, owner, deadline):
+        """Reserves a slot of the pool for `getconn`
+
+        Parameters
+        ----------
+        owner : threading.Thread or None
+            The thread that owns the connection
+        deadline : float
+            The time at which to stop waiting for a slot
+
+        Returns
+        -------
+        psycopg2.extensions.connection or None
+            The idle connection checked out, which still needs to be checked,
+            or None if a new connection should be opened
+
+        Raises
+        ------
+        RuntimeError
+            If the pool is exhausted and no connection is released before
+            `deadline`
+        """
+        with self._cond:
+            self._check_fork()
+            while True:
+                self._reclaim()
+                if self._idle:
+                    # Reuse the most recently released connection, so the
+                    # least recently used ones can expire
+                    conn, _ = self._idle.pop()
+                    self._in_use[id(conn)] = (conn, owner)
+                    return conn
+
+                if not self.max_size or self.size < self.max_size:
+                    self._pending += 1
+                    return None
+
+                remaining = deadline - now()
+                if remaining <= 0:
+                    raise RuntimeError(
+                        "The connection pool is exhausted: all the %d "
+                        "connections are in use" % self.max_size)
+                self._cond.wait(remaining)
+
+    def putconn(self, conn, close=False):
+        """Returns a connection to the pool
+
+        Parameters
+        ----------
+        conn : psycopg2.extensions.connection
+            The connection checked out from the pool
+        close : bool, optional
+            Whether or not to close the connection instead of keeping it for
+            reuse. Default: False
+
+        Notes
+        -----
+        Any transaction in progress in the connection is rolled back. The
+        connections that are already closed or that do not belong to the pool
+        (e.g. inherited from a parent process) are discarded.
+        """
+        with self._cond:
+            self._check_fork()
+            if id(conn) not in self._in_use:
+                return
+
+        # The connection keeps its slot while it is reset, without holding
+        # the lock
+        if not close and conn.closed == 0:
+            # Leave the connection ready for the next user
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.isolation_level == ISOLATION_LEVEL_AUTOCOMMIT:
+                    conn.set_isolation_level(ISOLATION_LEVEL_READ_COMMITTED)
+            except PostgresError:
+                close = True
+        if close or conn.closed != 0:
+            self._close(conn)
+
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                # The process forked while we were resetting the connection
+                return
+            if not close and conn.closed == 0:
+                self._idle.append((conn, now()))
+            self._cond.notify()
+
+
+_POOLS = {}
+_POOLS_LOCK = Lock()
+
+
+def get_pool(conn_args):
+    """Returns the process-wide connection pool for the given arguments
+
+    Parameters
+    ----------
+    conn_args : dict
+        The keyword arguments for psycopg2.connect
+
+    Returns
+    -------
+    ConnectionPool
+        The pool of connections opened with `conn_args`, configured from the
+        postgres section of the qiita configuration
+    """
+    key = tuple(sorted(conn_args.items()))
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            _POOLS[key] = ConnectionPool(
+                conn_args, min_size=qiita_config.pool_min_size,
+                max_size=qiita_config.pool_max_size,
+                idle_timeout=qiita_config.pool_idle_timeout,
+                health_check=qiita_config.pool_health_check)
+        return _POOLS[key]
+
+
 class SQLConnectionHandler(object):
     """Postgres DB connection object
 
@@ -231,53 +611,27 @@ class SQLConnectionHandler(object):
         self.queues = {}
 
     def _open_connection(self):
-        # if the connection has been created and is not closed
-        if self._connection is not None and self._connection.closed == 0:
-            return
-
-        try:
-            setattr(SQLConnectionHandler, self._conn_attr,
-                    connect(**self._conn_args))
-        except OperationalError as e:
-            # catch threee known common exceptions and raise runtime errors
-            try:
-                etype = e.message.split(':')[1].split()[0]
-            except IndexError:
-                # we recieved a really unanticipated error without a colon
-                etype = ''
-            if etype == 'database':
-                etext = ('This is likely because the database `%s` has not '
-                         'been created or has been dropped.' %
-                         qiita_config.database)
-            elif etype == 'role':
-                etext = ('This is likely because the user string `%s` '
-                         'supplied in your configuration file `%s` is '
-                         'incorrect or not an authorized postgres user.' %
-                         (qiita_config.user, qiita_config.conf_fp))
-            elif etype == 'Connection':
-                etext = ('This is likely because postgres isn\'t '
-                         'running. Check that postgres is correctly '
-                         'installed and is running.')
-            else:
-                # we recieved a really unanticipated error with a colon
-                etext = ''
-            ebase = ('An OperationalError with the following message occured'
-                     '\n\n\t%s\n%s For more information, review `INSTALL.md`'
-                     ' in the Qiita installation base directory.')
-            raise RuntimeError(ebase % (e.message, etext))
-        else:
-            self._connection = getattr(SQLConnectionHandler, self._conn_attr)
+        # The connections are shared by all the instances, so check the one
+        # stored in the class, as it may have been replaced by another instance
+        conn = getattr(SQLConnectionHandler, self._conn_attr)
+        if conn is None or conn.closed != 0:
+            pool = get_pool(self._conn_args)
+            if conn is not None:
+                # Let the pool know that the connection has been closed
+                pool.putconn(conn)
+            conn = pool.getconn()
+            setattr(SQLConnectionHandler, self._conn_attr, conn)
+        self._connection = conn
 
     @staticmethod
     def close():
-        if SQLConnectionHandler._user_conn is not None:
-            SQLConnectionHandler._user_conn.close()
-
-        if SQLConnectionHandler._admin_conn is not None:
-            SQLConnectionHandler._admin_conn.close()
-
-        if SQLConnectionHandler._admin_nodb_conn is not None:
-            SQLConnectionHandler._admin_nodb_conn.close()
+        for admin, conn_attr in SQLConnectionHandler._conn_map.items():
+            conn = getattr(SQLConnectionHandler, conn_attr)
+            if conn is not None:
+                conn.close()
+                conn_args = getattr(SQLConnectionHandler,
+                                    SQLConnectionHandler._args_map[admin])
+                get_pool(conn_args).putconn(conn)
 
     @contextmanager
     def get_postgres_cursor(self):
@@ -511,6 +865,33 @@ def _checker(func):
     return wrapper
 
 
+class _TransactionState(local):
+    """The state of a Transaction, independent for each thread"""
+    def __init__(self):
+        self.queries = []
+        self.results = []
+        self.contexts_entered = 0
+        self.connection = None
+        # The last time the connection was released by the outermost context
+        self.last_used = None
+        self.post_commit_funcs = []
+        self.post_rollback_funcs = []
+        # Identity map of the qiita objects already validated in the current
+        # transaction. See qiita_db.base.QiitaObject
+        self.object_cache = set()
+
+
+def _state_property(name):
+    """Returns a property for the `name` attribute of the thread's state"""
+    def getter(self):
+        return getattr(self._state, name)
+
+    def setter(self, value):
+        setattr(self._state, name, value)
+
+    return property(getter, setter)
+
+
 class Transaction(object):
     """A context manager that encapsulates a DB transaction
 
@@ -526,57 +907,46 @@ class Transaction(object):
     -----
     When the execution leaves the context manager, any remaining queries in
     the transaction will be executed and committed.
+    The state of the transaction is local to each thread, so multiple threads
+    can use the same Transaction object concurrently, each of them in its own
+    database transaction and connection. The isolation is per thread: any
+    coroutines sharing a thread share the transaction.
     """
+    _queries = _state_property('queries')
+    _results = _state_property('results')
+    _contexts_entered = _state_property('contexts_entered')
+    _connection = _state_property('connection')
+    _last_used = _state_property('last_used')
+    _post_commit_funcs = _state_property('post_commit_funcs')
+    _post_rollback_funcs = _state_property('post_rollback_funcs')
+    _object_cache = _state_property('object_cache')
+
     def __init__(self):
-        self._queries = []
-        self._results = []
-        self._contexts_entered = 0
-        self._connection = None
-        self._post_commit_funcs = []
-        self._post_rollback_funcs = []
+        self._state = _TransactionState()
 
     def _open_connection(self):
-        # If the connection already exists and is not closed, don't do anything
-        if self._connection is not None and self._connection.closed == 0:
-            return
-
-        try:
-            self._connection = connect(user=qiita_config.user,
-                                       password=qiita_config.password,
-                                       database=qiita_config.database,
-                                       host=qiita_config.host,
-                                       port=qiita_config.port)
-        except OperationalError as e:
-            # catch three known common exceptions and raise runtime errors
-            try:
-                etype = e.message.split(':')[1].split()[0]
-            except IndexError:
-                # we recieved a really unanticipated error without a colon
-                etype = ''
-            if etype == 'database':
-                etext = ('This is likely because the database `%s` has not '
-                         'been created or has been dropped.' %
-                         qiita_config.database)
-            elif etype == 'role':
-                etext = ('This is likely because the user string `%s` '
-                         'supplied in your configuration file `%s` is '
-                         'incorrect or not an authorized postgres user.' %
-                         (qiita_config.user, qiita_config.conf_fp))
-            elif etype == 'Connection':
-                etext = ('This is likely because postgres isn\'t '
-                         'running. Check that postgres is correctly '
-                         'installed and is running.')
-            else:
-                # we recieved a really unanticipated error with a colon
-                etext = ''
-            ebase = ('An OperationalError with the following message occured'
-                     '\n\n\t%s\n%s For more information, review `INSTALL.md`'
-                     ' in the Qiita installation base directory.')
-            raise RuntimeError(ebase % (e.message, etext))
+        conn = self._connection
+        if conn is not None and conn.closed == 0:
+            # The connection is kept by the thread between transactions. If
+            # it has been idle for too long, give it back to the pool before
+            # starting a new transaction, so it is checked (or replaced)
+            # before using it again
+            idle_timeout = qiita_config.pool_idle_timeout
+            if self._contexts_entered > 0 or not idle_timeout or \
+                    now() - self._last_used < idle_timeout:
+                return
+
+        pool = get_pool(SQLConnectionHandler._user_args)
+        if conn is not None:
+            pool.putconn(conn)
+        self._connection = pool.getconn(current_thread())
+        self._last_used = now()
 
     def close(self):
         if self._connection is not None:
             self._connection.close()
+            get_pool(SQLConnectionHandler._user_args).putconn(
+                self._connection)
 
     @contextmanager
     def _get_cursor(self):
@@ -632,6 +1002,7 @@ class Transaction(object):
                 self._clean_up(exc_type)
             finally:
                 self._contexts_entered -= 1
+                self._last_used = now()
         else:
             self._contexts_entered -= 1
 
@@ -692,39 +1063,81 @@ class Transaction(object):
                                     " Found %s" % type(args))
             self._queries.append((sql, args))
 
+    def _execute_query(self, cur, sql, sql_args):
+        """Executes a single query and returns its results"""
+        try:
+            cur.execute(sql, sql_args)
+        except Exception as e:
+            # We catch any exception as we want to make sure that we
+            # rollback every time that something went wrong
+            self._raise_execution_error(sql, sql_args, e)
+
+        try:
+            res = cur.fetchall()
+        except ProgrammingError:
+            # At this execution point, we don't know if the sql query
+            # that we executed should retrieve values from the database
+            # If the query was not supposed to retrieve any value
+            # (e.g. an INSERT without a RETURNING clause), it will
+            # raise a ProgrammingError. Otherwise it will just return
+            # an empty list
+            res = None
+        except PostgresError as e:
+            # Some other error happened during the execution of the
+            # query, so we need to rollback
+            self._raise_execution_error(sql, sql_args, e)
+
+        return res
+
+    def _execute_batch(self, cur, sql, sql_args_list):
+        """Executes the same query once per arguments in a few round trips
+
+        The queries are sent to the server in pages of
+        `EXECUTE_BATCH_PAGE_SIZE` statements. The results of the queries are
+        discarded, so it should only be used with queries that do not return
+        any value.
+        """
+        for i in range(0, len(sql_args_list), EXECUTE_BATCH_PAGE_SIZE):
+            page = sql_args_list[i:i + EXECUTE_BATCH_PAGE_SIZE]
+            try:
+                cur.execute(";".join(cur.mogrify(sql, args) for args in page))
+            except Exception as e:
+                self._raise_execution_error(sql, page, e)
+
     def _execute(self):
         """Internal function that actually executes the transaction
         The `execute` function exposed in the API wraps this one to make sure
         that we catch any exception that happens in here and we rollback the
         transaction
+
+        Notes
+        -----
+        Consecutive INSERT, UPDATE or DELETE queries with the same SQL and
+        without a RETURNING clause (e.g. the ones added with `many=True`) are
+        sent to the server in batches. Their results are still stored
+        individually (as None), so the indices of the results match the order
+        in which the queries were added.
         """
+        queries = self._queries
         with self._get_cursor() as cur:
-            for sql, sql_args in self._queries:
-                # Execute the current SQL command
-                try:
-                    cur.execute(sql, sql_args)
-                except Exception as e:
-                    # We catch any exception as we want to make sure that we
-                    # rollback every time that something went wrong
-                    self._raise_execution_error(sql, sql_args, e)
-
-                try:
-                    res = cur.fetchall()
-                except ProgrammingError as e:
-                    # At this execution point, we don't know if the sql query
-                    # that we executed should retrieve values from the database
-                    # If the query was not supposed to retrieve any value
-                    # (e.g. an INSERT without a RETURNING clause), it will
-                    # raise a ProgrammingError. Otherwise it will just return
-                    # an empty list
-                    res = None
-                except PostgresError as e:
-                    # Some other error happened during the execution of the
-                    # query, so we need to rollback
-                    self._raise_execution_error(sql, sql_args, e)
-
-                # Store the results of the current query
-                self._results.append(res)
+            start = 0
+            while start < len(queries):
+                sql = queries[start][0]
+                end = start + 1
+                while end < len(queries) and queries[end][0] == sql:
+                    end += 1
+
+                if end - start > 1 and _BATCHABLE_SQL.match(sql) and \
+                        not _RETURNING_SQL.search(sql):
+                    self._execute_batch(
+                        cur, sql, [args for _, args in queries[start:end]])
+                    self._results.extend([None] * (end - start))
+                else:
+                    for sql, sql_args in queries[start:end]:
+                        # Store the results of the current query
+                        self._results.append(
+                            self._execute_query(cur, sql, sql_args))
+                start = end
 
         # wipe out the already executed queries
         self._queries = []
@@ -837,6 +1250,103 @@ class Transaction(object):
         """
         return list(chain.from_iterable(self.execute()[idx]))
 
+    @_checker
+    def copy_from(self, table, columns, rows):
+        """Bulk loads rows into a table using COPY ... FROM STDIN
+
+        Parameters
+        ----------
+        table : str
+            The name of the table, including its schema
+        columns : list of str
+            The columns of the table in which the values are loaded
+        rows : iterable of iterables
+            The values to load. Each row holds the values of `columns`, in
+            the same order
+
+        Raises
+        ------
+        ValueError
+            If there is some error loading the data
+        RuntimeError
+            If invoked outside a context
+
+        Notes
+        -----
+        The COPY is executed immediately, after executing any query already
+        added to the transaction (as the COPY may depend on them, e.g. on the
+        creation of the table). It counts as a single query with no results
+        when indexing the results of the transaction.
+        The data is streamed to the server through a buffer that is spooled
+        to disk once it grows over `COPY_SPOOL_SIZE` bytes.
+        """
+        if self._queries:
+            self.execute()
+
+        sql = "COPY {0} ({1}) FROM STDIN".format(table, ", ".join(columns))
+        with SpooledTemporaryFile(max_size=COPY_SPOOL_SIZE) as data:
+            for row in rows:
+                data.write("\t".join(_copy_text(v) for v in row))
+                data.write("\n")
+            data.seek(0)
+
+            with self._get_cursor() as cur:
+                try:
+                    cur.copy_expert(sql, data)
+                except Exception as e:
+                    self._raise_execution_error(sql, None, e)
+
+        self._results.append(None)
+
+    @_checker
+    def copy_to(self, sql, sql_args=None, options=""):
+        """Retrieves the results of a query using COPY ... TO STDOUT
+
+        Parameters
+        ----------
+        sql : str
+            The query whose results are retrieved
+        sql_args : list, tuple or dict of objects, optional
+            The arguments to the query
+        options : str, optional
+            The options of the COPY command (e.g. "CSV HEADER")
+
+        Returns
+        -------
+        file-like object
+            The output of the COPY, positioned at its beginning. It is
+            spooled to disk once it grows over `COPY_SPOOL_SIZE` bytes, so it
+            should be closed once read
+
+        Raises
+        ------
+        ValueError
+            If there is some error retrieving the data
+        RuntimeError
+            If invoked outside a context
+
+        Notes
+        -----
+        The COPY is executed immediately, after executing any query already
+        added to the transaction. It counts as a single query with no results
+        when indexing the results of the transaction.
+        """
+        if self._queries:
+            self.execute()
+
+        data = SpooledTemporaryFile(max_size=COPY_SPOOL_SIZE)
+        with self._get_cursor() as cur:
+            try:
+                cur.copy_expert("COPY ({0}) TO STDOUT {1}".format(
+                    cur.mogrify(sql, sql_args), options), data)
+            except Exception as e:
+                data.close()
+                self._raise_execution_error(sql, sql_args, e)
+        data.seek(0)
+
+        self._results.append(None)
+        return data
+
     def _funcs_executor(self, funcs, func_str):
         error_msg = []
         for f, args, kwargs in funcs:
@@ -865,6 +1375,7 @@ class Transaction(object):
         # Reset the queries, the results and the index
         self._queries = []
         self._results = []
+        self._object_cache = set()
         try:
             self._connection.commit()
         except Exception:
@@ -872,6 +1383,11 @@ class Transaction(object):
             raise
         # Execute the post commit functions
         self._funcs_executor(self._post_commit_funcs, "commit")
+        if self._connection.get_transaction_status() != \
+                TRANSACTION_STATUS_IDLE:
+            # The post commit functions executed some queries, commit them
+            # too so the connection is not left in the middle of a transaction
+            self._connection.commit()
 
     @_checker
     def rollback(self):
@@ -885,6 +1401,9 @@ class Transaction(object):
         # Reset the queries, the results and the index
         self._queries = []
         self._results = []
+        # The objects validated in this transaction may have been created in
+        # it, so they may not exist anymore
+        self._object_cache = set()
 
         if self._connection is not None and self._connection.closed == 0:
             try:
@@ -899,6 +1418,18 @@ class Transaction(object):
     def index(self):
         return len(self._queries) + len(self._results)
 
+    @property
+    def object_cache(self):
+        """The set of qiita objects already validated in this transaction
+
+        Returns
+        -------
+        set of (type, object, str)
+            The (class, id, portal) keys of the objects validated in the
+            transaction. It is cleared on commit and on rollback.
+        """
+        return self._object_cache
+
     @_checker
     def add_post_commit_func(self, func, *args, **kwargs):
         """Adds a post commit function
@@ -906,7 +1437,7 @@ class Transaction(object):
         The function added will be executed after the next commit in the
         transaction, unless a rollback is executed. This is useful, for
         example, to perform some filesystem clean up once the transaction is
-        committed.
+        committed. The queries executed by the function are also committed.
 
         Parameters
         ----------
@@ -940,6 +1471,61 @@ class Transaction(object):
         self._post_rollback_funcs.append((func, args, kwargs))
 
 
+class NotificationListener(object):
+    """Receives the notifications sent to the given postgres channels
+
+    Parameters
+    ----------
+    channels : list of str
+        The channels to LISTEN on
+
+    Notes
+    -----
+    The listener uses its own connection instead of one from the pool, as the
+    connection remains subscribed to the channels until it is closed.
+    The notifications are only delivered once the transaction that sent them
+    commits.
+    """
+    def __init__(self, channels):
+        self._connection = _connect(SQLConnectionHandler._user_args)
+        self._connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._connection.cursor() as cur:
+            for channel in channels:
+                cur.execute('LISTEN "%s"' % channel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the connection, stopping the subscription"""
+        self._connection.close()
+
+    def poll(self, timeout=None):
+        """Returns the notifications received, waiting for them if needed
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The max number of seconds to wait for a notification if there are
+            none pending. Default: wait until a notification arrives
+
+        Returns
+        -------
+        list of (str, str)
+            The channel and payload of each notification, in order of arrival
+        """
+        conn = self._connection
+        conn.poll()
+        if not conn.notifies and select([conn], [], [], timeout)[0]:
+            conn.poll()
+        notifies = [(n.channel, n.payload) for n in conn.notifies]
+        del conn.notifies[:]
+        return notifies
+
+
 # Singleton pattern, create the transaction for the entire system
 TRN = Transaction()
 
@@ -947,7 +1533,8 @@ TRN = Transaction()
 def create_new_transaction():
     """Creates a new global transaction
 
-    This is needed when using multiprocessing
+    This is needed when using multiprocessing, as the child process should
+    not use the state of the parent's transaction
     """
     global TRN
     TRN = Transaction()
@@ -141,6 +141,10 @@ class Study(qdb.base.QiitaObject):
     """
     _table = "study"
     _portal_table = "study_portal"
+    _hydrate_sql = """SELECT *
+                      FROM qiita.study
+                        LEFT JOIN qiita.investigation_study USING (study_id)
+                      WHERE study_id = %s"""
     # The following columns are considered not part of the study info
     _non_info = frozenset(["email", "study_title", "ebi_submission_status",
                            "ebi_study_accession"])
@@ -448,6 +452,8 @@ class Study(qdb.base.QiitaObject):
 
             qdb.sql_connection.TRN.execute()
 
+            cls._remove_from_cache([id_])
+
     @classmethod
     def get_tags(cls):
         """Returns the available study tags
@@ -508,6 +514,9 @@ class Study(qdb.base.QiitaObject):
         str
             Title of study
         """
+        if self._hydrated:
+            return self._hydrated_row['study_title']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT study_title FROM qiita.{0}
                      WHERE study_id = %s""".format(self._table)
@@ -527,6 +536,7 @@ class Study(qdb.base.QiitaObject):
             sql = """UPDATE qiita.{0} SET study_title = %s
                      WHERE study_id = %s""".format(self._table)
             qdb.sql_connection.TRN.add(sql, [title, self._id])
+            self._invalidate_row()
             return qdb.sql_connection.TRN.execute()
 
     @property
@@ -539,10 +549,14 @@ class Study(qdb.base.QiitaObject):
             info of study keyed to column names
         """
         with qdb.sql_connection.TRN:
-            sql = "SELECT * FROM qiita.{0} WHERE study_id = %s".format(
-                self._table)
-            qdb.sql_connection.TRN.add(sql, [self._id])
-            info = dict(qdb.sql_connection.TRN.execute_fetchindex()[0])
+            if self._hydrated:
+                info = dict(self._hydrated_row)
+                info.pop('investigation_id')
+            else:
+                sql = "SELECT * FROM qiita.{0} WHERE study_id = %s".format(
+                    self._table)
+                qdb.sql_connection.TRN.add(sql, [self._id])
+                info = dict(qdb.sql_connection.TRN.execute_fetchindex()[0])
             # remove non-info items from info
             for item in self._non_info:
                 info.pop(item)
@@ -614,6 +628,7 @@ class Study(qdb.base.QiitaObject):
                 self._table, ','.join(sql_vals))
             qdb.sql_connection.TRN.add(sql, data)
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def shared_with(self):
@@ -689,6 +704,11 @@ class Study(qdb.base.QiitaObject):
         -------
         qiita_db.investigation.Investigation or None
         """
+        if self._hydrated:
+            inv_id = self._hydrated_row['investigation_id']
+            return (qdb.investigation.Investigation(inv_id)
+                    if inv_id is not None else None)
+
         with qdb.sql_connection.TRN:
             sql = """SELECT investigation_id FROM qiita.investigation_study
                      WHERE study_id = %s"""
@@ -744,6 +764,9 @@ class Study(qdb.base.QiitaObject):
         qiita_db.user.User
             The user that owns this study
         """
+        if self._hydrated:
+            return qdb.user.User(self._hydrated_row['email'])
+
         with qdb.sql_connection.TRN:
             sql = """SELECT email FROM qiita.{} WHERE study_id = %s""".format(
                 self._table)
@@ -842,6 +865,9 @@ class Study(qdb.base.QiitaObject):
         str
             The study EBI accession
         """
+        if self._hydrated:
+            return self._hydrated_row['ebi_study_accession']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT ebi_study_accession
                      FROM qiita.{0}
@@ -873,6 +899,7 @@ class Study(qdb.base.QiitaObject):
                      WHERE study_id = %s""".format(self._table)
             qdb.sql_connection.TRN.add(sql, [value, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     @property
     def ebi_submission_status(self):
@@ -883,6 +910,9 @@ class Study(qdb.base.QiitaObject):
         str
             The study EBI submission status
         """
+        if self._hydrated:
+            return self._hydrated_row['ebi_submission_status']
+
         with qdb.sql_connection.TRN:
             sql = """SELECT ebi_submission_status
                      FROM qiita.{0}
@@ -913,6 +943,7 @@ class Study(qdb.base.QiitaObject):
                      WHERE study_id = %s""".format(self._table)
             qdb.sql_connection.TRN.add(sql, [value, self.id])
             qdb.sql_connection.TRN.execute()
+            self._invalidate_row()
 
     ebi_submission_status.__doc__.format(', '.join(_VALID_EBI_STATUS))
 
@@ -970,8 +1001,8 @@ class Study(qdb.base.QiitaObject):
                      ORDER BY artifact_id""".format(sql_where)
 
             qdb.sql_connection.TRN.add(sql, sql_args)
-            return [qdb.artifact.Artifact(aid)
-                    for aid in qdb.sql_connection.TRN.execute_fetchflatten()]
+            return qdb.artifact.Artifact.load_many(
+                qdb.sql_connection.TRN.execute_fetchflatten())
 
     def prep_templates(self, data_type=None):
         """Return list of prep template ids
@@ -1345,6 +1376,8 @@ class StudyPerson(qdb.base.QiitaObject):
             qdb.sql_connection.TRN.add(sql, [id_])
             qdb.sql_connection.TRN.execute()
 
+            cls._remove_from_cache([id_])
+
     # Properties
     @property
     def name(self):
@@ -57,3 +57,27 @@ ALTER TABLE qiita.prep_template ADD name varchar DEFAULT 'Default Name' NOT NULL
 
 -- Set the default name to be the previous name that was shown
 UPDATE qiita.prep_template SET name = 'Prep information ' || prep_template_id::varchar;
+
+-- Oct 16, 2026
+-- Adding a version counter for the columns of the metadata template tables.
+-- It is increased every time that a sample_X/prep_X table is created or
+-- dropped or any of its columns is added or dropped, so the processes can
+-- cache the columns of these tables. See qiita_db.util.get_table_cols
+-- It is a sequence so increasing it doesn't lock the transactions that modify
+-- the templates against each other
+CREATE SEQUENCE qiita.metadata_template_catalogue_version;
+SELECT setval('qiita.metadata_template_catalogue_version', 1);
+
+-- Oct 16, 2026
+-- Adding a canonical hash of the parameters of the jobs, so the jobs with the
+-- same parameters can be found with an index lookup. It is populated for the
+-- existing jobs in the python patch. See ProcessingJob.create_many
+ALTER TABLE qiita.processing_job ADD parameters_hash varchar;
+CREATE INDEX idx_processing_job_parameters_hash ON qiita.processing_job ( command_id, parameters_hash );
+
+-- Oct 16, 2026
+-- Adding the hash of the contents of the QIIME mapping file of the prep
+-- templates, so the QIIME mapping files are only regenerated when the
+-- metadata contributing to them changes. See
+-- PrepTemplate.create_qiime_mapping_file
+ALTER TABLE qiita.prep_template ADD qiime_map_hash varchar;
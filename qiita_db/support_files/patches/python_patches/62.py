@@ -3,6 +3,7 @@
 
 from qiita_db.software import Software, Command
 from qiita_db.sql_connection import TRN
+from qiita_db.processing_job import backfill_parameters_hash
 
 # Create the delete study command
 Command.create(Software.from_name_and_version('Qiita', 'alpha'),
@@ -28,3 +29,7 @@ with TRN:
                   for cmd_id in TRN.execute_fetchflatten()]
     TRN.add(sql, sql_params, many=True)
     TRN.execute()
+
+# Oct 16, 2026
+# Storing the canonical hash of the parameters of the existing jobs
+backfill_parameters_hash()
@@ -3,9 +3,10 @@ from os import remove
 from os.path import exists, join, basename
 from shutil import move
 
-from biom import load_table
+from biom import load_table, Table
 from pandas.util.testing import assert_frame_equal
 from functools import partial
+import numpy as np
 import numpy.testing as npt
 
 from qiita_core.util import qiita_test_checker
@@ -22,6 +23,31 @@ import qiita_db as qdb
 # -----------------------------------------------------------------------------
 
 
+class TestMergeBiomTables(TestCase):
+    def test_merge_biom_tables(self):
+        t1 = Table(np.array([[1, 0], [2, 3]]), ['O1', 'O2'], ['S1', 'S2'],
+                   [{'taxonomy': ['a']}, {'taxonomy': ['b']}])
+        t2 = Table(np.array([[4, 5], [6, 0]]), ['O3', 'O1'], ['S2', 'S3'],
+                   [{'taxonomy': ['c']}, {'taxonomy': ['a']}])
+        t3 = Table(np.array([[7]]), ['O2'], ['S4'], [{'taxonomy': ['b']}])
+
+        obs = qdb.analysis._merge_biom_tables(iter([t1, t2, t3]))
+        exp = t1.merge(t2).merge(t3)
+        self.assertEqual(list(obs.ids()), ['S1', 'S2', 'S3', 'S4'])
+        self.assertEqual(list(obs.ids(axis='observation')),
+                         ['O1', 'O2', 'O3'])
+        for sid in obs.ids():
+            for oid in obs.ids(axis='observation'):
+                self.assertEqual(obs.get_value_by_ids(oid, sid),
+                                 exp.get_value_by_ids(oid, sid))
+        self.assertEqual(obs.metadata('O3', axis='observation'),
+                         {'taxonomy': ['c']})
+        self.assertIsNone(obs.metadata(axis='sample'))
+
+    def test_merge_biom_tables_empty(self):
+        self.assertIsNone(qdb.analysis._merge_biom_tables([]))
+
+
 @qiita_test_checker()
 class TestAnalysis(TestCase):
     def setUp(self):
@@ -434,6 +460,19 @@ class TestAnalysis(TestCase):
         exp = {'1.SKB8.640193', '1.SKD8.640184', '1.SKB7.640196'}
         self.assertEqual(obs, exp)
 
+    def test_build_biom_tables_filtered_out(self):
+        analysis = self._create_analyses_with_samples()
+        grouped_samples = {
+            '18S || algorithm': [
+                (4, ['1.SKB8.640193', '1.SKD8.640184', '1.SKB7.640196'])],
+            '16S || algorithm': [(4, ['1.NotASample'])]}
+        with self.assertRaises(RuntimeError):
+            analysis._build_biom_tables(grouped_samples)
+        # The table built for the other label is removed
+        self.assertFalse(exists(join(
+            qdb.util.get_work_base_dir(),
+            "%s_analysis_18S_algorithm.biom" % analysis.id)))
+
     def test_build_biom_tables_with_references(self):
         analysis = self._create_analyses_with_samples()
         analysis_id = analysis.id
@@ -485,6 +524,29 @@ class TestAnalysis(TestCase):
                '5.1.SKB8.640193', '5.1.SKB7.640196', '5.1.SKD8.640184'}
         self.assertItemsEqual(obs, exp)
 
+    def test_build_biom_tables_pool(self):
+        analysis = self._create_analyses_with_samples()
+        grouped_samples = {
+            '18S || algorithm': [
+                (4, ['1.SKB8.640193', '1.SKD8.640184', '1.SKB7.640196']),
+                (5, ['1.SKB8.640193', '1.SKD8.640184', '1.SKB7.640196'])]}
+        exp = analysis._build_biom_tables(grouped_samples, True)
+        exp_table = load_table(exp[0][1])
+
+        workers = qiita_config.analysis_workers
+        # With 2 workers, the artifacts of the table are merged in 2 chunks
+        qiita_config.analysis_workers = 2
+        try:
+            obs = analysis._build_biom_tables(grouped_samples, True)
+        finally:
+            qiita_config.analysis_workers = workers
+        self.assertEqual(obs, exp)
+        obs_table = load_table(obs[0][1])
+        self.assertEqual(obs_table, exp_table)
+        # The partial tables are removed
+        self.assertFalse(exists('%s.0' % obs[0][1]))
+        self.assertFalse(exists('%s.1' % obs[0][1]))
+
     def test_build_biom_tables_raise_error_due_to_sample_selection(self):
         grouped_samples = {
             '18S || algorithm': [
@@ -1103,6 +1103,33 @@ class ArtifactTests(TestCase):
         a.name = "new name"
         self.assertEqual(a.name, "new name")
 
+    def test_hydrate(self):
+        a = qdb.artifact.Artifact(2).hydrate()
+        exp = qdb.artifact.Artifact(2)
+        self.assertEqual(a.name, exp.name)
+        self.assertEqual(a.timestamp, exp.timestamp)
+        self.assertEqual(a.processing_parameters, exp.processing_parameters)
+        self.assertEqual(a.visibility, exp.visibility)
+        self.assertEqual(a.artifact_type, exp.artifact_type)
+        self.assertEqual(a.data_type, exp.data_type)
+        self.assertEqual(a.can_be_submitted_to_ebi,
+                         exp.can_be_submitted_to_ebi)
+        self.assertEqual(a.can_be_submitted_to_vamps,
+                         exp.can_be_submitted_to_vamps)
+        self.assertEqual(a.is_submitted_to_vamps, exp.is_submitted_to_vamps)
+        self.assertEqual(a.study, qdb.study.Study(1))
+        self.assertIsNone(a.analysis)
+
+        # The setters invalidate the retrieved row
+        a.name = "new name"
+        self.assertEqual(a.name, "new name")
+        a.visibility = "public"
+        self.assertEqual(a.visibility, "public")
+
+        a = qdb.artifact.Artifact(9).hydrate()
+        self.assertIsNone(a.study)
+        self.assertEqual(a.analysis, qdb.analysis.Analysis(1))
+
     def test_visibility_setter(self):
         a = qdb.artifact.Artifact.create(
             self.filepaths_root, "FASTQ", prep_template=self.prep_template)
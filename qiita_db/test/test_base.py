@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 
 from unittest import TestCase, main
+from threading import Thread, Event
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from qiita_core.util import qiita_test_checker
@@ -22,9 +23,12 @@ class QiitaBaseTest(TestCase):
         # We need an actual subclass in order to test the equality functions
         self.tester = qdb.artifact.Artifact(1)
         self.portal = qiita_config.portal
+        self.object_cache_ttl = qiita_config.object_cache_ttl
 
     def tearDown(self):
         qiita_config.portal = self.portal
+        qiita_config.object_cache_ttl = self.object_cache_ttl
+        qdb.base.clear_object_cache()
 
     def test_init_base_error(self):
         """Raises an error when instantiating a base class directly"""
@@ -61,6 +65,114 @@ class QiitaBaseTest(TestCase):
 
         self.assertTrue(self.tester._check_portal(1))
 
+    def test_object_cache_transaction(self):
+        with qdb.sql_connection.TRN:
+            self.assertFalse(qdb.artifact.Artifact._is_cached(1))
+            qdb.artifact.Artifact(1)
+            self.assertTrue(qdb.artifact.Artifact._is_cached(1))
+            # The key includes the class and the portal
+            self.assertFalse(qdb.study.Study._is_cached(1))
+            qiita_config.portal = 'EMP'
+            self.assertFalse(qdb.artifact.Artifact._is_cached(1))
+            qiita_config.portal = self.portal
+
+            qdb.sql_connection.TRN.rollback()
+            self.assertFalse(qdb.artifact.Artifact._is_cached(1))
+
+            qdb.artifact.Artifact(1)
+        # The per-process cache is disabled
+        self.assertFalse(qdb.artifact.Artifact._is_cached(1))
+
+    def test_object_cache_process(self):
+        qiita_config.object_cache_ttl = 60
+        qdb.artifact.Artifact(1)
+        self.assertTrue(qdb.artifact.Artifact._is_cached(1))
+
+        # Objects removed before the commit are not moved to the process cache
+        with qdb.sql_connection.TRN:
+            qdb.artifact.Artifact(2)
+            qdb.artifact.Artifact._remove_from_cache([2])
+        self.assertFalse(qdb.artifact.Artifact._is_cached(2))
+
+        # Objects validated in a rolled back transaction are not cached
+        with qdb.sql_connection.TRN:
+            qdb.artifact.Artifact(3)
+            qdb.sql_connection.TRN.rollback()
+        self.assertFalse(qdb.artifact.Artifact._is_cached(3))
+
+        # Expired entries are not used
+        qdb.base._OBJECT_CACHE[
+            (qdb.artifact.Artifact, 4, qiita_config.portal)] = 0
+        self.assertFalse(qdb.artifact.Artifact._is_cached(4))
+
+        qdb.artifact.Artifact._remove_from_cache([1])
+        self.assertFalse(qdb.artifact.Artifact._is_cached(1))
+
+    def test_object_cache_remove_concurrently(self):
+        stop = Event()
+        keys = {(qdb.artifact.Artifact, i, qiita_config.portal)
+                for i in range(1000)}
+
+        def promote():
+            while not stop.is_set():
+                qdb.base._promote_to_object_cache(keys)
+                qdb.base.clear_object_cache()
+
+        qiita_config.object_cache_ttl = 60
+        thread = Thread(target=promote)
+        thread.start()
+        try:
+            # Removing entries while another thread modifies the process
+            # cache doesn't fail
+            for _ in range(100):
+                qdb.artifact.Artifact._remove_from_cache(range(500))
+        finally:
+            stop.set()
+            thread.join()
+            qdb.base.clear_object_cache()
+
+    def test_object_cache_delete(self):
+        qiita_config.object_cache_ttl = 60
+        person = qdb.study.StudyPerson.create(
+            'SomeDude', 'somedude@foo.bar', 'affil')
+        qdb.study.StudyPerson(person.id)
+        self.assertTrue(qdb.study.StudyPerson._is_cached(person.id))
+        qdb.study.StudyPerson.delete(person.id)
+        self.assertFalse(qdb.study.StudyPerson._is_cached(person.id))
+        with self.assertRaises(qdb.exceptions.QiitaDBUnknownIDError):
+            qdb.study.StudyPerson(person.id)
+
+    def test_load_many(self):
+        obs = qdb.artifact.Artifact.load_many([3, '1', 2])
+        exp = [qdb.artifact.Artifact(3), qdb.artifact.Artifact(1),
+               qdb.artifact.Artifact(2)]
+        self.assertEqual(obs, exp)
+
+        self.assertEqual(qdb.artifact.Artifact.load_many([]), [])
+
+        # Subclasses that overwrite _check_id are also supported
+        obs = qdb.user.User.load_many(['test@foo.bar', 'shared@foo.bar'])
+        exp = [qdb.user.User('test@foo.bar'), qdb.user.User('shared@foo.bar')]
+        self.assertEqual(obs, exp)
+
+    def test_load_many_error(self):
+        with self.assertRaises(IncompetentQiitaDeveloperError):
+            qdb.base.QiitaObject.load_many([1])
+
+        with self.assertRaises(qdb.exceptions.QiitaDBUnknownIDError):
+            qdb.artifact.Artifact.load_many([1, 100])
+
+        with self.assertRaises(TypeError):
+            qdb.artifact.Artifact.load_many([1, 1.5])
+
+        qiita_config.portal = 'EMP'
+        with self.assertRaises(qdb.exceptions.QiitaDBError):
+            qdb.analysis.Analysis.load_many([1])
+
+    def test_hydrate_error(self):
+        with self.assertRaises(IncompetentQiitaDeveloperError):
+            qdb.study.StudyPerson(1).hydrate()
+
     def test_equal_self(self):
         """Equality works with the same object"""
         self.assertEqual(self.tester, self.tester)
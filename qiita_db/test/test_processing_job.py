@@ -13,6 +13,7 @@ from os import close
 from tempfile import mkstemp
 from json import dumps, loads
 from time import sleep
+from threading import Event, Thread
 
 import networkx as nx
 import pandas as pd
@@ -20,6 +21,7 @@ import pandas as pd
 import qiita_db as qdb
 from qiita_core.util import qiita_test_checker
 from qiita_core.qiita_settings import qiita_config
+from qiita_core.testing import create_private_job, RecordingBackend
 
 
 def _create_job(force=True):
@@ -42,6 +44,19 @@ def _create_job(force=True):
     return job
 
 
+def _create_validator(fp):
+    return qdb.processing_job.ProcessingJob.create(
+        qdb.user.User('test@foo.bar'),
+        qdb.software.Parameters.load(
+            qdb.software.Command(4),
+            values_dict={'files': dumps({'biom': [fp]}),
+                         'artifact_type': 'BIOM', 'template': 1,
+                         'provenance': dumps(
+                            {'job': "bcc7ebcd-39c1-43e4-af2d-822e3589f14d",
+                             'cmd_out_id': 3, 'name': 'test-validator'})}),
+        True)
+
+
 @qiita_test_checker()
 class ProcessingJobUtilTest(TestCase):
     def test_system_call(self):
@@ -81,6 +96,145 @@ class ProcessingJobUtilTest(TestCase):
         self.assertEqual(job.log.msg, exp)
 
 
+class BlockingBackend(RecordingBackend):
+    """Backend that records the jobs and blocks them until released"""
+    def __init__(self):
+        super(BlockingBackend, self).__init__()
+        self.released = Event()
+
+    def execute(self, job_id, cmd):
+        super(BlockingBackend, self).execute(job_id, cmd)
+        self.released.wait()
+
+
+@qiita_test_checker()
+class JobSchedulerTest(TestCase):
+    def setUp(self):
+        self.backend = BlockingBackend()
+
+    def tearDown(self):
+        self.backend.released.set()
+
+    def test_submit_max_jobs(self):
+        scheduler = qdb.processing_job.JobScheduler(self.backend, max_jobs=1)
+        job1 = _create_job()
+        job2 = _create_job()
+        scheduler.submit(job1)
+        scheduler.submit(job2)
+        self.assertEqual(scheduler.running, {job1.id})
+        self.assertEqual(scheduler.queued, [job2.id])
+        # The queued job is only set to 'queued' once it is started
+        self.assertEqual(job1.status, 'queued')
+        self.assertEqual(job2.status, 'waiting')
+
+        self.backend.released.set()
+        self.assertTrue(scheduler.wait(timeout=10))
+        self.assertEqual(self.backend.executed, [job1.id, job2.id])
+        self.assertEqual(scheduler.running, set())
+        self.assertEqual(scheduler.queued, [])
+        self.assertEqual(job2.status, 'queued')
+
+    def test_submit_queued_twice(self):
+        scheduler = qdb.processing_job.JobScheduler(self.backend, max_jobs=1)
+        job1 = _create_job()
+        job2 = _create_job()
+        scheduler.submit(job1)
+        scheduler.submit(job2)
+        scheduler.submit(job2)
+        self.assertEqual(scheduler.queued, [job2.id, job2.id])
+
+        self.backend.released.set()
+        self.assertTrue(scheduler.wait(timeout=10))
+        # The job is only executed once
+        self.assertEqual(self.backend.executed, [job1.id, job2.id])
+
+    def test_submit_release_validators_not_limited(self):
+        scheduler = qdb.processing_job.JobScheduler(self.backend, max_jobs=1)
+        job1 = _create_job()
+        scheduler.submit(job1)
+        job2 = create_private_job('release_validators', {'job': job1.id})
+        scheduler.submit(job2)
+        self.assertEqual(scheduler.running, {job1.id, job2.id})
+        self.assertEqual(scheduler.queued, [])
+        # It doesn't take the slot of the other jobs
+        job3 = _create_job()
+        scheduler.submit(job3)
+        self.assertEqual(scheduler.queued, [job3.id])
+
+    def test_submit_max_validator_jobs(self):
+        scheduler = qdb.processing_job.JobScheduler(
+            self.backend, max_jobs=1, max_validator_jobs=1)
+        job1 = _create_validator('/tmp/validator_1.biom')
+        job2 = _create_validator('/tmp/validator_2.biom')
+        job3 = _create_validator('/tmp/validator_3.biom')
+        for job in (job1, job2, job3):
+            scheduler.submit(job)
+        self.assertEqual(scheduler.running, {job1.id})
+        self.assertEqual(scheduler.queued, [job2.id, job3.id])
+        # A validator in 'waiting' status is a validator that has completed
+        self.assertEqual(job1.status, 'queued')
+        self.assertEqual(job2.status, 'in_construction')
+        self.assertEqual(job3.status, 'in_construction')
+        # They don't take the slot of the other jobs
+        job4 = _create_job()
+        scheduler.submit(job4)
+        self.assertEqual(scheduler.running, {job1.id, job4.id})
+
+        self.backend.released.set()
+        self.assertTrue(scheduler.wait(timeout=10))
+        self.assertItemsEqual(self.backend.executed,
+                              [job1.id, job2.id, job3.id, job4.id])
+        self.assertEqual(
+            [j for j in self.backend.executed if j != job4.id],
+            [job1.id, job2.id, job3.id])
+        self.assertEqual(job3.status, 'queued')
+
+    def test_submit_max_jobs_per_user_and_command(self):
+        scheduler = qdb.processing_job.JobScheduler(
+            self.backend, max_jobs=3, max_jobs_per_user=2,
+            max_jobs_per_command=1)
+        job1 = _create_job()
+        job2 = _create_job()
+        job3 = create_private_job()
+        job4 = create_private_job()
+        for job in (job1, job2, job3, job4):
+            scheduler.submit(job)
+        # job2 is blocked by the command limit and job4 by the user limit
+        self.assertEqual(scheduler.running, {job1.id, job3.id})
+        self.assertEqual(scheduler.queued, [job4.id, job2.id])
+
+        self.backend.released.set()
+        self.assertTrue(scheduler.wait(timeout=10))
+        self.assertItemsEqual(self.backend.executed,
+                              [job1.id, job2.id, job3.id, job4.id])
+
+    def test_submit_priority(self):
+        scheduler = qdb.processing_job.JobScheduler(self.backend, max_jobs=1)
+        job1 = _create_job()
+        job2 = _create_job()
+        job3 = create_private_job()
+        for job in (job1, job2, job3):
+            scheduler.submit(job)
+        # The private job goes ahead of the plugin job submitted before it
+        self.assertEqual(scheduler.queued, [job3.id, job2.id])
+
+        self.backend.released.set()
+        self.assertTrue(scheduler.wait(timeout=10))
+        self.assertEqual(self.backend.executed, [job1.id, job3.id, job2.id])
+
+    def test_wait_timeout(self):
+        scheduler = qdb.processing_job.JobScheduler(self.backend)
+        scheduler.submit(_create_job())
+        self.assertFalse(scheduler.wait(timeout=0.1))
+
+    def test_get_job_scheduler(self):
+        obs = qdb.processing_job.get_job_scheduler()
+        self.assertIsInstance(obs.backend,
+                              qdb.processing_job.LauncherBackend)
+        self.assertEqual(obs.max_jobs, qiita_config.max_running_jobs)
+        self.assertIs(qdb.processing_job.get_job_scheduler(), obs)
+
+
 @qiita_test_checker()
 class ProcessingJobTest(TestCase):
     def setUp(self):
@@ -200,6 +354,14 @@ class ProcessingJobTest(TestCase):
                        "063e553b-327c-4818-ab4a-adfe58e49860")))
         self.assertEqual(obs, exp)
 
+        obs = self.tester1._generate_cmd(use_launcher=False)
+        exp = ('bash -c \'source activate qiita; start_target_gene "%s" '
+               '"063e553b-327c-4818-ab4a-adfe58e49860" "%s"\''
+               % (qiita_config.base_url,
+                  join(qdb.util.get_work_base_dir(),
+                       "063e553b-327c-4818-ab4a-adfe58e49860")))
+        self.assertEqual(obs, exp)
+
     def test_submit(self):
         # In order to test a success, we need to actually run the job, which
         # will mean to run split libraries, for example.
@@ -272,6 +434,57 @@ class ProcessingJobTest(TestCase):
         self.assertEqual(obs.step, None)
         self.assertTrue(obs in qdb.artifact.Artifact(1).jobs())
 
+    def test_create_many(self):
+        exp_user = qdb.user.User('test@foo.bar')
+        self.assertEqual(
+            qdb.processing_job.ProcessingJob.create_many(exp_user, []), [])
+
+        parent_id = '8d2a0b4a-4e5c-4b3e-9f61-7c0e3a1f2b55'
+        child_id = '2f1c9f8e-0b7d-4a2b-8e52-6d3b1e4a9c07'
+        parent_params = _create_job().parameters
+        child_params = qdb.software.Parameters.from_default_params(
+            qdb.software.DefaultParameters(10),
+            {'input_data': [parent_id, 'demultiplexed']})
+        obs = qdb.processing_job.ProcessingJob.create_many(
+            exp_user, [parent_params, child_params], True,
+            [parent_id, child_id])
+
+        self.assertEqual([j.id for j in obs], [parent_id, child_id])
+        parent, child = obs
+        self.assertEqual(parent.user, exp_user)
+        self.assertEqual(parent.parameters, parent_params)
+        self.assertEqual(parent.status, 'in_construction')
+        self.assertEqual(parent.pending, {})
+        self.assertTrue(parent in qdb.artifact.Artifact(1).jobs())
+        self.assertEqual(child.parameters, child_params)
+        self.assertEqual(child.pending,
+                         {parent_id: {'input_data': 'demultiplexed'}})
+
+        # The jobs duplicate the existing ones
+        with self.assertRaisesRegexp(ValueError, parent_id):
+            qdb.processing_job.ProcessingJob.create_many(
+                exp_user, [parent_params])
+
+    def test_backfill_parameters_hash(self):
+        job = _create_job()
+        with qdb.sql_connection.TRN:
+            sql = """UPDATE qiita.processing_job
+                     SET parameters_hash = NULL
+                     WHERE processing_job_id = %s"""
+            qdb.sql_connection.TRN.add(sql, [job.id])
+            qdb.sql_connection.TRN.execute()
+
+        self.assertEqual(
+            qdb.processing_job.backfill_parameters_hash(batch_size=1), 1)
+        self.assertEqual(qdb.processing_job.backfill_parameters_hash(), 0)
+        with qdb.sql_connection.TRN:
+            sql = """SELECT parameters_hash
+                     FROM qiita.processing_job
+                     WHERE processing_job_id = %s"""
+            qdb.sql_connection.TRN.add(sql, [job.id])
+            self.assertEqual(qdb.sql_connection.TRN.execute_fetchlast(),
+                             job.parameters.canonical_hash)
+
     def test_set_status(self):
         job = _create_job()
         self.assertEqual(job.status, 'in_construction')
@@ -290,6 +503,48 @@ class ProcessingJobTest(TestCase):
         with self.assertRaises(qdb.exceptions.QiitaDBStatusError):
             job._set_status('running')
 
+    def test_set_status_notify(self):
+        job = _create_job()
+        listener = qdb.sql_connection.NotificationListener(
+            [qdb.processing_job.JOB_STATUS_CHANNEL])
+        with listener:
+            job._set_status('queued')
+            obs = qdb.processing_job.wait_for_job_events(
+                listener, [job.id], 5)
+            self.assertEqual(obs, [{'job_id': job.id, 'status': 'queued',
+                                    'previous': 'in_construction'}])
+
+            # The notifications of other jobs are ignored
+            _create_job()._set_status('queued')
+            self.assertEqual(qdb.processing_job.wait_for_job_events(
+                listener, [job.id], 0.1), [])
+
+    def test_hydrate(self):
+        job = _create_job().hydrate()
+        exp = qdb.processing_job.ProcessingJob(job.id)
+        self.assertEqual(job.user, exp.user)
+        self.assertEqual(job.command, exp.command)
+        self.assertEqual(job.parameters, exp.parameters)
+        self.assertEqual(job.heartbeat, exp.heartbeat)
+        self.assertEqual(job.step, exp.step)
+        self.assertEqual(job.pending, exp.pending)
+        self.assertEqual(job.hidden, exp.hidden)
+        self.assertIsNone(job.log)
+
+        self.assertEqual(job.status, 'in_construction')
+        job._set_status('queued')
+        self.assertEqual(job.status, 'queued')
+        job.update_heartbeat_state()
+        self.assertEqual(job.status, 'running')
+        self.assertIsNotNone(job.heartbeat)
+        job.step = 'demultiplexing'
+        self.assertEqual(job.step, 'demultiplexing')
+        job._set_error("Some error")
+        self.assertEqual(job.status, 'error')
+        self.assertEqual(job.log.msg, "Some error")
+        job.hide()
+        self.assertTrue(job.hidden)
+
     def test_submit_error(self):
         job = _create_job()
         job._set_status('queued')
@@ -387,6 +642,36 @@ class ProcessingJobTest(TestCase):
         self.assertEqual(obs2.status, 'success')
         self.assertEqual(job.status, 'success')
 
+    def test_release_validators_wait(self):
+        job = _create_job()
+        job._set_status('running')
+        validator = _create_validator('/tmp/validator.biom')
+        validator._set_status('running')
+        job._set_validator_jobs([validator])
+
+        thread = Thread(target=job.release_validators)
+        thread.start()
+        # The step is committed while it waits, as it doesn't wait inside a
+        # transaction
+        sql = """SELECT step
+                 FROM qiita.processing_job
+                 WHERE processing_job_id = %s"""
+        for _ in range(100):
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.add(sql, [job.id])
+                step = qdb.sql_connection.TRN.execute_fetchlast()
+            if step:
+                break
+            sleep(0.1)
+        self.assertEqual(step, "Validating outputs (1 remaining) via job(s) "
+                               "%s" % validator.id)
+        self.assertTrue(thread.is_alive())
+
+        validator._set_error('Validation error')
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(job.status, 'error')
+
     def test_complete_artifact_definition(self):
         job = _create_job()
         job._set_status('running')
@@ -1009,6 +1294,30 @@ class ProcessingWorkflowTests(TestCase):
 
         self.assertEqual(tester.graph.nodes(), [])
 
+    def test_remove_object_cache(self):
+        object_cache_ttl = qiita_config.object_cache_ttl
+        qiita_config.object_cache_ttl = 60
+        try:
+            exp_user = qdb.user.User('test@foo.bar')
+            dflt_wf = qdb.software.DefaultWorkflow(1)
+            req_params = {qdb.software.Command(1): {'input_data': 1}}
+            tester = \
+                qdb.processing_job.ProcessingWorkflow.from_default_workflow(
+                    exp_user, dflt_wf, req_params, name="Test workflow",
+                    force=True)
+            job = tester.graph.edges()[0][1]
+            # The job is in the process cache
+            qdb.processing_job.ProcessingJob(job.id)
+            self.assertTrue(
+                qdb.processing_job.ProcessingJob._is_cached(job.id))
+
+            tester.remove(job)
+            with self.assertRaises(qdb.exceptions.QiitaDBUnknownIDError):
+                qdb.processing_job.ProcessingJob(job.id)
+        finally:
+            qiita_config.object_cache_ttl = object_cache_ttl
+            qdb.base.clear_object_cache()
+
     def test_remove_error(self):
         with self.assertRaises(
                 qdb.exceptions.QiitaDBOperationNotPermittedError):
@@ -947,6 +947,31 @@ class ParametersTests(TestCase):
                '"rev_comp_mapping_barcodes": false, "sequence_max_n": 0}')
         self.assertEqual(obs, exp)
 
+    def test_hash_values(self):
+        obs = qdb.software.Parameters.hash_values(
+            {'a': 1, 'b': True, 'c': 'Golay', 'd': 0.5, 'e': None,
+             'f': [2.0, 'X']})
+        self.assertEqual(len(obs), 64)
+        # Equivalent values have the same hash
+        self.assertEqual(obs, qdb.software.Parameters.hash_values(
+            {'f': ['2', 'x'], 'e': None, 'd': '0.5', 'c': 'golay',
+             'b': 'True', 'a': 1.0}))
+        # Different values or keys have a different hash
+        self.assertNotEqual(obs, qdb.software.Parameters.hash_values(
+            {'a': 1, 'b': False, 'c': 'Golay', 'd': 0.5, 'e': None,
+             'f': [2.0, 'X']}))
+        self.assertNotEqual(obs, qdb.software.Parameters.hash_values(
+            {'a': 1, 'b': True, 'c': 'Golay', 'd': 0.5, 'e': None}))
+
+    def test_canonical_hash(self):
+        obs = qdb.software.Parameters.from_default_params(
+            qdb.software.DefaultParameters(1), {'input_data': 1})
+        exp = qdb.software.Parameters.load(
+            qdb.software.Command(1), json_str=obs.dump())
+        self.assertEqual(obs.canonical_hash, exp.canonical_hash)
+        self.assertEqual(obs.canonical_hash,
+                         qdb.software.Parameters.hash_values(obs.values))
+
 
 class DefaultWorkflowNodeTests(TestCase):
     def test_command(self):
@@ -10,7 +10,9 @@ from unittest import TestCase, main
 from os import remove, close
 from os.path import exists
 from tempfile import mkstemp
+from threading import Thread, current_thread
 
+import numpy as np
 from psycopg2._psycopg import connection
 from psycopg2.extras import DictCursor
 from psycopg2 import connect
@@ -310,6 +312,92 @@ class TestTransaction(TestBase):
                                 ('insert3', True, 3),
                                 ('insert2', False, 20)])
 
+    def test_execute_many_batched(self):
+        page_size = qdb.sql_connection.EXECUTE_BATCH_PAGE_SIZE
+        qdb.sql_connection.EXECUTE_BATCH_PAGE_SIZE = 2
+        try:
+            with qdb.sql_connection.TRN:
+                sql = """INSERT INTO qiita.test_table (str_column, int_column)
+                         VALUES (%s, %s)"""
+                args = [['insert%d' % i, i] for i in range(5)]
+                qdb.sql_connection.TRN.add(sql, args, many=True)
+                qdb.sql_connection.TRN.add(
+                    "SELECT COUNT(*) FROM qiita.test_table")
+                sql = "DELETE FROM qiita.test_table WHERE int_column = %s"
+                qdb.sql_connection.TRN.add(sql, [[0], [1]], many=True)
+                qdb.sql_connection.TRN.add(
+                    "SELECT COUNT(*) FROM qiita.test_table")
+                obs = qdb.sql_connection.TRN.execute()
+                self.assertEqual(obs[:5], [None] * 5)
+                self.assertEqual(obs[5], [[5]])
+                self.assertEqual(obs[6:8], [None, None])
+                self.assertEqual(obs[8], [[3]])
+                self.assertEqual(
+                    qdb.sql_connection.TRN.execute_fetchindex(5), [[5]])
+        finally:
+            qdb.sql_connection.EXECUTE_BATCH_PAGE_SIZE = page_size
+
+        self._assert_sql_equal([('insert2', True, 2), ('insert3', True, 3),
+                                ('insert4', True, 4)])
+
+    def test_execute_many_batched_error(self):
+        with self.assertRaises(ValueError):
+            with qdb.sql_connection.TRN:
+                sql = """INSERT INTO qiita.test_table (str_column, int_column)
+                         VALUES (%s, %s)"""
+                qdb.sql_connection.TRN.add(
+                    sql, [['insert1', 1], ['insert2', None]], many=True)
+                qdb.sql_connection.TRN.execute()
+
+        self._assert_sql_equal([])
+
+    def test_copy_from(self):
+        with qdb.sql_connection.TRN:
+            sql = """INSERT INTO qiita.test_table (str_column, int_column)
+                     VALUES (%s, %s)"""
+            qdb.sql_connection.TRN.add(sql, ['insert1', 1])
+            rows = [('tab\tnew\nline', 2, False), ('copy2', 3, True)]
+            columns = ['str_column', 'int_column', 'bool_column']
+            qdb.sql_connection.TRN.copy_from('qiita.test_table', columns, rows)
+            # The queued query was executed before the COPY
+            self.assertEqual(qdb.sql_connection.TRN._queries, [])
+            self.assertEqual(qdb.sql_connection.TRN.index, 2)
+            self._assert_sql_equal([])
+
+        self._assert_sql_equal([('insert1', True, 1),
+                                ('tab\tnew\nline', False, 2),
+                                ('copy2', True, 3)])
+
+    def test_copy_from_error(self):
+        with self.assertRaises(ValueError):
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.copy_from(
+                    'qiita.test_table', ['str_column', 'int_column'],
+                    [('insert1', 'not an int')])
+
+        self._assert_sql_equal([])
+
+    def test_copy_text(self):
+        self.assertEqual(qdb.sql_connection._copy_text(None), r'\N')
+        self.assertEqual(qdb.sql_connection._copy_text(True), 'true')
+        self.assertEqual(qdb.sql_connection._copy_text(1), '1')
+        self.assertEqual(qdb.sql_connection._copy_text(0.1), '0.1')
+        self.assertEqual(qdb.sql_connection._copy_text(float('nan')), 'NaN')
+        # The floats keep the text that the INSERTs used to store
+        self.assertEqual(qdb.sql_connection._copy_text(5.0), '5.0')
+        self.assertEqual(qdb.sql_connection._copy_text(np.float64(5.0)),
+                         '5.0')
+        self.assertEqual(qdb.sql_connection._copy_text(0.30000000000000004),
+                         '0.30000000000000004')
+        self.assertEqual(qdb.sql_connection._copy_text(123456789.12345679),
+                         '123456789.12345679')
+        self.assertEqual(qdb.sql_connection._copy_text(np.bool_(False)),
+                         'false')
+        self.assertEqual(qdb.sql_connection._copy_text(u'caf\xe9'),
+                         'caf\xc3\xa9')
+        self.assertEqual(qdb.sql_connection._copy_text('a\\b\tc\nd\re'),
+                         'a\\\\b\\tc\\nd\\re')
+
     def test_execute_return(self):
         with qdb.sql_connection.TRN:
             sql = """INSERT INTO qiita.test_table (str_column, int_column)
@@ -594,6 +682,24 @@ class TestTransaction(TestBase):
 
         self.assertTrue(exists(fp))
 
+    def test_post_commit_funcs_queries(self):
+        def func():
+            with qdb.sql_connection.TRN:
+                sql = """INSERT INTO qiita.test_table (str_column, int_column)
+                         VALUES ('post_commit', 1)"""
+                qdb.sql_connection.TRN.add(sql)
+                qdb.sql_connection.TRN.execute()
+
+        with qdb.sql_connection.TRN:
+            qdb.sql_connection.TRN.add("SELECT 42")
+            qdb.sql_connection.TRN.add_post_commit_func(func)
+
+        # The queries of the post commit functions are committed
+        self.assertEqual(
+            qdb.sql_connection.TRN._connection.get_transaction_status(),
+            TRANSACTION_STATUS_IDLE)
+        self._assert_sql_equal([('post_commit', True, 1)])
+
     def test_post_commit_funcs_error(self):
         def func():
             raise ValueError()
@@ -668,6 +774,178 @@ class TestTransaction(TestBase):
 
         self.assertEqual(qdb.sql_connection.TRN.index, 0)
 
+    def test_object_cache(self):
+        with qdb.sql_connection.TRN:
+            qdb.sql_connection.TRN.object_cache.add(('a', 1, 'QIITA'))
+            qdb.sql_connection.TRN.rollback()
+            self.assertEqual(qdb.sql_connection.TRN.object_cache, set())
+
+            qdb.sql_connection.TRN.object_cache.add(('a', 1, 'QIITA'))
+            self.assertEqual(qdb.sql_connection.TRN.object_cache,
+                             {('a', 1, 'QIITA')})
+        self.assertEqual(qdb.sql_connection.TRN.object_cache, set())
+
+    def test_thread_local_state(self):
+        obs = {}
+
+        def thread_func():
+            obs['contexts'] = qdb.sql_connection.TRN._contexts_entered
+            obs['queries'] = list(qdb.sql_connection.TRN._queries)
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.add("SELECT 43")
+                obs['result'] = qdb.sql_connection.TRN.execute_fetchlast()
+                obs['connection'] = qdb.sql_connection.TRN._connection
+
+        with qdb.sql_connection.TRN:
+            qdb.sql_connection.TRN.add("SELECT 42")
+            thread = Thread(target=thread_func)
+            thread.start()
+            thread.join()
+            # The thread did not see nor execute the queries of this thread
+            self.assertEqual(obs['contexts'], 0)
+            self.assertEqual(obs['queries'], [])
+            self.assertEqual(obs['result'], 43)
+            self.assertNotEqual(obs['connection'],
+                                qdb.sql_connection.TRN._connection)
+            self.assertEqual(qdb.sql_connection.TRN._queries,
+                             [("SELECT 42", None)])
+            self.assertEqual(qdb.sql_connection.TRN.execute_fetchlast(), 42)
+
+    def test_notification_listener(self):
+        sql = "SELECT pg_notify(%s, %s)"
+        with qdb.sql_connection.NotificationListener(
+                ['qiita_test']) as listener:
+            self.assertEqual(listener.poll(0), [])
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.add(sql, ['qiita_test', 'first'])
+                qdb.sql_connection.TRN.add(sql, ['other_channel', 'other'])
+                qdb.sql_connection.TRN.add(sql, ['qiita_test', 'second'])
+                qdb.sql_connection.TRN.execute()
+                # Nothing is delivered until the transaction commits
+                self.assertEqual(listener.poll(0), [])
+            self.assertEqual(listener.poll(5), [('qiita_test', 'first'),
+                                                ('qiita_test', 'second')])
+
+            # The notifications of a rolled back transaction are not sent
+            with qdb.sql_connection.TRN:
+                qdb.sql_connection.TRN.add(sql, ['qiita_test', 'third'])
+                qdb.sql_connection.TRN.execute()
+                qdb.sql_connection.TRN.rollback()
+            self.assertEqual(listener.poll(0.1), [])
+
+
+class TestConnectionPool(TestBase):
+    def _get_pool(self, **kwargs):
+        return qdb.sql_connection.ConnectionPool(
+            qdb.sql_connection.SQLConnectionHandler._user_args, **kwargs)
+
+    def test_getconn_putconn(self):
+        pool = self._get_pool()
+        self.assertEqual(pool.size, 0)
+        conn = pool.getconn()
+        self.assertTrue(isinstance(conn, connection))
+        self.assertEqual(pool.size, 1)
+        pool.putconn(conn)
+        self.assertEqual(pool.size, 1)
+        # The connection is reused
+        self.assertIs(pool.getconn(), conn)
+        pool.putconn(conn, close=True)
+        self.assertEqual(pool.size, 0)
+        self.assertNotEqual(conn.closed, 0)
+
+    def test_putconn_rollback(self):
+        pool = self._get_pool()
+        conn = pool.getconn()
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO qiita.test_table (int_column) VALUES (1)")
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        pool.putconn(conn)
+        self.assertEqual(conn.get_transaction_status(),
+                         TRANSACTION_STATUS_IDLE)
+        self.assertEqual(conn.isolation_level, ISOLATION_LEVEL_READ_COMMITTED)
+        pool.putconn(pool.getconn(), close=True)
+
+    def test_getconn_health_check(self):
+        pool = self._get_pool()
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.close()
+        obs = pool.getconn()
+        self.assertIsNot(obs, conn)
+        self.assertEqual(obs.closed, 0)
+        self.assertEqual(pool.size, 1)
+        pool.putconn(obs, close=True)
+
+    def test_getconn_exhausted(self):
+        pool = self._get_pool(max_size=1)
+        conn = pool.getconn()
+        timeout = qdb.sql_connection.POOL_CHECKOUT_TIMEOUT
+        qdb.sql_connection.POOL_CHECKOUT_TIMEOUT = 0.1
+        try:
+            with self.assertRaises(RuntimeError):
+                pool.getconn()
+        finally:
+            qdb.sql_connection.POOL_CHECKOUT_TIMEOUT = timeout
+        pool.putconn(conn, close=True)
+
+    def test_getconn_connect_error(self):
+        args = dict(qdb.sql_connection.SQLConnectionHandler._user_args,
+                    database='qiita_does_not_exist')
+        pool = qdb.sql_connection.ConnectionPool(args, max_size=1)
+        with self.assertRaises(RuntimeError):
+            pool.getconn()
+        # The slot reserved for the connection is released
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(pool._pending, 0)
+
+    def test_getconn_reclaim_dead_thread(self):
+        pool = self._get_pool(max_size=1)
+        obs = []
+        thread = Thread(target=lambda: obs.append(
+            pool.getconn(owner=current_thread())))
+        thread.start()
+        thread.join()
+        # The connection of the dead thread is reclaimed and closed
+        conn = pool.getconn()
+        self.assertNotEqual(obs[0].closed, 0)
+        self.assertEqual(pool.size, 1)
+        pool.putconn(conn, close=True)
+
+    def test_idle_timeout(self):
+        pool = self._get_pool(min_size=1, idle_timeout=1)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        self.assertEqual(pool.size, 3)
+        # Make the connections expire
+        pool._idle = [(c, t - 10) for c, t in pool._idle]
+        conn = pool.getconn()
+        # Only the most recently released connection is kept
+        self.assertIs(conn, conns[-1])
+        self.assertEqual(pool.size, 1)
+        self.assertNotEqual(conns[0].closed, 0)
+        self.assertNotEqual(conns[1].closed, 0)
+        pool.putconn(conn, close=True)
+
+    def test_fork(self):
+        pool = self._get_pool()
+        conn = pool.getconn()
+        # Simulate that we are in a forked process
+        pool._pid = -1
+        pool.putconn(conn)
+        self.assertEqual(pool.size, 0)
+        # The connection of the parent process is not closed
+        self.assertEqual(conn.closed, 0)
+        conn.close()
+
+    def test_get_pool(self):
+        args = qdb.sql_connection.SQLConnectionHandler._user_args
+        obs = qdb.sql_connection.get_pool(args)
+        self.assertIs(qdb.sql_connection.get_pool(dict(args)), obs)
+        self.assertIsNot(qdb.sql_connection.get_pool(
+            qdb.sql_connection.SQLConnectionHandler._admin_args), obs)
+        self.assertEqual(obs.max_size, qiita_config.pool_max_size)
+
 
 if __name__ == "__main__":
     main()
@@ -559,6 +559,30 @@ class TestStudy(TestCase):
     def test_portals(self):
         self.assertEqual(self.study._portals, ['QIITA'])
 
+    def test_hydrate(self):
+        study = qdb.study.Study(1).hydrate()
+        self.assertEqual(study.title, self.study.title)
+        self.assertEqual(study.info, self.study.info)
+        self.assertEqual(study.investigation, self.study.investigation)
+        self.assertEqual(study.owner, self.study.owner)
+        self.assertEqual(study.ebi_study_accession,
+                         self.study.ebi_study_accession)
+        self.assertEqual(study.ebi_submission_status,
+                         self.study.ebi_submission_status)
+
+        new = qdb.study.Study.create(
+            qdb.user.User('test@foo.bar'), 'Test hydrate', self.info).hydrate()
+        self.assertIsNone(new.investigation)
+        new.title = "Hydrated title"
+        self.assertEqual(new.title, "Hydrated title")
+        new.info = {'study_alias': 'hydrated'}
+        self.assertEqual(new.info['study_alias'], 'hydrated')
+        new.ebi_study_accession = 'EBI654321-BB'
+        self.assertEqual(new.ebi_study_accession, 'EBI654321-BB')
+        new.ebi_submission_status = 'submitting'
+        self.assertEqual(new.ebi_submission_status, 'submitting')
+        qdb.study.Study.delete(new.id)
+
     def test_ebi_study_accession(self):
         self.assertEqual(self.study.ebi_study_accession, 'EBI123456-BB')
         new = qdb.study.Study.create(
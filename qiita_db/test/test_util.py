@@ -69,6 +69,41 @@ class DBUtilTests(TestCase):
                "pass_reset_timestamp"}
         self.assertEqual(set(obs), exp)
 
+    def test_get_table_cols_catalogue(self):
+        qdb.util.clear_table_catalogue()
+        obs = qdb.util.get_table_cols("sample_1")
+        self.assertIn("sample_id", obs)
+        self.assertIn("sample_1", qdb.util._TABLE_CATALOGUE)
+        # The catalogue is used while its version does not change
+        version, cols = qdb.util._TABLE_CATALOGUE["sample_1"]
+        qdb.util._TABLE_CATALOGUE["sample_1"] = (version, ["sample_id"])
+        self.assertEqual(qdb.util.get_table_cols("sample_1"), ["sample_id"])
+        # The returned list can be modified without affecting the catalogue
+        qdb.util.get_table_cols("sample_1").remove("sample_id")
+        self.assertEqual(qdb.util.get_table_cols("sample_1"), ["sample_id"])
+        # Once the version changes, the columns are retrieved from the DB
+        with qdb.sql_connection.TRN:
+            qdb.util.bump_table_catalogue_version()
+            self.assertEqual(qdb.util.get_table_cols("sample_1"), obs)
+            self.assertEqual(qdb.util._TABLE_CATALOGUE["sample_1"],
+                             (version + 1, obs))
+            qdb.sql_connection.TRN.rollback()
+        # The catalogue is cleared on rollback
+        self.assertEqual(qdb.util._TABLE_CATALOGUE, {})
+        self.assertEqual(qdb.util.get_table_cols("sample_1"), obs)
+        # The version is increased again once the transaction is committed,
+        # so the columns cached before the commit are not used
+        with qdb.sql_connection.TRN:
+            qdb.util.bump_table_catalogue_version()
+            qdb.util.get_table_cols("sample_1")
+            version = qdb.util._TABLE_CATALOGUE["sample_1"][0]
+        qdb.util.get_table_cols("sample_1")
+        self.assertEqual(qdb.util._TABLE_CATALOGUE["sample_1"][0],
+                         version + 1)
+        # Other tables are not cached
+        qdb.util.get_table_cols("qiita_user")
+        self.assertNotIn("qiita_user", qdb.util._TABLE_CATALOGUE)
+
     def test_exists_table(self):
         """Correctly checks if a table exists"""
         # True cases
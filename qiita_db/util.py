@@ -21,6 +21,9 @@ Methods
     get_mountpoint
     insert_filepaths
     check_table_cols
+    get_table_cols
+    bump_table_catalogue_version
+    clear_table_catalogue
     check_required_columns
     convert_from_id
     convert_to_id
@@ -55,6 +58,7 @@ from json import dumps
 from datetime import datetime
 from itertools import chain
 from contextlib import contextmanager
+from re import compile as re_compile
 from future.builtins import bytes, str
 import h5py
 
@@ -302,6 +306,50 @@ def check_required_columns(keys, table):
                 "Required keys missing: %s" % required.difference(keys))
 
 
+# Process-level catalogue of the columns of the metadata template tables, in
+# the form {table: (catalogue version, list of columns)}. The catalogue
+# version is a sequence in the DB, so the catalogue is invalidated across
+# processes as soon as the transaction modifying the tables is committed
+_TABLE_CATALOGUE = {}
+_CATALOGUE_TABLE_RE = re_compile(r'^(sample|prep)_\d+$')
+
+
+def clear_table_catalogue():
+    """Empties the process-level catalogue of metadata template columns"""
+    _TABLE_CATALOGUE.clear()
+
+
+def _next_table_catalogue_version():
+    """Increases the version of the catalogue of metadata template columns"""
+    with qdb.sql_connection.TRN:
+        qdb.sql_connection.TRN.add(
+            "SELECT nextval('qiita.metadata_template_catalogue_version')")
+        qdb.sql_connection.TRN.execute()
+
+
+def bump_table_catalogue_version():
+    """Invalidates the catalogue of the metadata template columns
+
+    It should be called in the transaction that creates or drops a metadata
+    template table or adds or removes any of its columns.
+
+    Notes
+    -----
+    The version is a sequence, so increasing it doesn't lock other
+    transactions and the other processes see the new version right away,
+    before the changes are committed. Hence, it is increased again once the
+    transaction is committed, so the columns cached by other processes in
+    between are invalidated.
+    """
+    with qdb.sql_connection.TRN:
+        _next_table_catalogue_version()
+        qdb.sql_connection.TRN.add_post_commit_func(
+            _next_table_catalogue_version)
+        # The catalogue may hold the columns of the tables as seen by this
+        # transaction, which will not exist if it is rolled back
+        qdb.sql_connection.TRN.add_post_rollback_func(clear_table_catalogue)
+
+
 def check_table_cols(keys, table):
     """Makes sure all keys correspond to column headers in a table
 
@@ -319,19 +367,15 @@ def check_table_cols(keys, table):
     RuntimeError
         Unable to get columns from database
     """
-    with qdb.sql_connection.TRN:
-        sql = """SELECT column_name FROM information_schema.columns
-                 WHERE table_name = %s"""
-        qdb.sql_connection.TRN.add(sql, [table])
-        cols = qdb.sql_connection.TRN.execute_fetchflatten()
-        # Test needed because a user with certain permissions can query without
-        # error but be unable to get the column names
-        if len(cols) == 0:
-            raise RuntimeError("Unable to fetch column names for table %s"
-                               % table)
-        if len(set(keys).difference(cols)) > 0:
-            raise qdb.exceptions.QiitaDBColumnError(
-                "Non-database keys found: %s" % set(keys).difference(cols))
+    cols = get_table_cols(table)
+    # Test needed because a user with certain permissions can query without
+    # error but be unable to get the column names
+    if len(cols) == 0:
+        raise RuntimeError("Unable to fetch column names for table %s"
+                           % table)
+    if len(set(keys).difference(cols)) > 0:
+        raise qdb.exceptions.QiitaDBColumnError(
+            "Non-database keys found: %s" % set(keys).difference(cols))
 
 
 def get_table_cols(table):
@@ -346,12 +390,33 @@ def get_table_cols(table):
     -------
     list of str
         The column headers of `table`
+
+    Notes
+    -----
+    The columns of the metadata template tables (sample_<id> and prep_<id>)
+    are kept in a process-level catalogue, which is only refreshed when its
+    version in the DB changes. See bump_table_catalogue_version
     """
     with qdb.sql_connection.TRN:
+        cached = _CATALOGUE_TABLE_RE.match(table) is not None
+        if cached:
+            qdb.sql_connection.TRN.add(
+                "SELECT last_value "
+                "FROM qiita.metadata_template_catalogue_version")
+            version = qdb.sql_connection.TRN.execute_fetchlast()
+            entry = _TABLE_CATALOGUE.get(table)
+            if entry is not None and entry[0] == version:
+                return list(entry[1])
+
         sql = """SELECT column_name FROM information_schema.columns
                  WHERE table_name=%s AND table_schema='qiita'"""
         qdb.sql_connection.TRN.add(sql, [table])
-        return qdb.sql_connection.TRN.execute_fetchflatten()
+        cols = qdb.sql_connection.TRN.execute_fetchflatten()
+
+        if cached:
+            _TABLE_CATALOGUE[table] = (version, cols)
+            cols = list(cols)
+        return cols
 
 
 def exists_table(table):
@@ -367,6 +432,10 @@ def exists_table(table):
     bool
         Whether `table` exists on the database or not
     """
+    if _CATALOGUE_TABLE_RE.match(table):
+        # A table has at least one column, use the catalogue
+        return len(get_table_cols(table)) > 0
+
     with qdb.sql_connection.TRN:
         sql = """SELECT exists(
                     SELECT * FROM information_schema.tables
@@ -1397,8 +1466,11 @@ def generate_study_list(study_ids, public_only=False):
                 WHERE study_id IN %s
                 ORDER BY study_id"""
         qdb.sql_connection.TRN.add(sql, [tuple(study_ids)])
+        results = qdb.sql_connection.TRN.execute_fetchindex()
+        studies = {s.id: s for s in qdb.study.Study.load_many(
+            [r['study_id'] for r in results])}
         infolist = []
-        for info in qdb.sql_connection.TRN.execute_fetchindex():
+        for info in results:
             info = dict(info)
 
             # publication info
@@ -1431,7 +1503,7 @@ def generate_study_list(study_ids, public_only=False):
             del info["shared_with_name"]
             del info["shared_with_email"]
 
-            info['status'] = qdb.study.Study(info['study_id']).status
+            info['status'] = studies[info['study_id']].status
             infolist.append(info)
     return infolist
 
@@ -1486,8 +1558,11 @@ def generate_study_list_without_artifacts(study_ids, public_only=False):
                 WHERE study_id IN %s
                 ORDER BY study_id"""
         qdb.sql_connection.TRN.add(sql, [tuple(study_ids)])
+        results = qdb.sql_connection.TRN.execute_fetchindex()
+        studies = {s.id: s for s in qdb.study.Study.load_many(
+            [r['study_id'] for r in results])}
         infolist = []
-        for info in qdb.sql_connection.TRN.execute_fetchindex():
+        for info in results:
             info = dict(info)
 
             # publication info
@@ -1509,7 +1584,7 @@ def generate_study_list_without_artifacts(study_ids, public_only=False):
             del info["pi_email"]
             del info["pi_name"]
 
-            info['status'] = qdb.study.Study(info['study_id']).status
+            info['status'] = studies[info['study_id']].status
             infolist.append(info)
     return infolist
 
@@ -37,8 +37,6 @@ class StudySamplesHandler(RESTHandler):
         if study.sample_template is None:
             self.fail('No sample information found', 404)
             return
-        else:
-            sample_info = study.sample_template.to_dataframe()
 
         data = pd.DataFrame.from_dict(json_decode(self.request.body),
                                       orient='index')
@@ -60,7 +58,7 @@ class StudySamplesHandler(RESTHandler):
                           categories_not_found=sorted(unknown))
             return
 
-        existing_samples = set(sample_info.index)
+        existing_samples = set(study.sample_template.keys())
         overlapping_ids = set(data.index).intersection(existing_samples)
         new_ids = set(data.index) - existing_samples
         status = 500
@@ -108,7 +106,7 @@ class StudySamplesCategoriesHandler(RESTHandler):
 
         blob = {'header': categories,
                 'samples': {}}
-        df = study.sample_template.to_dataframe()
+        df = study.sample_template.to_dataframe(columns=categories)
         for idx, row in df[categories].iterrows():
             blob['samples'][idx] = list(row)
 
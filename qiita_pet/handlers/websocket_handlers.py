@@ -110,7 +110,7 @@ class SelectedSocketHandler(WebSocketHandler, BaseHandler):
             default.remove_samples([Artifact(data['proc_data'])])
         elif 'clear' in msginfo:
             data = msginfo['clear']
-            artifacts = [Artifact(_id) for _id in data['pids']]
+            artifacts = Artifact.load_many(data['pids'])
             default.remove_samples(artifacts)
         self.write_message(msg)
 
@@ -187,6 +187,11 @@ def get_network_nodes_edges(graph, full_access, nodes=None, edges=None):
     # n[0] is the data type: job/artifact/type
     # n[1] is the object
     for n in graph.nodes():
+        if n[0] in ('job', 'artifact'):
+            # The objects are only read here, so retrieve all their
+            # information at once
+            n[1].hydrate()
+
         if n[0] == 'job':
             atype = 'job'
             name = n[1].command.name
@@ -6,12 +6,13 @@
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from os.path import join, isdir
+from os.path import basename, join, isdir
 from shutil import rmtree
 from tarfile import open as taropen
 from tempfile import mkdtemp
 from os import environ
 from traceback import format_exc
+from future.utils import viewitems
 
 from qiita_db.artifact import Artifact
 from qiita_db.logger import LogEntry
@@ -61,15 +62,18 @@ def submit_EBI(preprocessed_data_id, action, send):
             LogEntry.create('Runtime',
                             ("Submitting sequences for pre_processed_id: "
                              "%d" % preprocessed_data_id))
-            for cmd in ebi_submission.generate_send_sequences_cmd():
-                stdout, stderr, rv = system_call(cmd)
-                if rv != 0:
-                    error_msg = ("Error:\nStd output:%s\nStd error:%s" % (
-                        stdout, stderr))
-                    raise ComputeError(error_msg)
-                open(ebi_submission.ascp_reply, 'a').write(
-                    'stdout:\n%s\n\nstderr: %s' % (stdout, stderr))
-            environ['ASPERA_SCP_PASS'] = old_ascp_pass
+            # only the files that were not sent in a previous attempt are
+            # sent, retrying each of them independently
+            transfer = ebi_submission.generate_sequences_transfer()
+            try:
+                errors = transfer.transfer()
+            finally:
+                environ['ASPERA_SCP_PASS'] = old_ascp_pass
+            if errors:
+                error_msg = "Error:\n%s" % '\n'.join(
+                    "%s:\n%s" % (basename(fp), e)
+                    for fp, e in sorted(viewitems(errors)))
+                raise ComputeError(error_msg)
             LogEntry.create('Runtime',
                             ('Submission of sequences of pre_processed_id: '
                              '%d completed successfully' %
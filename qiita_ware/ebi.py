@@ -7,8 +7,8 @@
 # -----------------------------------------------------------------------------
 
 from os.path import basename, join, isdir, isfile, exists
-from shutil import copyfile
-from os import makedirs, remove, listdir
+from shutil import copyfileobj
+from os import remove, listdir
 from datetime import date, timedelta
 from urllib import quote
 from xml.etree import ElementTree as ET
@@ -16,20 +16,22 @@ from xml.etree.ElementTree import ParseError
 from xml.sax.saxutils import escape
 from gzip import GzipFile
 from functools import partial
+from multiprocessing import Pool
 from h5py import File
-from future.utils import viewitems, viewkeys
+from future.utils import viewitems, viewkeys, viewvalues
+from hashlib import md5
 from skbio.util import safe_md5, create_dir
 from qiita_files.demux import to_per_sample_ascii
 
 from qiita_core.qiita_settings import qiita_config
 from qiita_ware.exceptions import EBISubmissionError
+from qiita_ware.ebi_transfer import ASCPTransferManager
 from qiita_db.logger import LogEntry
 from qiita_db.ontology import Ontology
 from qiita_db.util import convert_to_id, get_mountpoint, open_file
 from qiita_db.artifact import Artifact
 from qiita_db.metadata_template.constants import (
     TARGET_GENE_DATA_TYPES, PREP_TEMPLATE_COLUMNS_TARGET_GENE)
-from qiita_db.processing_job import _system_call as system_call
 
 
 def clean_whitespace(text):
@@ -48,6 +50,180 @@ def clean_whitespace(text):
     return ' '.join(unicode(str(text), 'utf8').split())
 
 
+class _MD5File(object):
+    """Write-only file-like object that computes the MD5 of what is written
+
+    Parameters
+    ----------
+    fh : file
+        The file in which the data is written
+    """
+    def __init__(self, fh):
+        self.fh = fh
+        # GzipFile uses the name to fill the gzip header
+        self.name = fh.name
+        self.md5 = md5()
+
+    def write(self, data):
+        self.md5.update(data)
+        self.fh.write(data)
+
+    def flush(self):
+        self.fh.flush()
+
+    def hexdigest(self):
+        return self.md5.hexdigest()
+
+
+def _write_fastq_gz(records, fp, mtime):
+    """Writes the fastq records in a gzipped file
+
+    Parameters
+    ----------
+    records : iterable of str
+        The fastq records to write
+    fp : str
+        The filepath of the gzipped file
+    mtime : float
+        The time to use when creating the gz file. If None, the current time
+        will be used by gzip.GzipFile
+
+    Returns
+    -------
+    str or None
+        The MD5 of the gzipped file, or None if no record has been written
+    """
+    wrote_sequences = False
+    with open(fp, 'wb') as f:
+        md5_f = _MD5File(f)
+        with GzipFile(fileobj=md5_f, mode='w', mtime=mtime,
+                      compresslevel=qiita_config.ebi_gzip_level) as fh:
+            for record in records:
+                fh.write(record)
+                wrote_sequences = True
+    return md5_f.hexdigest() if wrote_sequences else None
+
+
+def _demux_to_fastq_gz(args):
+    """Writes the per-sample gzipped fastq files of some samples of a demux
+
+    Parameters
+    ----------
+    args : (str, list of (str, str), float)
+        The filepath of the demux file, the samples to write with the
+        filepaths of their gzipped fastq files and the mtime of the files. A
+        single tuple is used so it can be mapped over a pool of processes
+
+    Returns
+    -------
+    dict of {str: str}
+        The MD5 of the files of the samples with sequences, keyed by sample.
+        The files of the samples without sequences are removed
+    """
+    demux_fp, sample_fps, mtime = args
+    sample_fps = dict(sample_fps)
+    md5s = {}
+    # each process opens the demux file, so the HDF5 handler is not shared
+    with open_file(demux_fp) as demux_fh:
+        for s, i in to_per_sample_ascii(demux_fh, list(sample_fps)):
+            sample_fp = sample_fps[s]
+            checksum = _write_fastq_gz(i, sample_fp, mtime)
+            if checksum is not None:
+                md5s[s] = checksum
+            else:
+                remove(sample_fp)
+    return md5s
+
+
+def _fastq_to_fastq_gz(args):
+    """Copies the fastq files of some samples as gzipped files
+
+    Parameters
+    ----------
+    args : (list of (str, str, str), float)
+        The samples with the filepaths of their fastq files and the filepaths
+        of their gzipped copies and the mtime of the gzipped files. A single
+        tuple is used so it can be mapped over a pool of processes
+
+    Returns
+    -------
+    dict of {str: str}
+        The MD5 of the gzipped copies, keyed by sample
+    """
+    fps, mtime = args
+    md5s = {}
+    for s, fp, new_fp in fps:
+        if fp.endswith('.gz'):
+            with open(fp, 'rb') as f_in, open(new_fp, 'wb') as f_out:
+                md5_f = _MD5File(f_out)
+                copyfileobj(f_in, md5_f)
+        else:
+            with open(fp, 'rb') as f_in, open(new_fp, 'wb') as f_out:
+                md5_f = _MD5File(f_out)
+                with GzipFile(fileobj=md5_f, mode='w', mtime=mtime,
+                              compresslevel=qiita_config.ebi_gzip_level) as fh:
+                    copyfileobj(f_in, fh)
+        md5s[s] = md5_f.hexdigest()
+    return md5s
+
+
+def _dataframe_to_dicts(df):
+    """Converts the rows of a metadata DataFrame in dictionaries
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The metadata, as returned by MetadataTemplate.to_dataframe
+
+    Returns
+    -------
+    dict of {str: dict of {str: str}}
+        The metadata of each sample, in the form {category: value}, keyed by
+        sample id
+    """
+    columns = df.columns.tolist()
+    return {sid: dict(zip(columns, values))
+            for sid, values in zip(df.index, df.values.tolist())}
+
+
+def _map_in_pool(func, items, mtime, *args):
+    """Maps `func` over slices of `items`, using a pool of processes
+
+    Parameters
+    ----------
+    func : function
+        The function to map. It receives a tuple with `args`, a slice of
+        `items` and `mtime`
+    items : list
+        The items to split among the processes
+    mtime : float
+        The mtime argument of `func`
+    args : tuple
+        The leading arguments of `func`
+
+    Returns
+    -------
+    list
+        The results of `func` for each slice of `items`
+
+    Notes
+    -----
+    The number of processes is set by qiita_config.ebi_demux_workers. The
+    items are not split if there is a single process
+    """
+    workers = min(qiita_config.ebi_demux_workers, len(items))
+    if workers <= 1:
+        return [func(args + (items, mtime))]
+
+    # round-robin, so the big samples (usually sorted together) are spread
+    chunks = [items[i::workers] for i in range(workers)]
+    pool = Pool(workers)
+    try:
+        return pool.map(func, [args + (c, mtime) for c in chunks])
+    finally:
+        pool.terminate()
+
+
 class EBISubmission(object):
     """Define an EBI submission, generate submission files and submit
 
@@ -165,7 +341,9 @@ class EBISubmission(object):
         self.ebi_dir = '%d_ebi_submission' % artifact_id
         self.full_ebi_dir = join(base_fp, self.ebi_dir)
         self.ascp_reply = join(self.full_ebi_dir, 'ascp_reply.txt')
+        self.ascp_ledger = join(self.full_ebi_dir, 'ascp_ledger.txt')
         self.curl_reply = join(self.full_ebi_dir, 'curl_reply.xml')
+        self.md5_manifest = join(self.full_ebi_dir, 'md5_manifest.txt')
         self.xml_dir = join(self.full_ebi_dir, 'xml_dir')
         self.study_xml_fp = None
         self.sample_xml_fp = None
@@ -199,10 +377,18 @@ class EBISubmission(object):
         get_output_fp = partial(join, self.full_ebi_dir)
         nvp = []
         nvim = []
-        for k, v in viewitems(self.sample_template):
-            if k not in self.prep_template:
+        # the metadata of both templates is retrieved in bulk, the id columns
+        # added by to_dataframe are not part of the metadata
+        st = self.sample_template.to_dataframe()
+        del st['qiita_study_id']
+        st_metadata = _dataframe_to_dicts(st)
+        pt = self.prep_template.to_dataframe()
+        del pt['qiita_prep_id']
+        pt_metadata = _dataframe_to_dicts(pt)
+        for k, v in viewitems(st_metadata):
+            if k not in pt_metadata:
                 continue
-            sample_prep = self.prep_template[k]
+            sample_prep = pt_metadata[k]
 
             # validating required fields
             if ('platform' not in sample_prep or
@@ -243,6 +429,9 @@ class EBISubmission(object):
         self._sample_aliases = {}
         self._experiment_aliases = {}
         self._run_aliases = {}
+        # The MD5 of the per-sample files, keyed by sample. Filled when the
+        # files are written or read from self.md5_manifest
+        self._md5s = {}
 
         self._ebi_sample_accessions = \
             self.sample_template.ebi_sample_accessions
@@ -384,6 +573,25 @@ class EBISubmission(object):
         ET.Element
             Object with sample XML values
         """
+        sample_set, sample_elements = self._sample_xml(samples)
+        sample_set.extend(sample_elements)
+        return sample_set
+
+    def _sample_xml(self, samples=None):
+        """Generates the elements of the sample XML file
+
+        Parameters
+        ----------
+        samples : list of str, optional
+            The list of samples to be included in the sample xml. If not
+            provided or an empty list is provided, all the samples are used
+
+        Returns
+        -------
+        ET.Element, generator of ET.Element
+            The root element, without children, and the generator of its
+            children, one per sample
+        """
         sample_set = ET.Element('SAMPLE_SET', {
             'xmlns:xsi': self.xmlns_xsi,
             "xsi:noNamespaceSchemaLocation": self.xsi_noNSL % "sample"})
@@ -391,9 +599,13 @@ class EBISubmission(object):
         if not samples:
             samples = viewkeys(self.samples)
 
-        for sample_name in sorted(samples):
+        return sample_set, self._iter_sample_xml(sorted(samples))
+
+    def _iter_sample_xml(self, samples):
+        """Yields the SAMPLE element of each sample in `samples`"""
+        for sample_name in samples:
             sample_info = dict(self.samples[sample_name])
-            sample = ET.SubElement(sample_set, 'SAMPLE', {
+            sample = ET.Element('SAMPLE', {
                 'alias': self._get_sample_alias(sample_name),
                 'center_name': qiita_config.ebi_center_name}
             )
@@ -421,7 +633,7 @@ class EBISubmission(object):
                                                   'SAMPLE_ATTRIBUTE',
                                                   sample_info)
 
-        return sample_set
+            yield sample
 
     def _generate_spot_descriptor(self, design, platform):
         """This XML element (and its subelements) must be written for every
@@ -460,19 +672,41 @@ class EBISubmission(object):
         ET.Element
             Object with experiment XML values
         """
-        study_accession = self.study.ebi_study_accession
-        if study_accession:
-            study_ref_dict = {'accession': study_accession}
-        else:
-            study_ref_dict = {'refname': self._get_study_alias()}
+        experiment_set, experiment_elements = self._experiment_xml(samples)
+        experiment_set.extend(experiment_elements)
+        return experiment_set
 
+    def _experiment_xml(self, samples=None):
+        """Generates the elements of the experiment XML file
+
+        Parameters
+        ----------
+        samples : list of str, optional
+            The list of samples to be included in the experiment xml
+
+        Returns
+        -------
+        ET.Element, generator of ET.Element
+            The root element, without children, and the generator of its
+            children, one per sample
+        """
         experiment_set = ET.Element('EXPERIMENT_SET', {
             'xmlns:xsi': self.xmlns_xsi,
             "xsi:noNamespaceSchemaLocation": self.xsi_noNSL % "experiment"})
 
         samples = samples if samples is not None else viewkeys(self.samples)
 
-        for sample_name in sorted(samples):
+        return experiment_set, self._iter_experiment_xml(sorted(samples))
+
+    def _iter_experiment_xml(self, samples):
+        """Yields the EXPERIMENT element of each sample in `samples`"""
+        study_accession = self.study.ebi_study_accession
+        if study_accession:
+            study_ref_dict = {'accession': study_accession}
+        else:
+            study_ref_dict = {'refname': self._get_study_alias()}
+
+        for sample_name in samples:
             experiment_alias = self._get_experiment_alias(sample_name)
             sample_prep = dict(self.samples_prep[sample_name])
             if self._ebi_sample_accessions[sample_name]:
@@ -483,7 +717,7 @@ class EBISubmission(object):
                     'refname': self._get_sample_alias(sample_name)}
 
             platform = sample_prep.pop('platform')
-            experiment = ET.SubElement(experiment_set, 'EXPERIMENT', {
+            experiment = ET.Element('EXPERIMENT', {
                 'alias': experiment_alias,
                 'center_name': qiita_config.ebi_center_name}
             )
@@ -543,7 +777,7 @@ class EBISubmission(object):
                                                   'EXPERIMENT_ATTRIBUTE',
                                                   sample_prep)
 
-        return experiment_set
+            yield experiment
 
     def generate_run_xml(self):
         """Generates the run XML file
@@ -553,12 +787,27 @@ class EBISubmission(object):
         ET.Element
             Object with run XML values
         """
+        run_set, run_elements = self._run_xml()
+        run_set.extend(run_elements)
+        return run_set
+
+    def _run_xml(self):
+        """Generates the elements of the run XML file
+
+        Returns
+        -------
+        ET.Element, generator of ET.Element
+            The root element, without children, and the generator of its
+            children, one per sample
+        """
         run_set = ET.Element('RUN_SET', {
             'xmlns:xsi': self.xmlns_xsi,
             "xsi:noNamespaceSchemaLocation": self.xsi_noNSL % "run"})
-        for sample_name, sample_prep in sorted(viewitems(self.samples_prep)):
-            sample_prep = dict(sample_prep)
+        return run_set, self._iter_run_xml(sorted(self.samples_prep))
 
+    def _iter_run_xml(self, samples):
+        """Yields the RUN element of each sample in `samples`"""
+        for sample_name in samples:
             if self._ebi_experiment_accessions[sample_name]:
                 experiment_ref_dict = {
                     'accession': self._ebi_experiment_accessions[sample_name]}
@@ -570,10 +819,14 @@ class EBISubmission(object):
             file_type = 'fastq'
             file_path = self.sample_demux_fps[sample_name]
 
-            with open(file_path) as fp:
-                md5 = safe_md5(fp).hexdigest()
+            # the MD5 is computed when the file is written, but files written
+            # before the MD5 manifest existed need to be read again
+            checksum = self._md5s.get(sample_name)
+            if checksum is None:
+                with open(file_path) as fp:
+                    checksum = safe_md5(fp).hexdigest()
 
-            run = ET.SubElement(run_set, 'RUN', {
+            run = ET.Element('RUN', {
                 'alias': self._get_run_alias(sample_name),
                 'center_name': qiita_config.ebi_center_name}
             )
@@ -585,10 +838,10 @@ class EBISubmission(object):
                 'filetype': file_type,
                 'quality_scoring_system': 'phred',
                 'checksum_method': 'MD5',
-                'checksum': md5}
+                'checksum': checksum}
             )
 
-        return run_set
+            yield run
 
     def generate_submission_xml(self, submission_date=None):
         """Generates the submission XML file
@@ -656,7 +909,7 @@ class EBISubmission(object):
 
         return submission_set
 
-    def write_xml_file(self, element, fp):
+    def write_xml_file(self, element, fp, children=None):
         """Writes an XML file after calling one of the XML generation
         functions
 
@@ -666,9 +919,34 @@ class EBISubmission(object):
             The Element to be written
         fp : str
             The filepath to which the XML will be written
+        children : iterable of ET.Element, optional
+            Children of `element`, written after its current children. They
+            are serialized one at a time, so the full tree is never held in
+            memory
+
+        Notes
+        -----
+        The output is the same as if `children` were appended to `element`
+        before writing it
         """
         create_dir(self.xml_dir)
-        ET.ElementTree(element).write(fp, encoding='UTF-8')
+        if children is None:
+            ET.ElementTree(element).write(fp, encoding='UTF-8')
+            return
+
+        # Serialize the element with a placeholder child, so its start and
+        # end tags are written by ElementTree
+        placeholder = ET.SubElement(element, 'QIITA_PLACEHOLDER')
+        head, tail = ET.tostring(element, encoding='utf-8').split(
+            ET.tostring(placeholder, encoding='utf-8'))
+        element.remove(placeholder)
+
+        with open(fp, 'w') as f:
+            f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+            f.write(head)
+            for child in children:
+                f.write(ET.tostring(child, encoding='utf-8'))
+            f.write(tail)
 
     def generate_xml_files(self):
         """Generate all the XML files"""
@@ -694,8 +972,8 @@ class EBISubmission(object):
             new_samples = new_samples.intersection(self.samples)
             if new_samples:
                 self.sample_xml_fp = get_output_fp('sample.xml')
-                self.write_xml_file(self.generate_sample_xml(new_samples),
-                                    self.sample_xml_fp)
+                sample_set, samples = self._sample_xml(new_samples)
+                self.write_xml_file(sample_set, self.sample_xml_fp, samples)
 
             # The experiment.xml needs to be generated if and only if there are
             # samples in the current submission that do NO have an
@@ -707,12 +985,15 @@ class EBISubmission(object):
             new_samples = new_samples.intersection(self.samples)
             if new_samples:
                 self.experiment_xml_fp = get_output_fp('experiment.xml')
-                self.write_xml_file(self.generate_experiment_xml(new_samples),
-                                    self.experiment_xml_fp)
+                experiment_set, experiments = self._experiment_xml(
+                    new_samples)
+                self.write_xml_file(experiment_set, self.experiment_xml_fp,
+                                    experiments)
 
             # Generate the run.xml as it should always be generated
             self.run_xml_fp = get_output_fp('run.xml')
-            self.write_xml_file(self.generate_run_xml(), self.run_xml_fp)
+            run_set, runs = self._run_xml()
+            self.write_xml_file(run_set, self.run_xml_fp, runs)
 
             self.submission_xml_fp = get_output_fp('submission.xml')
         else:
@@ -730,8 +1011,9 @@ class EBISubmission(object):
                 if not exists(self.sample_xml_fp):
                     break
                 i = i + 1
-            self.write_xml_file(self.generate_sample_xml(samples),
-                                self.sample_xml_fp)
+            sample_set, sample_elements = self._sample_xml(samples)
+            self.write_xml_file(sample_set, self.sample_xml_fp,
+                                sample_elements)
 
             # finding unique name for experiment xml
             i = 0
@@ -740,8 +1022,9 @@ class EBISubmission(object):
                 if not exists(self.experiment_xml_fp):
                     break
                 i = i + 1
-            self.write_xml_file(self.generate_experiment_xml(samples),
-                                self.experiment_xml_fp)
+            experiment_set, experiments = self._experiment_xml(samples)
+            self.write_xml_file(experiment_set, self.experiment_xml_fp,
+                                experiments)
 
             # finding unique name for run xml
             i = 0
@@ -835,6 +1118,32 @@ class EBISubmission(object):
 
         return ascp_commands
 
+    def generate_sequences_transfer(self):
+        """Generates the transfer of the sequences to EBI via ascp
+
+        Returns
+        -------
+        ASCPTransferManager
+            The transfer of the fastq files that haven't been sent to EBI,
+            with the concurrency and retries set in qiita_config
+
+        Notes
+        -----
+        - The per-sample fastq files must be generated before executing this
+        function
+        - The files sent are recorded in self.ascp_ledger, so if the transfer
+        is restarted only the missing files are sent
+        """
+        return ASCPTransferManager(
+            sorted(viewvalues(self.sample_demux_fps)),
+            '{0}@{1}:./{2}/'.format(qiita_config.ebi_seq_xfer_user,
+                                    qiita_config.ebi_seq_xfer_url,
+                                    self.ebi_dir),
+            self.ascp_ledger, reply_fp=self.ascp_reply,
+            workers=qiita_config.ebi_ascp_workers,
+            retries=qiita_config.ebi_ascp_retries,
+            backoff=qiita_config.ebi_ascp_backoff)
+
     def parse_EBI_reply(self, curl_result):
         """Parse and verify reply from EBI after sending XML files
 
@@ -916,7 +1225,7 @@ class EBISubmission(object):
         return (study_accession, sample_accessions, biosample_accessions,
                 experiment_accessions, run_accessions)
 
-    def _generate_demultiplexed_fastq_per_sample_FASTQ(self):
+    def _generate_demultiplexed_fastq_per_sample_FASTQ(self, mtime):
         """Modularity helper"""
         ar = self.artifact
         fps = [(basename(fp), fp) for _, fp, fpt in ar.filepaths
@@ -929,21 +1238,12 @@ class EBISubmission(object):
             rps = [(v, v.split('.', 1)[1]) for v in self.prep_template.keys()]
         rps.sort(key=lambda x: x[1])
         demux_samples = set()
+        to_copy = []
         for sn, rp in rps:
             for i, (bn, fp) in enumerate(fps):
                 if bn.startswith(rp):
                     demux_samples.add(sn)
-                    new_fp = self.sample_demux_fps[sn]
-                    if fp.endswith('.gz'):
-                        copyfile(fp, new_fp)
-                    else:
-                        cmd = "gzip -c %s > %s" % (fp, new_fp)
-                        stdout, stderr, rv = system_call(cmd)
-                        if rv != 0:
-                            error_msg = (
-                                "Error:\nStd output:%s\nStd error:%s"
-                                % (stdout, stderr))
-                            raise EBISubmissionError(error_msg)
+                    to_copy.append((sn, fp, self.sample_demux_fps[sn]))
                     del fps[i]
                     break
         if fps:
@@ -953,6 +1253,9 @@ class EBISubmission(object):
             LogEntry.create('Runtime', error_msg)
             raise EBISubmissionError(error_msg)
 
+        for md5s in _map_in_pool(_fastq_to_fastq_gz, to_copy, mtime):
+            self._md5s.update(md5s)
+
         return demux_samples, \
             set(self.samples.keys()).difference(set(demux_samples))
 
@@ -965,29 +1268,24 @@ class EBISubmission(object):
         demux = [path for _, path, ftype in ar.filepaths
                  if ftype == 'preprocessed_demux'][0]
 
-        demux_samples = set()
         with open_file(demux) as demux_fh:
             if not isinstance(demux_fh, File):
                 error_msg = (
                     "'%s' doesn't look like a demux file" % demux)
                 LogEntry.create('Runtime', error_msg)
                 raise EBISubmissionError(error_msg)
-            for s, i in to_per_sample_ascii(demux_fh,
-                                            self.prep_template.keys()):
-                sample_fp = self.sample_demux_fps[s]
-                wrote_sequences = False
-                with GzipFile(sample_fp, mode='w', mtime=mtime) as fh:
-                    for record in i:
-                        fh.write(record)
-                        wrote_sequences = True
-
-                if wrote_sequences:
-                    demux_samples.add(s)
-                else:
-                    del(self.samples[s])
-                    del(self.samples_prep[s])
-                    del(self.sample_demux_fps[s])
-                    remove(sample_fp)
+
+        sample_fps = [(s, self.sample_demux_fps[s])
+                      for s in self.prep_template.keys()]
+        for md5s in _map_in_pool(_demux_to_fastq_gz, sample_fps, mtime,
+                                 demux):
+            self._md5s.update(md5s)
+        demux_samples = set(self._md5s)
+
+        for s in set(self.prep_template.keys()) - demux_samples:
+            del(self.samples[s])
+            del(self.samples_prep[s])
+            del(self.sample_demux_fps[s])
         return demux_samples
 
     def generate_demultiplexed_fastq(self, rewrite_fastq=False, mtime=None):
@@ -1000,6 +1298,8 @@ class EBISubmission(object):
         mtime : float, optional
             The time to use when creating the gz files. If None, the current
             time will be used by gzip.GzipFile. This is useful for testing.
+            The files are compressed with qiita_config.ebi_gzip_level and
+            written by qiita_config.ebi_demux_workers processes
 
         Returns
         -------
@@ -1028,13 +1328,20 @@ class EBISubmission(object):
         dir_not_exists = not isdir(self.full_ebi_dir)
         missing_samples = []
         if dir_not_exists or rewrite_fastq:
-            makedirs(self.full_ebi_dir)
+            create_dir(self.full_ebi_dir)
 
+            self._md5s = {}
             if self.artifact.artifact_type == 'per_sample_FASTQ':
                 demux_samples, missing_samples = \
-                    self._generate_demultiplexed_fastq_per_sample_FASTQ()
+                    self._generate_demultiplexed_fastq_per_sample_FASTQ(mtime)
             else:
                 demux_samples = self._generate_demultiplexed_fastq_demux(mtime)
+
+            # keeping the MD5 of the files, in the format of md5sum
+            with open(self.md5_manifest, 'w') as f:
+                for s, checksum in sorted(viewitems(self._md5s)):
+                    f.write('%s  %s\n' % (
+                        checksum, basename(self.sample_demux_fps[s])))
         else:
             demux_samples = set()
             extension = '.fastq.gz'
@@ -1044,6 +1351,15 @@ class EBISubmission(object):
                 if isfile(fpath) and f.endswith(extension):
                     demux_samples.add(f[:-extension_len])
 
+            self._md5s = {}
+            if exists(self.md5_manifest):
+                with open(self.md5_manifest) as f:
+                    for line in f:
+                        checksum, fname = line.rstrip('\n').split('  ', 1)
+                        sample = fname[:-extension_len]
+                        if sample in demux_samples:
+                            self._md5s[sample] = checksum
+
             missing_samples = set(
                 self.samples.keys()).difference(demux_samples)
 
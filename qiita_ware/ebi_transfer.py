@@ -0,0 +1,132 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from multiprocessing.pool import ThreadPool
+from os.path import basename, exists, getmtime, getsize
+from threading import Lock
+from time import sleep
+
+from qiita_db.processing_job import _system_call as system_call
+
+
+class ASCPTransferManager(object):
+    """Sends files with ascp, concurrently and resumably
+
+    Each file is sent with its own ascp command, which is retried with an
+    exponential backoff when it fails. The files that are sent are recorded in
+    a ledger, so a later transfer of the same files only sends the ones that
+    are missing or have changed since they were sent.
+
+    Parameters
+    ----------
+    fps : list of str
+        The filepaths of the files to send
+    destination : str
+        The destination of the files, as expected by ascp, e.g.
+        user@host:./dir/
+    ledger_fp : str
+        The filepath of the ledger of the files that have been sent
+    reply_fp : str, optional
+        The filepath in which the output of the ascp commands is appended. If
+        not provided, the output is not kept
+    command : str, optional
+        The ascp command to execute. The filepath and `destination` are
+        appended to it
+    workers : int, optional
+        The number of files that are sent concurrently. Default: 1
+    retries : int, optional
+        The number of times sending a file is attempted. Default: 1
+    backoff : float, optional
+        The number of seconds to wait before the first retry of a file. It is
+        doubled after each failed attempt. Default: 0
+    """
+    def __init__(self, fps, destination, ledger_fp, reply_fp=None,
+                 command='ascp --ignore-host-key -d -QT -k2', workers=1,
+                 retries=1, backoff=0):
+        self.fps = fps
+        self.destination = destination
+        self.ledger_fp = ledger_fp
+        self.reply_fp = reply_fp
+        self.command = command
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = Lock()
+
+    @staticmethod
+    def _ledger_entry(fp):
+        """The ledger entry of `fp`, which changes if the file is rewritten"""
+        return '%s\t%d\t%d' % (basename(fp), getsize(fp), int(getmtime(fp)))
+
+    @property
+    def pending(self):
+        """The files that have not been sent
+
+        Returns
+        -------
+        list of str
+            The filepaths of the files that are not in the ledger
+        """
+        sent = set()
+        if exists(self.ledger_fp):
+            with open(self.ledger_fp) as f:
+                sent = {line.rstrip('\n') for line in f}
+        return [fp for fp in self.fps if self._ledger_entry(fp) not in sent]
+
+    def _send(self, fp):
+        """Sends a file, retrying if it fails
+
+        Parameters
+        ----------
+        fp : str
+            The filepath of the file to send
+
+        Returns
+        -------
+        str or None
+            The error of the last attempt, or None if the file has been sent
+        """
+        cmd = '%s %s %s' % (self.command, fp, self.destination)
+        for attempt in range(self.retries):
+            if attempt:
+                sleep(self.backoff * 2 ** (attempt - 1))
+            stdout, stderr, rv = system_call(cmd)
+            with self._lock:
+                if self.reply_fp is not None:
+                    with open(self.reply_fp, 'a') as f:
+                        f.write('stdout:\n%s\n\nstderr: %s' % (stdout, stderr))
+                if rv == 0:
+                    with open(self.ledger_fp, 'a') as f:
+                        f.write('%s\n' % self._ledger_entry(fp))
+                    return None
+        return "Std output:%s\nStd error:%s" % (stdout, stderr)
+
+    def transfer(self):
+        """Sends the files that have not been sent
+
+        Returns
+        -------
+        dict of {str: str}
+            The error of the files that could not be sent, keyed by filepath
+        """
+        pending = self.pending
+        if not pending:
+            return {}
+
+        workers = min(self.workers, len(pending))
+        if workers > 1:
+            pool = ThreadPool(workers)
+            try:
+                errors = pool.map(self._send, pending)
+            finally:
+                pool.terminate()
+        else:
+            errors = [self._send(fp) for fp in pending]
+
+        return {fp: error for fp, error in zip(pending, errors)
+                if error is not None}
@@ -0,0 +1,131 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from json import dumps, loads
+from signal import signal, SIGINT, SIGTERM
+from sys import exc_info
+from threading import Event
+import traceback
+
+import qiita_db as qdb
+from qiita_core.qiita_settings import r_client
+
+
+def recover_ready_jobs():
+    """Submits the jobs that have all their inputs but were never submitted
+
+    Returns
+    -------
+    list of qiita_db.processing_job.ProcessingJob
+        The jobs submitted
+
+    Notes
+    -----
+    This covers the transitions that happened while the dispatcher was not
+    running, and the jobs that the scheduler of a process that has exited
+    kept waiting for a slot (see qiita_db.processing_job.JobScheduler). The
+    validators are left out, as they are also in 'waiting' status once they
+    succeed, until their parent job releases them.
+    """
+    with qdb.sql_connection.TRN:
+        sql = """SELECT processing_job_id
+                 FROM qiita.processing_job
+                    JOIN qiita.processing_job_status
+                        USING (processing_job_status_id)
+                 WHERE processing_job_status = 'waiting'
+                    AND pending IS NULL
+                    AND processing_job_id NOT IN (
+                        SELECT validator_id
+                        FROM qiita.processing_job_validator)"""
+        qdb.sql_connection.TRN.add(sql)
+        job_ids = qdb.sql_connection.TRN.execute_fetchflatten()
+
+    submitted = []
+    for jid in job_ids:
+        job = qdb.processing_job.ProcessingJob(jid)
+        try:
+            job.submit()
+        except qdb.exceptions.QiitaDBOperationNotPermittedError:
+            continue
+        submitted.append(job)
+    return submitted
+
+
+def dispatch_job_event(event):
+    """Reacts to the status transition of a job
+
+    Parameters
+    ----------
+    event : dict
+        The payload of the notification sent by ProcessingJob._set_status,
+        with the keys 'job_id', 'status' and 'previous'
+
+    Notes
+    -----
+    The transition is pushed to the websockets of the owner of the job (see
+    qiita_pet.handlers.websocket_handlers.MessageHandler) under the
+    'job_status' action. The ready children of the jobs are submitted by the
+    job that completes them (see ProcessingJob._update_and_launch_children),
+    not here.
+    """
+    job = qdb.processing_job.ProcessingJob(event['job_id'])
+    r_client.publish(job.user.id, dumps({'job_status': event}))
+
+
+def dispatch_job_events(stop, timeout=5):
+    """Dispatches the job status notifications until `stop` is set
+
+    Parameters
+    ----------
+    stop : threading.Event
+        The event signaling that the dispatcher should stop
+    timeout : int, optional
+        The number of seconds to wait for a notification before checking
+        `stop` again. Default: 5
+
+    Returns
+    -------
+    int
+        The number of notifications dispatched
+    """
+    channel = qdb.processing_job.JOB_STATUS_CHANNEL
+    num_events = 0
+    with qdb.sql_connection.NotificationListener([channel]) as listener:
+        # We start listening before recovering, so no transition is lost
+        recover_ready_jobs()
+        while not stop.is_set():
+            for _, payload in listener.poll(timeout):
+                num_events += 1
+                try:
+                    dispatch_job_event(loads(payload))
+                except Exception:
+                    qdb.logger.LogEntry.create(
+                        'Runtime', "Error dispatching job event %s: %s" % (
+                            payload,
+                            ''.join(traceback.format_exception(*exc_info()))))
+    return num_events
+
+
+def start_job_dispatcher(timeout=5):
+    """Dispatches the job status notifications until SIGINT or SIGTERM
+
+    Parameters
+    ----------
+    timeout : int, optional
+        The number of seconds to wait for a notification before checking if
+        the dispatcher should stop. Default: 5
+    """
+    stop = Event()
+
+    def _stop(signum, frame):
+        stop.set()
+
+    signal(SIGINT, _stop)
+    signal(SIGTERM, _stop)
+
+    dispatch_job_events(stop, timeout)
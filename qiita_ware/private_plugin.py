@@ -8,7 +8,6 @@
 
 from json import dumps, loads
 from sys import exc_info
-from time import sleep
 from os import remove
 import traceback
 import warnings
@@ -50,9 +49,10 @@ def build_analysis_files(job):
 
         job._set_validator_jobs(val_jobs)
 
+        # The job scheduler starts at most MAX_RUNNING_VALIDATOR_JOBS of them
+        # at the same time, the rest are started as the others finish
         for j in val_jobs:
             j.submit()
-            sleep(1)
 
     # The validator jobs no longer finish the job automatically so we need
     # to release the validators here
@@ -67,10 +67,10 @@ def release_validators(job):
     job : qiita_db.processing_job.ProcessingJob
         The processing job with the information of the parent job
     """
-    with qdb.sql_connection.TRN:
-        qdb.processing_job.ProcessingJob(
-            job.parameters.values['job']).release_validators()
-        job._set_status('success')
+    # It waits for the validators, so it can't be inside a transaction
+    qdb.processing_job.ProcessingJob(
+        job.parameters.values['job']).release_validators()
+    job._set_status('success')
 
 
 def submit_to_VAMPS(job):
@@ -0,0 +1,203 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from errno import EPERM
+from multiprocessing import Process, Event
+from os import getpid, kill
+from signal import signal, SIGINT, SIGTERM, SIG_IGN
+from socket import gethostname
+from sys import exc_info
+from time import sleep
+import traceback
+
+import qiita_db as qdb
+from qiita_core.qiita_settings import r_client
+from qiita_ware.private_plugin import private_task
+
+
+def _processing_prefix():
+    """Returns the prefix of the processing lists of the workers of this host
+    """
+    return '%s:processing:%s' % (qdb.processing_job.PRIVATE_JOB_QUEUE,
+                                 gethostname())
+
+
+def _processing_list(pid):
+    """Returns the redis list of the jobs that a worker is executing
+
+    Parameters
+    ----------
+    pid : int
+        The process id of the worker
+
+    Returns
+    -------
+    str
+        The name of the list
+    """
+    return '%s:%d' % (_processing_prefix(), pid)
+
+
+def requeue_jobs(processing_list):
+    """Moves the jobs that a worker was executing back to the queue
+
+    Parameters
+    ----------
+    processing_list : str
+        The redis list of the jobs of the worker
+
+    Returns
+    -------
+    list of str
+        The ids of the jobs moved back to the queue
+    """
+    job_ids = []
+    while True:
+        # Moved one by one, so no job is lost if we are interrupted
+        job_id = r_client.rpoplpush(processing_list,
+                                    qdb.processing_job.PRIVATE_JOB_QUEUE)
+        if job_id is None:
+            break
+        job_ids.append(job_id)
+    return job_ids
+
+
+def _pid_exists(pid):
+    """Checks if there is a process with the given id"""
+    try:
+        kill(pid, 0)
+    except OSError as e:
+        # EPERM: the process exists, but is owned by another user
+        return e.errno == EPERM
+    return True
+
+
+def requeue_orphaned_jobs():
+    """Moves back to the queue the jobs of the workers of this host that died
+
+    Returns
+    -------
+    list of str
+        The ids of the jobs moved back to the queue
+    """
+    job_ids = []
+    for processing_list in r_client.keys('%s:*' % _processing_prefix()):
+        if not _pid_exists(int(processing_list.rsplit(':', 1)[1])):
+            job_ids.extend(requeue_jobs(processing_list))
+    return job_ids
+
+
+def process_private_jobs(stop, queue_timeout=5, max_tasks=None):
+    """Executes the private jobs in the queue until `stop` is set
+
+    Parameters
+    ----------
+    stop : multiprocessing.Event
+        The event signaling that no more jobs should be executed
+    queue_timeout : int, optional
+        The number of seconds to wait for a job before checking `stop` again.
+        Default: 5
+    max_tasks : int, optional
+        The number of jobs to execute before returning. Default: no limit
+
+    Returns
+    -------
+    int
+        The number of jobs executed
+
+    Notes
+    -----
+    The job is kept in the processing list of the worker (see
+    `_processing_list`) until it is executed, so it can be moved back to the
+    queue if the worker is killed while executing it.
+    """
+    processing_list = _processing_list(getpid())
+    num_tasks = 0
+    while not stop.is_set() and (max_tasks is None or num_tasks < max_tasks):
+        job_id = r_client.brpoplpush(qdb.processing_job.PRIVATE_JOB_QUEUE,
+                                     processing_list, timeout=queue_timeout)
+        if job_id is None:
+            continue
+
+        num_tasks += 1
+        try:
+            private_task(job_id)
+        except Exception:
+            # private_task already stores the errors of the job, so we only
+            # get here if the job could not be retrieved
+            qdb.logger.LogEntry.create(
+                'Runtime', "Error executing private job %s: %s" % (
+                    job_id, ''.join(traceback.format_exception(*exc_info()))))
+        finally:
+            r_client.lrem(processing_list, job_id, 1)
+
+    return num_tasks
+
+
+def _worker(stop, queue_timeout, max_tasks):
+    """Entry point of the worker processes"""
+    # The interruptions are handled by the parent, which lets the workers
+    # finish the job that they are executing
+    signal(SIGINT, SIG_IGN)
+    signal(SIGTERM, SIG_IGN)
+    # The worker can not use the transaction (and the connection) inherited
+    # from the parent process
+    qdb.sql_connection.create_new_transaction()
+    process_private_jobs(stop, queue_timeout, max_tasks)
+
+
+def start_private_workers(num_workers, queue_timeout=5, max_tasks=None):
+    """Starts the workers executing private jobs and keeps them running
+
+    Parameters
+    ----------
+    num_workers : int
+        The number of worker processes
+    queue_timeout : int, optional
+        The number of seconds that a worker waits for a job before checking
+        if it should stop. Default: 5
+    max_tasks : int, optional
+        The number of jobs that a worker executes before being replaced by a
+        new one. Default: workers are never replaced
+
+    Notes
+    -----
+    The workers are forked from this process once Qiita and all its
+    dependencies are imported, so they can start executing a job right away.
+    This function blocks until the process receives a SIGINT or a SIGTERM.
+    In that case, the workers finish the job that they are executing before
+    exiting.
+    The jobs that a worker was executing when it died (e.g. killed by the OOM
+    killer) are moved back to the queue, as well as the jobs of the workers of
+    a previous execution in this host that didn't exit cleanly.
+    """
+    stop = Event()
+
+    def _stop(signum, frame):
+        stop.set()
+
+    signal(SIGINT, _stop)
+    signal(SIGTERM, _stop)
+
+    requeue_orphaned_jobs()
+    workers = []
+    while not stop.is_set():
+        # Replace the workers that have exited (or start them the first time)
+        exited = [w for w in workers if not w.is_alive()]
+        for w in exited:
+            requeue_jobs(_processing_list(w.pid))
+        workers = [w for w in workers if w not in exited]
+        for _ in range(num_workers - len(workers)):
+            w = Process(target=_worker,
+                        args=(stop, queue_timeout, max_tasks))
+            w.start()
+            workers.append(w)
+        sleep(1)
+
+    for w in workers:
+        w.join()
@@ -102,8 +102,10 @@ class TestEBISubmission(TestCase):
         self.assertIsNone(e.submission_xml_fp)
 
         for sample in e.sample_template:
-            self.assertEqual(e.sample_template[sample], e.samples[sample])
-            self.assertEqual(e.prep_template[sample], e.samples_prep[sample])
+            self.assertEqual(dict(e.sample_template[sample]),
+                             e.samples[sample])
+            self.assertEqual(dict(e.prep_template[sample]),
+                             e.samples_prep[sample])
             self.assertEqual(e.sample_demux_fps[sample],
                              get_output_fp('%s.fastq.gz' % sample))
 
@@ -236,6 +238,33 @@ class TestEBISubmission(TestCase):
         exp = "<?xml version='1.0' encoding='UTF-8'?>\n<TESTING foo=\"bar\" />"
         self.assertEqual(obs, exp)
 
+    def test_write_xml_file_children(self):
+        element = ET.Element('TESTING', {'foo': 'bar & "baz"'})
+        children = []
+        for i in range(2):
+            child = ET.Element('CHILD', {'id': str(i)})
+            ET.SubElement(child, 'TITLE').text = 'title <%d>' % i
+            children.append(child)
+        e = EBISubmission(3, 'ADD')
+        e.write_xml_file(element, 'testfile', iter(children))
+        self.files_to_remove.append('testfile')
+
+        obs = open('testfile').read()
+        exp = ("<?xml version='1.0' encoding='UTF-8'?>\n"
+               "<TESTING foo=\"bar &amp; &quot;baz&quot;\">"
+               "<CHILD id=\"0\"><TITLE>title &lt;0&gt;</TITLE></CHILD>"
+               "<CHILD id=\"1\"><TITLE>title &lt;1&gt;</TITLE></CHILD>"
+               "</TESTING>")
+        self.assertEqual(obs, exp)
+
+        # the streamed file is the same as the one of the full tree
+        sample_set, samples = e._sample_xml()
+        e.write_xml_file(sample_set, 'testfile', samples)
+        obs = open('testfile').read()
+        e.write_xml_file(e.generate_sample_xml(), 'testfile')
+        exp = open('testfile').read()
+        self.assertEqual(obs, exp)
+
     def test_generate_curl_command(self):
         submission = EBISubmission(3, 'ADD')
 
@@ -661,6 +690,57 @@ class TestEBISubmission(TestCase):
         self.assertItemsEqual(obs_demux_samples,
                               ebi_submission.samples_prep.keys())
 
+    def test_generate_demultiplexed_fastq_md5_manifest(self):
+        artifact = self.write_demux_files(PrepTemplate(1))
+        ebi_submission = EBISubmission(artifact.id, 'ADD')
+        self.files_to_remove.append(ebi_submission.full_ebi_dir)
+        ebi_submission.generate_demultiplexed_fastq(mtime=1)
+
+        exp = {}
+        for s, fp in viewitems(ebi_submission.sample_demux_fps):
+            with open(fp) as f:
+                exp[s] = safe_md5(f).hexdigest()
+        self.assertEqual(ebi_submission._md5s, exp)
+        with open(ebi_submission.md5_manifest) as f:
+            obs = f.read()
+        self.assertEqual(obs, ''.join(
+            '%s  %s.fastq.gz\n' % (exp[s], s) for s in sorted(exp)))
+
+        # the checksums are read from the manifest when the files exist
+        ebi_submission = EBISubmission(artifact.id, 'ADD')
+        ebi_submission.generate_demultiplexed_fastq()
+        self.assertEqual(ebi_submission._md5s, exp)
+
+    def test_generate_demultiplexed_fastq_pool(self):
+        artifact = self.write_demux_files(PrepTemplate(1))
+        ebi_submission = EBISubmission(artifact.id, 'ADD')
+        self.files_to_remove.append(ebi_submission.full_ebi_dir)
+        exp_demux_samples = ebi_submission.generate_demultiplexed_fastq(
+            mtime=1)
+        exp = {}
+        for s, fp in viewitems(ebi_submission.sample_demux_fps):
+            with open(fp) as f:
+                exp[s] = safe_md5(f).hexdigest()
+
+        workers = qiita_config.ebi_demux_workers
+        qiita_config.ebi_demux_workers = 3
+        try:
+            ebi_submission = EBISubmission(artifact.id, 'ADD')
+            obs_demux_samples = ebi_submission.generate_demultiplexed_fastq(
+                rewrite_fastq=True, mtime=1)
+        finally:
+            qiita_config.ebi_demux_workers = workers
+
+        # the files are the same regardless of the number of processes
+        self.assertItemsEqual(obs_demux_samples, exp_demux_samples)
+        self.assertItemsEqual(ebi_submission.samples.keys(),
+                              exp_demux_samples)
+        obs = {}
+        for s, fp in viewitems(ebi_submission.sample_demux_fps):
+            with open(fp) as f:
+                obs[s] = safe_md5(f).hexdigest()
+        self.assertEqual(obs, exp)
+
     def _generate_per_sample_FASTQs(self, prep_template, sequences):
         # generating a per_sample_FASTQ artifact, adding should_rename so
         # we can test that the script uses the correct names during
@@ -797,6 +877,23 @@ class TestEBISubmission(TestCase):
                    'ebi_dir': e.full_ebi_dir, 'aid': artifact.id}).split('\n')
         self.assertEqual(obs, exp)
 
+    def test_generate_sequences_transfer(self):
+        artifact = self.write_demux_files(PrepTemplate(1))
+        e = EBISubmission(artifact.id, 'ADD')
+        e.generate_demultiplexed_fastq()
+        self.files_to_remove.append(e.full_ebi_dir)
+        obs = e.generate_sequences_transfer()
+        self.assertEqual(obs.fps, sorted(e.sample_demux_fps.values()))
+        self.assertEqual(obs.pending, obs.fps)
+        self.assertEqual(
+            obs.destination,
+            'Webin-41528@webin.ebi.ac.uk:./%d_ebi_submission/' % artifact.id)
+        self.assertEqual(obs.ledger_fp, e.ascp_ledger)
+        self.assertEqual(obs.reply_fp, e.ascp_reply)
+        self.assertEqual(obs.workers, qiita_config.ebi_ascp_workers)
+        self.assertEqual(obs.retries, qiita_config.ebi_ascp_retries)
+        self.assertEqual(obs.backoff, qiita_config.ebi_ascp_backoff)
+
     def test_parse_EBI_reply(self):
         artifact = self.generate_new_study_with_preprocessed_data()
         study_id = artifact.study.id
@@ -0,0 +1,117 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from os import chmod, listdir, remove
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from qiita_ware.ebi_transfer import ASCPTransferManager
+
+
+# Stand-in for ascp: it copies the file (second to last argument) to the
+# destination directory (last argument). The files with "fail" in their name
+# fail the first time that they are sent and the ones with "broken" always
+# fail
+FAKE_ASCP = """#!/bin/bash
+fp="${@: -2:1}"
+dest="${@: -1}"
+if [[ "$fp" == *broken* ]]; then
+    echo "Session Stop (Error: connection refused)" >&2
+    exit 1
+fi
+if [[ "$fp" == *fail* && ! -e "$fp.attempted" ]]; then
+    touch "$fp.attempted"
+    echo "Session Stop (Error: timeout)" >&2
+    exit 1
+fi
+cp "$fp" "$dest"
+echo "Completed: $fp"
+"""
+
+
+class ASCPTransferManagerTests(TestCase):
+    def setUp(self):
+        self.src_dir = mkdtemp()
+        self.dest_dir = mkdtemp()
+        self.command = join(self.src_dir, 'fake_ascp')
+        with open(self.command, 'w') as f:
+            f.write(FAKE_ASCP)
+        chmod(self.command, 0o755)
+
+        self.fps = []
+        for name in ('S1.fastq.gz', 'S2_fail.fastq.gz', 'S3.fastq.gz'):
+            fp = join(self.src_dir, name)
+            with open(fp, 'w') as f:
+                f.write('@%s\nACGT\n+\nIIII\n' % name)
+            self.fps.append(fp)
+        self.ledger_fp = join(self.src_dir, 'ascp_ledger.txt')
+        self.reply_fp = join(self.src_dir, 'ascp_reply.txt')
+
+    def tearDown(self):
+        rmtree(self.src_dir)
+        rmtree(self.dest_dir)
+
+    def _manager(self, fps, **kwargs):
+        return ASCPTransferManager(
+            fps, self.dest_dir, self.ledger_fp, reply_fp=self.reply_fp,
+            command=self.command, **kwargs)
+
+    def test_transfer(self):
+        manager = self._manager(self.fps, workers=2, retries=2)
+        self.assertEqual(manager.pending, self.fps)
+        self.assertEqual(manager.transfer(), {})
+        self.assertItemsEqual(
+            listdir(self.dest_dir),
+            ['S1.fastq.gz', 'S2_fail.fastq.gz', 'S3.fastq.gz'])
+        self.assertEqual(manager.pending, [])
+        with open(self.ledger_fp) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        with open(self.reply_fp) as f:
+            obs = f.read()
+        self.assertIn('Session Stop (Error: timeout)', obs)
+        self.assertIn('Completed: %s' % self.fps[1], obs)
+
+    def test_transfer_resume(self):
+        manager = self._manager(self.fps)
+        # S2_fail fails the first time, and it is only attempted once
+        obs = manager.transfer()
+        self.assertEqual(obs.keys(), [self.fps[1]])
+        self.assertIn('Session Stop (Error: timeout)', obs[self.fps[1]])
+        self.assertEqual(manager.pending, [self.fps[1]])
+
+        # only the missing file is sent again
+        for f in listdir(self.dest_dir):
+            remove(join(self.dest_dir, f))
+        self.assertEqual(manager.transfer(), {})
+        self.assertEqual(listdir(self.dest_dir), ['S2_fail.fastq.gz'])
+        self.assertEqual(manager.pending, [])
+
+        # a rewritten file is sent again
+        with open(self.fps[0], 'a') as f:
+            f.write('@extra\nACGT\n+\nIIII\n')
+        self.assertEqual(manager.pending, [self.fps[0]])
+
+    def test_transfer_retries_exhausted(self):
+        broken = join(self.src_dir, 'S4_broken.fastq.gz')
+        with open(broken, 'w') as f:
+            f.write('@S4\nACGT\n+\nIIII\n')
+        manager = self._manager(self.fps + [broken], workers=4, retries=3)
+        obs = manager.transfer()
+        self.assertEqual(obs.keys(), [broken])
+        self.assertIn('connection refused', obs[broken])
+        self.assertEqual(manager.pending, [broken])
+        with open(self.reply_fp) as f:
+            self.assertEqual(
+                f.read().count('Session Stop (Error: connection refused)'),
+                3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from json import loads
+from threading import Thread
+from time import sleep
+
+import qiita_db as qdb
+from qiita_core.util import qiita_test_checker
+from qiita_core.testing import (
+    create_private_job, RecordingBackend, replace_job_scheduler)
+from qiita_core.qiita_settings import r_client
+from qiita_ware.job_dispatcher import recover_ready_jobs, dispatch_job_event
+
+
+@qiita_test_checker()
+class TestJobDispatcher(TestCase):
+    def setUp(self):
+        self._scheduler = replace_job_scheduler(
+            qdb.processing_job.JobScheduler(RecordingBackend()))
+
+    def tearDown(self):
+        replace_job_scheduler(self._scheduler).wait(timeout=10)
+        r_client.flushdb()
+
+    def test_submit_concurrently(self):
+        job = create_private_job()
+        job._set_status('waiting')
+        errors = []
+
+        def submit():
+            try:
+                qdb.processing_job.ProcessingJob(job.id).submit()
+            except qdb.exceptions.QiitaDBOperationNotPermittedError as e:
+                errors.append(e)
+
+        threads = [Thread(target=submit) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Only one of the calls submits the job
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(qdb.processing_job._SCHEDULER.wait(timeout=10))
+        self.assertEqual(qdb.processing_job._SCHEDULER.backend.executed,
+                         [job.id])
+
+    def test_recover_ready_jobs(self):
+        job = create_private_job()
+        job._set_status('waiting')
+        self.assertIn(job, recover_ready_jobs())
+        self.assertEqual(job.status, 'queued')
+        self.assertNotIn(job, recover_ready_jobs())
+
+    def test_dispatch_job_event(self):
+        pubsub = r_client.pubsub()
+        pubsub.subscribe('test@foo.bar')
+        job = create_private_job()
+        event = {'job_id': job.id, 'status': 'queued',
+                 'previous': 'in_construction'}
+        dispatch_job_event(event)
+
+        obs = None
+        for _ in range(50):
+            msg = pubsub.get_message()
+            if msg is not None and msg['type'] == 'message':
+                obs = loads(msg['data'])
+                break
+            sleep(0.1)
+        pubsub.close()
+        self.assertEqual(obs, {'job_status': event})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from multiprocessing import Event, Process
+from os import getpid
+
+from qiita_core.util import qiita_test_checker
+from qiita_core.qiita_settings import qiita_config, r_client
+from qiita_core.testing import create_private_job
+from qiita_db.processing_job import PRIVATE_JOB_QUEUE
+from qiita_ware.private_worker import (
+    process_private_jobs, requeue_orphaned_jobs, _processing_list)
+
+
+@qiita_test_checker()
+class TestPrivateWorker(TestCase):
+    def setUp(self):
+        self._use_private_workers = qiita_config.use_private_workers
+
+    def tearDown(self):
+        qiita_config.use_private_workers = self._use_private_workers
+        r_client.flushdb()
+
+    def test_submit_private_workers(self):
+        qiita_config.use_private_workers = True
+        job = create_private_job()
+
+        job.submit()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(r_client.lrange(PRIVATE_JOB_QUEUE, 0, -1), [job.id])
+
+        obs = process_private_jobs(Event(), queue_timeout=1, max_tasks=1)
+        self.assertEqual(obs, 1)
+        self.assertEqual(r_client.llen(PRIVATE_JOB_QUEUE), 0)
+        self.assertEqual(job.status, 'error')
+        self.assertIn(
+            'Cannot delete artifact 1: it has children: 2, 3', job.log.msg)
+
+    def test_process_private_jobs(self):
+        r_client.rpush(PRIVATE_JOB_QUEUE, 'register', 'register')
+        obs = process_private_jobs(Event(), queue_timeout=1, max_tasks=2)
+        self.assertEqual(obs, 2)
+        self.assertEqual(r_client.llen(PRIVATE_JOB_QUEUE), 0)
+
+    def test_process_private_jobs_processing_list(self):
+        r_client.rpush(PRIVATE_JOB_QUEUE, 'register')
+        process_private_jobs(Event(), queue_timeout=1, max_tasks=1)
+        # The job is removed from the processing list once it is executed
+        self.assertEqual(r_client.llen(_processing_list(getpid())), 0)
+
+    def test_requeue_orphaned_jobs(self):
+        dead = Process(target=int)
+        dead.start()
+        dead.join()
+        r_client.rpush(_processing_list(dead.pid), 'job1')
+        r_client.rpush(_processing_list(getpid()), 'job2')
+
+        self.assertEqual(requeue_orphaned_jobs(), ['job1'])
+        self.assertEqual(r_client.lrange(PRIVATE_JOB_QUEUE, 0, -1), ['job1'])
+        self.assertEqual(r_client.llen(_processing_list(dead.pid)), 0)
+        # The jobs of the workers that are alive are not moved
+        self.assertEqual(r_client.lrange(_processing_list(getpid()), 0, -1),
+                         ['job2'])
+
+    def test_process_private_jobs_stop(self):
+        r_client.rpush(PRIVATE_JOB_QUEUE, 'register')
+        stop = Event()
+        stop.set()
+        self.assertEqual(process_private_jobs(stop, queue_timeout=1), 0)
+        self.assertEqual(r_client.llen(PRIVATE_JOB_QUEUE), 1)
+
+
+if __name__ == '__main__':
+    main()